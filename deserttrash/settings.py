@@ -31,7 +31,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "reports.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "reports.staticfiles.PrecompressedStaticMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -66,6 +68,11 @@ DATABASES = {
     "default": env.db(),
 }
 
+# Cache (file-based by default so all workers share it)
+CACHES = {
+    "default": env.cache("CACHE_URL", default=f"filecache://{BASE_DIR / 'cache'}"),
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -92,6 +99,23 @@ STATICFILES_DIRS = [BASE_DIR / "static"]
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Uploads are stored once per distinct content, named by hash
+STORAGES = {
+    "default": {"BACKEND": "reports.storage.ContentAddressedStorage"},
+    # Content-hashed names plus .gz/.br copies, written by collectstatic
+    "staticfiles": {"BACKEND": "reports.staticfiles.CompressedManifestStaticFilesStorage"},
+}
+
+# How the media view hands files to the client: "x-accel" (nginx
+# X-Accel-Redirect to MEDIA_ACCEL_PREFIX, an internal location aliased to
+# MEDIA_ROOT), "x-sendfile" (Apache/lighttpd), or "" to stream them from
+# Django, as in development.
+MEDIA_SERVE_MODE = env("MEDIA_SERVE_MODE", default="")
+MEDIA_ACCEL_PREFIX = env("MEDIA_ACCEL_PREFIX", default="/protected-media/")
+
+# On-disk cache for rendered map vector tiles
+TILE_CACHE_DIR = env("TILE_CACHE_DIR", default=str(BASE_DIR / "tile_cache"))
+
 # django-allauth
 SITE_ID = 1
 AUTHENTICATION_BACKENDS = [
@@ -126,6 +150,17 @@ MAPBOX_TOKEN = env("MAPBOX_TOKEN", default="")
 # Default primary key field type
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Uploads always stream to a temp file on disk rather than being held in
+# memory; FILE_UPLOAD_TEMP_DIR on the same filesystem as MEDIA_ROOT lets
+# storage move them into place without copying.
+FILE_UPLOAD_HANDLERS = ["django.core.files.uploadhandler.TemporaryFileUploadHandler"]
+FILE_UPLOAD_TEMP_DIR = env("FILE_UPLOAD_TEMP_DIR", default=None)
+
+# Reject uploads whose photo nearly matches an existing report's
+BLOCK_DUPLICATE_PHOTOS = env.bool("BLOCK_DUPLICATE_PHOTOS", default=False)
+
+# Requests slower than this are logged with their slowest queries
+SLOW_REQUEST_SECONDS = env.float("SLOW_REQUEST_SECONDS", default=1.0)
+
 # Upload size limits
-FILE_UPLOAD_MAX_MEMORY_SIZE = 20 * 1024 * 1024
 DATA_UPLOAD_MAX_MEMORY_SIZE = 20 * 1024 * 1024
@@ -1,13 +1,14 @@
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from reports.views import media_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("accounts/", include("allauth.urls")),
+    # In production the web server answers these via X-Accel-Redirect or
+    # X-Sendfile; see MEDIA_SERVE_MODE
+    path(f"{settings.MEDIA_URL.lstrip('/')}<path:path>", media_view, name="media"),
     path("", include("reports.urls")),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,9 +1,9 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.gis.admin import GISModelAdmin
-from django.utils import timezone
 
-from .models import Category, Submission, User
+from .models import Category, PhotoJob, Submission, User
+from .moderation import transition_submissions
 
 
 @admin.register(User)
@@ -31,23 +31,33 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Submission)
 class SubmissionAdmin(GISModelAdmin):
-    list_display = ("id", "user", "category", "severity", "status", "created_at")
-    list_filter = ("status", "severity", "category", "created_at")
+    list_display = ("id", "user", "category", "severity", "status", "processing", "created_at")
+    list_filter = ("status", "severity", "category", "processing", "created_at")
     readonly_fields = ("exif_data", "created_at", "updated_at")
     actions = ["approve_submissions", "reject_submissions"]
 
     @admin.action(description="Approve selected submissions")
     def approve_submissions(self, request, queryset):
-        queryset.update(
-            status=Submission.Status.APPROVED,
-            moderated_by=request.user,
-            moderated_at=timezone.now(),
-        )
+        self._transition(request, queryset, Submission.Status.APPROVED)
 
     @admin.action(description="Reject selected submissions")
     def reject_submissions(self, request, queryset):
-        queryset.update(
-            status=Submission.Status.REJECTED,
-            moderated_by=request.user,
-            moderated_at=timezone.now(),
-        )
+        self._transition(request, queryset, Submission.Status.REJECTED)
+
+    def _transition(self, request, queryset, target):
+        pks = list(queryset.values_list("pk", flat=True))
+        result = transition_submissions(pks, target, request.user)
+        self.message_user(request, f"{len(result.updated)} submissions updated.")
+        if result.skipped:
+            self.message_user(
+                request,
+                f"{len(result.skipped)} skipped (locked or not allowed from their current status).",
+                messages.WARNING,
+            )
+
+
+@admin.register(PhotoJob)
+class PhotoJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "submission", "status", "attempts", "run_after", "updated_at")
+    list_filter = ("status",)
+    readonly_fields = ("last_error", "created_at", "updated_at")
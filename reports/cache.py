@@ -0,0 +1,105 @@
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+
+from .models import PUBLIC_STATUSES, Submission
+
+MAP_DATA_VERSION_KEY = "reports:map-data-version"
+CATEGORY_VERSION_KEY = "reports:category-version"
+GEOJSON_CACHE_TIMEOUT = 60 * 60  # 1 hour; stale versions just age out
+# Rendered HTML is keyed by version, so this only bounds memory use
+FRAGMENT_CACHE_TIMEOUT = 24 * 60 * 60
+# Expired tile versions are reminted from the clock, so this only bounds
+# how many keys are kept
+TILE_VERSION_TIMEOUT = 24 * 60 * 60
+
+
+def _get_version(key, timeout=None):
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        cache.add(key, version, timeout)
+        version = cache.get(key, version)
+    return version
+
+
+def get_map_data_version():
+    """Return the current public map data version.
+
+    The version is the time (in ns) of the last change to public data, so it
+    doubles as a Last-Modified value. If the cache has been cleared a fresh
+    version is minted, which only costs one round of misses.
+    """
+    return _get_version(MAP_DATA_VERSION_KEY)
+
+
+def bump_map_data_version():
+    """Mark public map data as changed, invalidating cached responses."""
+    cache.set(MAP_DATA_VERSION_KEY, time.time_ns(), None)
+
+
+def version_last_modified(version):
+    """Convert a map data version into an aware datetime."""
+    return datetime.fromtimestamp(version / 1e9, tz=timezone.utc)
+
+
+def get_category_version():
+    """Return the version of the category table, minted like the map one."""
+    return _get_version(CATEGORY_VERSION_KEY)
+
+
+def bump_category_version():
+    """Mark categories as changed, invalidating fragments that show them."""
+    cache.set(CATEGORY_VERSION_KEY, time.time_ns(), None)
+
+
+def _tile_version_key(z, x, y):
+    return f"reports:tile-version:{z}/{x}/{y}"
+
+
+def get_tile_version(z, x, y):
+    """Return the version of one map tile.
+
+    Each tile has its own key, bumped only when a point inside it changes,
+    plus the category version because tiles carry category names and
+    colors. A key that expires is reminted from the clock, so versions
+    only ever grow.
+    """
+    return max(
+        _get_version(_tile_version_key(z, x, y), TILE_VERSION_TIMEOUT),
+        get_category_version(),
+    )
+
+
+def bump_tile_versions(tiles):
+    """Mark (z, x, y) tiles as changed."""
+    now = time.time_ns()
+    cache.set_many({_tile_version_key(*tile): now for tile in tiles}, TILE_VERSION_TIMEOUT)
+
+
+def _detail_version_key(pk):
+    return f"reports:submission-version:{pk}"
+
+
+def get_submission_version(pk):
+    """Return a public submission's ``updated_at`` in ns, or 0 if it isn't public.
+
+    The answer is cached until a signal forgets it, so a hit costs no query.
+    """
+    key = _detail_version_key(pk)
+    version = cache.get(key)
+    if version is None:
+        updated_at = (
+            Submission.objects.filter(pk=pk, status__in=PUBLIC_STATUSES)
+            .values_list("updated_at", flat=True)
+            .first()
+        )
+        version = int(updated_at.timestamp() * 1e6) * 1000 if updated_at else 0
+        cache.set(key, version, FRAGMENT_CACHE_TIMEOUT)
+    return version
+
+
+def forget_submission_versions(pks):
+    """Drop cached versions so the next read looks at the database again."""
+    cache.delete_many([_detail_version_key(pk) for pk in pks])
@@ -15,3 +15,16 @@ def moderator_required(view_func):
         return view_func(request, *args, **kwargs)
 
     return _wrapped
+
+
+def staff_required(view_func):
+    """Require the user to be logged in and a staff member."""
+
+    @wraps(view_func)
+    @login_required
+    def _wrapped(request, *args, **kwargs):
+        if not request.user.is_staff:
+            return HttpResponseForbidden("You do not have permission to access this page.")
+        return view_func(request, *args, **kwargs)
+
+    return _wrapped
@@ -0,0 +1,175 @@
+import threading
+import time
+
+from django.contrib.gis.db.models.functions import Distance
+from django.contrib.gis.measure import D
+
+from .models import Submission
+
+# Photos whose dHashes differ in at most this many bits are near-duplicates
+DUPLICATE_MAX_DISTANCE = 5
+SIMILAR_PHOTOS_LIMIT = 5
+
+# Seconds between full rebuilds of the photo hash index. Topping up by pk
+# misses rows committed out of pk order and hashes backfilled into old
+# rows; a rebuild picks those up.
+HASH_INDEX_REBUILD_INTERVAL = 10 * 60
+
+# Reports closer than this to a new one are flagged as possibly the same site
+NEARBY_RADIUS_M = 50
+NEARBY_LIMIT = 5
+
+_SIGN_BIT = 1 << 63
+
+
+def hash_to_db(value):
+    """Map an unsigned 64-bit hash onto the signed bigint range."""
+    return value - (1 << 64) if value & _SIGN_BIT else value
+
+
+def hash_from_db(value):
+    return value & ((1 << 64) - 1)
+
+
+class MultiIndexHash:
+    """Hamming-distance index over 64-bit hashes (multi-index hashing).
+
+    Each hash is split into ``max_distance + 1`` disjoint bit blocks with one
+    lookup table per block. Two hashes within ``max_distance`` bits must
+    agree exactly on at least one block (pigeonhole), so a query only checks
+    the few candidates sharing a block with it.
+    """
+
+    def __init__(self, max_distance):
+        self.max_distance = max_distance
+        count = max_distance + 1
+        self.blocks = []
+        shift = 0
+        for i in range(count):
+            width = 64 // count + (1 if i < 64 % count else 0)
+            self.blocks.append((shift, (1 << width) - 1))
+            shift += width
+        self.tables = [{} for _ in self.blocks]
+        self.hashes = {}
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def add(self, key, value):
+        self.hashes[key] = value
+        for (shift, mask), table in zip(self.blocks, self.tables):
+            table.setdefault((value >> shift) & mask, []).append(key)
+
+    def search(self, value):
+        """Return [(key, distance)] for stored hashes within max_distance."""
+        seen = set()
+        matches = []
+        for (shift, mask), table in zip(self.blocks, self.tables):
+            for key in table.get((value >> shift) & mask, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                distance = (self.hashes[key] ^ value).bit_count()
+                if distance <= self.max_distance:
+                    matches.append((key, distance))
+        return matches
+
+
+class PhotoHashIndex:
+    """Process-wide index of submission photo hashes.
+
+    Built on first use and then topped up with rows newer than the last one
+    loaded, so each lookup costs one indexed query plus the in-memory search.
+    Every HASH_INDEX_REBUILD_INTERVAL seconds it is rebuilt from scratch to
+    catch rows the top-up skipped. Matches are re-checked against the
+    database, so deleted or rejected submissions drop out.
+    """
+
+    def __init__(self, max_distance=DUPLICATE_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.index = MultiIndexHash(max_distance)
+        self.last_pk = 0
+        self.built_at = None
+        self.lock = threading.Lock()
+
+    def _load(self, index, after_pk):
+        """Add hashed rows past ``after_pk`` to ``index``; return the last pk."""
+        rows = (
+            Submission.objects.filter(pk__gt=after_pk, photo_hash__isnull=False)
+            .order_by("pk")
+            .values_list("pk", "photo_hash")
+        )
+        for pk, value in rows.iterator(chunk_size=5000):
+            index.add(pk, hash_from_db(value))
+            after_pk = pk
+        return after_pk
+
+    def refresh(self):
+        with self.lock:
+            now = time.monotonic()
+            if self.built_at is None or now - self.built_at >= HASH_INDEX_REBUILD_INTERVAL:
+                index = MultiIndexHash(self.max_distance)
+                self.last_pk = self._load(index, 0)
+                self.index = index
+                self.built_at = now
+            else:
+                self.last_pk = self._load(self.index, self.last_pk)
+
+    def find(self, value, exclude_pk=None, limit=SIMILAR_PHOTOS_LIMIT):
+        """Return up to ``limit`` [(Submission, distance)] non-rejected near-duplicates.
+
+        Closest first. Candidates are checked against the database a
+        ``limit``-sized slice at a time, so a hash shared by thousands of
+        uploads still costs a query or two.
+        """
+        self.refresh()
+        matches = {
+            pk: distance
+            for pk, distance in self.index.search(value)
+            if pk != exclude_pk
+        }
+        ranked = sorted(matches, key=lambda pk: (matches[pk], pk))
+        found = []
+        for start in range(0, len(ranked), limit):
+            chunk = ranked[start:start + limit]
+            submissions = (
+                Submission.objects.exclude(status=Submission.Status.REJECTED)
+                .select_related("category")
+                .in_bulk(chunk)
+            )
+            found.extend((submissions[pk], matches[pk]) for pk in chunk if pk in submissions)
+            if len(found) >= limit:
+                break
+        return found[:limit]
+
+
+photo_hash_index = PhotoHashIndex()
+
+
+def find_similar_photos(photo_hash, exclude_pk=None, limit=SIMILAR_PHOTOS_LIMIT):
+    """Return the ``limit`` closest [(Submission, distance)] nearly matching a hash.
+
+    ``photo_hash`` may be the unsigned value or the signed database value.
+    """
+    if photo_hash is None:
+        return []
+    return photo_hash_index.find(hash_from_db(photo_hash), exclude_pk=exclude_pk, limit=limit)
+
+
+def nearby_submissions(point, radius_m=NEARBY_RADIUS_M, exclude_pk=None, limit=NEARBY_LIMIT):
+    """Return the closest non-rejected submissions within ``radius_m`` of a point.
+
+    ST_DWithin on the geography column is answered from its GiST index, so
+    only the handful of rows inside the radius are ever sorted by distance.
+    Each result carries a ``distance`` annotation.
+    """
+    qs = (
+        Submission.objects.filter(location__dwithin=(point, D(m=radius_m)))
+        .exclude(status=Submission.Status.REJECTED)
+        .select_related("category")
+        .annotate(distance=Distance("location", point))
+        .order_by("distance")
+    )
+    if exclude_pk is not None:
+        qs = qs.exclude(pk=exclude_pk)
+    return list(qs[:limit])
@@ -0,0 +1,288 @@
+"""Streaming bulk export of submissions as CSV, GeoJSON lines or GeoPackage.
+
+Rows are read with a server-side cursor (``.iterator()``) and written as
+they arrive, so memory use doesn't depend on the number of rows. Photos
+can be bundled with the data into a zip that is itself streamed.
+"""
+
+import csv
+import io
+import json
+import os
+import sqlite3
+import struct
+import tempfile
+import zipfile
+from pathlib import PurePosixPath
+
+from django.utils import timezone
+
+from .models import Submission
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_COLUMNS = (
+    "id",
+    "category",
+    "category_name",
+    "severity",
+    "status",
+    "latitude",
+    "longitude",
+    "description",
+    "created_at",
+    "updated_at",
+    "cleaned_at",
+    "photo",
+)
+
+# format -> (content type, file extension)
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/geo+json-seq", "geojsonl"),
+    "gpkg": ("application/geopackage+sqlite3", "gpkg"),
+}
+
+# Flush the streamed zip to the client in blocks of about this size
+ZIP_FLUSH_BYTES = 256 * 1024
+
+
+def export_rows(queryset):
+    """Yield one tuple per submission, in EXPORT_COLUMNS order."""
+    storage = Submission._meta.get_field("photo").storage
+    rows = queryset.order_by("pk").values_list(
+        "pk", "category__slug", "category__name", "severity", "status",
+        "latitude", "longitude", "description",
+        "created_at", "updated_at", "cleaned_at", "photo",
+    )
+    for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        (pk, category, category_name, severity, status, lat, lng, description,
+         created_at, updated_at, cleaned_at, photo) = row
+        yield (
+            pk, category, category_name, severity, status,
+            float(lat), float(lng), description,
+            created_at.isoformat(),
+            updated_at.isoformat(),
+            cleaned_at.isoformat() if cleaned_at else None,
+            storage.url(photo) if photo else None,
+        )
+
+
+class _Echo:
+    """A file-like object whose write() returns the data, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_ndjson(rows):
+    """Yield one GeoJSON Feature per line."""
+    for row in rows:
+        properties = dict(zip(EXPORT_COLUMNS, row))
+        yield json.dumps({
+            "type": "Feature",
+            "geometry": {
+                "type": "Point",
+                "coordinates": [properties.pop("longitude"), properties.pop("latitude")],
+            },
+            "properties": properties,
+        }) + "\n"
+
+
+WGS84_WKT = (
+    'GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563,'
+    'AUTHORITY["EPSG","7030"]],AUTHORITY["EPSG","6326"]],PRIMEM["Greenwich",0,'
+    'AUTHORITY["EPSG","8901"]],UNIT["degree",0.0174532925199433,'
+    'AUTHORITY["EPSG","9122"]],AUTHORITY["EPSG","4326"]]'
+)
+
+GPKG_SCHEMA = """
+    CREATE TABLE gpkg_spatial_ref_sys (
+        srs_name TEXT NOT NULL, srs_id INTEGER PRIMARY KEY,
+        organization TEXT NOT NULL, organization_coordsys_id INTEGER NOT NULL,
+        definition TEXT NOT NULL, description TEXT
+    );
+    CREATE TABLE gpkg_contents (
+        table_name TEXT NOT NULL PRIMARY KEY, data_type TEXT NOT NULL,
+        identifier TEXT UNIQUE, description TEXT DEFAULT '',
+        last_change DATETIME NOT NULL,
+        min_x DOUBLE, min_y DOUBLE, max_x DOUBLE, max_y DOUBLE,
+        srs_id INTEGER REFERENCES gpkg_spatial_ref_sys(srs_id)
+    );
+    CREATE TABLE gpkg_geometry_columns (
+        table_name TEXT NOT NULL, column_name TEXT NOT NULL,
+        geometry_type_name TEXT NOT NULL, srs_id INTEGER NOT NULL,
+        z TINYINT NOT NULL, m TINYINT NOT NULL,
+        CONSTRAINT pk_geom_cols PRIMARY KEY (table_name, column_name)
+    );
+    CREATE TABLE submissions (
+        fid INTEGER PRIMARY KEY AUTOINCREMENT,
+        geom POINT,
+        submission_id INTEGER NOT NULL,
+        category TEXT, category_name TEXT, severity TEXT, status TEXT,
+        description TEXT, created_at DATETIME, updated_at DATETIME,
+        cleaned_at DATETIME, photo TEXT
+    );
+"""
+
+
+def _gpkg_point(lng, lat):
+    """A GeoPackage geometry blob: little-endian header without envelope, then WKB."""
+    return struct.pack("<2sBBi", b"GP", 0, 1, 4326) + struct.pack("<BIdd", 1, 1, lng, lat)
+
+
+def write_geopackage(rows, path):
+    """Write rows to a new GeoPackage at ``path``, committing per chunk."""
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA application_id = 1196444487")  # "GPKG"
+        conn.execute("PRAGMA user_version = 10300")
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.executescript(GPKG_SCHEMA)
+        conn.executemany(
+            "INSERT INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                ("Undefined cartesian SRS", -1, "NONE", -1, "undefined", None),
+                ("Undefined geographic SRS", 0, "NONE", 0, "undefined", None),
+                ("WGS 84 geodetic", 4326, "EPSG", 4326, WGS84_WKT, None),
+            ],
+        )
+        conn.execute(
+            "INSERT INTO gpkg_geometry_columns VALUES ('submissions', 'geom', 'POINT', 4326, 0, 0)"
+        )
+
+        bounds = [180.0, 90.0, -180.0, -90.0]
+        batch = []
+
+        def flush():
+            conn.executemany(
+                "INSERT INTO submissions (geom, submission_id, category, category_name, "
+                "severity, status, description, created_at, updated_at, cleaned_at, photo) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                batch,
+            )
+            conn.commit()
+            batch.clear()
+
+        for (pk, category, category_name, severity, status, lat, lng, description,
+             created_at, updated_at, cleaned_at, photo) in rows:
+            bounds = [min(bounds[0], lng), min(bounds[1], lat), max(bounds[2], lng), max(bounds[3], lat)]
+            batch.append((
+                _gpkg_point(lng, lat), pk, category, category_name, severity, status,
+                description, created_at, updated_at, cleaned_at, photo,
+            ))
+            if len(batch) >= EXPORT_CHUNK_SIZE:
+                flush()
+        if batch:
+            flush()
+
+        if bounds[0] > bounds[2]:
+            bounds = [None] * 4
+        conn.execute(
+            "INSERT INTO gpkg_contents VALUES ('submissions', 'features', 'submissions', "
+            "'Desert Trash GJ submissions', ?, ?, ?, ?, ?, 4326)",
+            [timezone.now().isoformat(timespec="milliseconds").replace("+00:00", "Z"), *bounds],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _file_chunks(f, size=64 * 1024):
+    while True:
+        chunk = f.read(size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _geopackage_chunks(rows):
+    """Build a GeoPackage in a temp file, then yield its bytes."""
+    fd, path = tempfile.mkstemp(suffix=".gpkg")
+    os.close(fd)
+    try:
+        write_geopackage(rows, path)
+        with open(path, "rb") as f:
+            yield from _file_chunks(f)
+    finally:
+        os.unlink(path)
+
+
+def export_data(queryset, fmt):
+    """Yield the export of ``queryset`` in ``fmt`` as bytes."""
+    rows = export_rows(queryset)
+    if fmt == "gpkg":
+        return _geopackage_chunks(rows)
+    lines = stream_csv(rows) if fmt == "csv" else stream_ndjson(rows)
+    return (line.encode() for line in lines)
+
+
+class _ZipOutput(io.RawIOBase):
+    """An unseekable sink for ZipFile that hands written bytes to a generator."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def pending(self):
+        return len(self._buffer)
+
+    def drain(self):
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def export_zip(queryset, fmt):
+    """Yield a zip of the data file plus each submission's photo.
+
+    Nothing is seeked, so entries carry data descriptors and the zip can go
+    straight to a response. Photos are stored uncompressed since JPEGs
+    don't shrink. The zip's central directory keeps a small record per
+    entry until the end, so memory grows by a few hundred bytes per photo.
+    """
+    out = _ZipOutput()
+    storage = Submission._meta.get_field("photo").storage
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as zf:
+        with zf.open(f"submissions.{EXPORT_FORMATS[fmt][1]}", "w", force_zip64=True) as dest:
+            for chunk in export_data(queryset, fmt):
+                dest.write(chunk)
+                if out.pending() >= ZIP_FLUSH_BYTES:
+                    yield out.drain()
+
+        photos = queryset.order_by("pk").exclude(photo="").values_list("pk", "photo")
+        for pk, name in photos.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            try:
+                src = storage.open(name, "rb")
+            except FileNotFoundError:
+                continue
+            info = zipfile.ZipInfo(
+                f"photos/{pk}{PurePosixPath(name).suffix}",
+                date_time=timezone.localtime().timetuple()[:6],
+            )
+            info.compress_type = zipfile.ZIP_STORED
+            with src, zf.open(info, "w", force_zip64=True) as dest:
+                for chunk in src.chunks():
+                    dest.write(chunk)
+                    if out.pending() >= ZIP_FLUSH_BYTES:
+                        yield out.drain()
+    yield out.drain()
@@ -0,0 +1,74 @@
+"""The map's submission filters, shared by the views and export command."""
+
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.gis.geos import MultiPolygon, Polygon
+from django.utils import timezone
+
+from .models import PUBLIC_STATUSES, Submission
+
+
+def parse_bbox(value):
+    """Parse a "west,south,east,north" string into a Polygon, or None.
+
+    A box with west > east crosses the antimeridian and is returned as a
+    MultiPolygon of its two halves.
+    """
+    try:
+        west, south, east, north = (float(v) for v in value.split(","))
+    except (AttributeError, ValueError):
+        return None
+    if not (-180 <= west <= 180 and -180 <= east <= 180 and -90 <= south < north <= 90):
+        return None
+    if west < east:
+        return Polygon.from_bbox((west, south, east, north))
+    if west > east:
+        return MultiPolygon(
+            Polygon.from_bbox((west, south, 180, north)),
+            Polygon.from_bbox((-180, south, east, north)),
+        )
+    return None
+
+
+def public_submissions(params):
+    """Return public submissions filtered by map query parameters.
+
+    ``params`` is a QueryDict such as request.GET; bbox is left to callers.
+    """
+    qs = Submission.objects.filter(status__in=PUBLIC_STATUSES)
+
+    # Filter by category slug(s)
+    categories = params.getlist("category")
+    if categories:
+        qs = qs.filter(category__slug__in=categories)
+
+    # Filter by severity
+    severity = params.get("severity")
+    if severity:
+        qs = qs.filter(severity=severity)
+
+    # Filter by status
+    status = params.get("status")
+    if status and status in PUBLIC_STATUSES:
+        qs = qs.filter(status=status)
+
+    # Filter by date range, as plain ranges on created_at so its indexes
+    # apply (created_at__date would wrap the column in a function)
+    date_from = local_day_start(params.get("date_from"))
+    if date_from:
+        qs = qs.filter(created_at__gte=date_from)
+
+    date_to = local_day_start(params.get("date_to"), days_after=1)
+    if date_to:
+        qs = qs.filter(created_at__lt=date_to)
+
+    return qs
+
+
+def local_day_start(value, days_after=0):
+    """Return local midnight of an ISO date (plus ``days_after``), or None."""
+    try:
+        day = date.fromisoformat(value) + timedelta(days=days_after)
+    except (TypeError, ValueError):
+        return None
+    return timezone.make_aware(datetime.combine(day, time.min))
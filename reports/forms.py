@@ -10,6 +10,8 @@ class SubmissionForm(forms.ModelForm):
     latitude = forms.FloatField(widget=forms.HiddenInput, required=False)
     longitude = forms.FloatField(widget=forms.HiddenInput, required=False)
     temp_photo = forms.CharField(widget=forms.HiddenInput, required=False)
+    # Set when the uploader has seen the nearby reports and submits anyway
+    confirm_nearby = forms.BooleanField(required=False)
 
     class Meta:
         model = Submission
@@ -0,0 +1,151 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.core.files.storage import FileSystemStorage
+from django.db.models.functions import Left
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.encoding import filepath_to_uri
+
+from .models import Submission
+
+STREAM_CHUNK_SIZE = 2000
+DEFAULT_PAGE_SIZE = 2000
+MAX_PAGE_SIZE = 5000
+# Keyset order for paginated feeds; the cursor encodes the last row's values.
+PAGE_ORDERING = ("-created_at", "-pk")
+# Primary keys are bigints; anything outside this can't be a real row
+MAX_PK = 2**63 - 1
+# Features are joined into one string per batch so the response isn't
+# flushed one tiny write at a time.
+FEATURES_PER_WRITE = 200
+
+MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun",
+          "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+FEATURE_COLUMNS = (
+    "pk", "longitude", "latitude", "category__slug", "category__name",
+    "category__color", "severity", "status", "short_description", "created_at",
+    "photo", "photo_derivatives",
+)
+
+_URL_SENTINEL = 987654321
+
+
+def _detail_url_prefix():
+    """Return the detail URL split around the pk, e.g. ("/submission/", "/")."""
+    url = reverse("reports:submission_detail", args=[_URL_SENTINEL])
+    prefix, _, suffix = url.rpartition(str(_URL_SENTINEL))
+    return prefix, suffix
+
+
+def _photo_url_builder():
+    """Return a function mapping a stored photo name to its URL.
+
+    FileSystemStorage URLs are just base_url + the quoted name, so skip the
+    per-row storage.url() call for it; other backends fall back to it.
+    """
+    storage = Submission._meta.get_field("photo").storage
+    if isinstance(storage, FileSystemStorage):
+        base_url = storage.base_url
+        return lambda name: base_url + filepath_to_uri(name) if name else ""
+    return lambda name: storage.url(name) if name else ""
+
+
+def encode_cursor(created_at, pk):
+    """Encode a (created_at, pk) keyset position as an opaque token."""
+    raw = f"{created_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Decode a cursor token into (created_at, pk), or None if it's malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        created_at, pk = raw.split("|")
+        created_at, pk = datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if not 0 < pk <= MAX_PK:
+        return None
+    return created_at, pk
+
+
+def stream_feature_collection(queryset, chunk_size=STREAM_CHUNK_SIZE, limit=None, extra=None):
+    """Yield a GeoJSON FeatureCollection for ``queryset`` piece by piece.
+
+    Only the columns needed for the map are fetched, rows are read through a
+    server-side cursor, and each feature is encoded as soon as it is read,
+    so memory stays flat regardless of how many rows match. The output is
+    the same document submissions_geojson has always returned.
+
+    With ``limit``, at most that many features are written and, if more rows
+    follow, a ``next_cursor`` member points at the next page. The queryset
+    must then already be ordered by PAGE_ORDERING.
+
+    ``extra`` is a dict of further top-level members, written after the
+    features.
+    """
+    rows = queryset.annotate(
+        short_description=Left("description", 200)
+    ).values_list(*FEATURE_COLUMNS)
+    if limit is not None:
+        # One extra row tells us whether there is another page
+        rows = rows[:limit + 1]
+    status_labels = dict(Submission.Status.choices)
+    detail_prefix, detail_suffix = _detail_url_prefix()
+    photo_url = _photo_url_builder()
+    encode = json.JSONEncoder(ensure_ascii=True).encode
+
+    yield '{"type": "FeatureCollection", "features": ['
+    batch = []
+    first = True
+    written = 0
+    last = None
+    next_cursor = None
+    for row in rows.iterator(chunk_size=chunk_size):
+        if limit is not None and written == limit:
+            next_cursor = encode_cursor(*last)
+            break
+        (pk, lng, lat, cat_slug, cat_name, color, severity, status, desc,
+         created, photo, derivs) = row
+        # The popup shows a small thumbnail, so prefer the thumb derivative
+        thumb = derivs.get("thumb") if derivs else None
+        if thumb:
+            photo = thumb["jpeg"]
+        written += 1
+        last = (created, pk)
+        batch.append(encode({
+            "type": "Feature",
+            "geometry": {
+                "type": "Point",
+                "coordinates": [float(lng), float(lat)],
+            },
+            "properties": {
+                "id": pk,
+                "category": cat_slug,
+                "category_name": cat_name,
+                "color": color,
+                "severity": severity,
+                "status": status,
+                "status_display": status_labels.get(status, status),
+                "description": desc or "",
+                "created_at": f"{MONTHS[created.month - 1]} {created.day:02d}, {created.year}",
+                # Local date, for filtering by date range on the client
+                "created_on": timezone.localdate(created).isoformat(),
+                "photo_url": photo_url(photo),
+                "detail_url": f"{detail_prefix}{pk}{detail_suffix}",
+            },
+        }))
+        if len(batch) >= FEATURES_PER_WRITE:
+            yield ("" if first else ", ") + ", ".join(batch)
+            first = False
+            batch = []
+    if batch:
+        yield ("" if first else ", ") + ", ".join(batch)
+    tail = dict(extra or {})
+    if next_cursor:
+        tail["next_cursor"] = next_cursor
+    yield "]" + "".join(f", {encode(key)}: {encode(value)}" for key, value in tail.items()) + "}"
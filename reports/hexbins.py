@@ -0,0 +1,169 @@
+"""Hexagonal binning of public submissions for county-wide map views.
+
+Points are projected to Web Mercator and assigned to pointy-top hexagons
+in axial (q, r) coordinates. There is one grid per resolution, sized so a
+hexagon is about HEX_RADIUS_PX across at the matching map zoom.
+"""
+
+import math
+from collections import Counter
+
+from django.db import connection, transaction
+
+from .models import HexBin, PUBLIC_STATUSES, Submission
+from .stats import increment_counts
+
+EARTH_RADIUS = 6378137.0  # Web Mercator sphere, meters
+METERS_PER_PIXEL_Z0 = 2 * math.pi * EARTH_RADIUS / 512  # 512px Mapbox tiles
+HEX_RADIUS_PX = 30
+
+# Map zoom levels served with hexagons; resolution i is HEXBIN_ZOOMS[i]
+HEXBIN_ZOOMS = range(4, 10)
+HEX_SIZES = tuple(HEX_RADIUS_PX * METERS_PER_PIXEL_Z0 / 2 ** z for z in HEXBIN_ZOOMS)
+
+SEVERITY_WEIGHTS = {
+    Submission.Severity.LOW: 1,
+    Submission.Severity.MEDIUM: 2,
+    Submission.Severity.HIGH: 3,
+}
+
+HEXBIN_COLUMNS = ("resolution", "q", "r", "category_id", "severity", "status")
+
+SQRT3 = math.sqrt(3)
+
+
+def resolution_for_zoom(zoom):
+    return min(max(int(zoom) - HEXBIN_ZOOMS.start, 0), len(HEX_SIZES) - 1)
+
+
+def _to_mercator(lng, lat):
+    lat = max(min(lat, 85.05112878), -85.05112878)
+    x = EARTH_RADIUS * math.radians(lng)
+    y = EARTH_RADIUS * math.log(math.tan(math.pi / 4 + math.radians(lat) / 2))
+    return x, y
+
+
+def _from_mercator(x, y):
+    lng = math.degrees(x / EARTH_RADIUS)
+    lat = math.degrees(2 * math.atan(math.exp(y / EARTH_RADIUS)) - math.pi / 2)
+    return lng, lat
+
+
+def hex_cell(x, y, size):
+    """Return the axial (q, r) of the hexagon containing mercator (x, y)."""
+    fq = (SQRT3 / 3 * x - y / 3) / size
+    fr = (2 / 3 * y) / size
+    # Round in cube coordinates, fixing the component with the largest error
+    fs = -fq - fr
+    q, r, s = round(fq), round(fr), round(fs)
+    dq, dr, ds = abs(q - fq), abs(r - fr), abs(s - fs)
+    if dq > dr and dq > ds:
+        q = -r - s
+    elif dr > ds:
+        r = -q - s
+    return q, r
+
+
+def hex_polygon(q, r, size):
+    """Return the closed lng/lat ring of hexagon (q, r)."""
+    cx = size * (SQRT3 * q + SQRT3 / 2 * r)
+    cy = size * 1.5 * r
+    ring = []
+    for i in range(6):
+        angle = math.radians(60 * i - 30)
+        lng, lat = _from_mercator(cx + size * math.cos(angle), cy + size * math.sin(angle))
+        ring.append([round(lng, 6), round(lat, 6)])
+    ring.append(ring[0])
+    return ring
+
+
+def hexbin_key(lng, lat, category_id, severity, status):
+    """What a submission contributes to the bins, or None if it's not public."""
+    if status not in PUBLIC_STATUSES or None in (lng, lat, category_id, severity):
+        return None
+    return (float(lng), float(lat), category_id, severity, status)
+
+
+def _cell_deltas(deltas):
+    """Expand ``{hexbin_key: change}`` into per-resolution HexBin keys."""
+    cells = Counter()
+    for key, n in deltas.items():
+        if key is None or not n:
+            continue
+        lng, lat, category_id, severity, status = key
+        x, y = _to_mercator(lng, lat)
+        for resolution, size in enumerate(HEX_SIZES):
+            cells[(resolution, *hex_cell(x, y, size), category_id, severity, status)] += n
+    return cells
+
+
+def apply_hexbin_deltas(deltas):
+    """Add ``{hexbin_key: change}`` to the bins at every resolution."""
+    increment_counts(HexBin, HEXBIN_COLUMNS, _cell_deltas(deltas))
+
+
+def count_hexbins(submissions):
+    """Deltas that add each of ``submissions`` to the bins."""
+    return Counter(
+        hexbin_key(s.longitude, s.latitude, s.category_id, s.severity, s.status)
+        for s in submissions
+    )
+
+
+def rebuild_hexbins(submission_model=Submission, hexbin_model=HexBin):
+    """Recompute every bin from the public submissions.
+
+    Locked against incremental updates like rebuild_stats, so a submission
+    saved during the rebuild is added on top of the new bins, not lost.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f"LOCK TABLE {hexbin_model._meta.db_table} IN EXCLUSIVE MODE")
+        rows = (
+            submission_model.objects.filter(status__in=PUBLIC_STATUSES)
+            .order_by()
+            .values_list("longitude", "latitude", "category_id", "severity", "status")
+        )
+        cells = _cell_deltas(Counter(hexbin_key(*row) for row in rows.iterator()))
+        hexbin_model.objects.all().delete()
+        return len(hexbin_model.objects.bulk_create(
+            [
+                hexbin_model(**dict(zip(HEXBIN_COLUMNS, key)), count=n)
+                for key, n in cells.items()
+                if n
+            ],
+            batch_size=2000,
+        ))
+
+
+def bin_points(rows, resolution):
+    """Bin (lng, lat, severity, count) rows into {(q, r): [count, score]}."""
+    size = HEX_SIZES[resolution]
+    bins = {}
+    for lng, lat, severity, count in rows:
+        cell = hex_cell(*_to_mercator(float(lng), float(lat)), size)
+        totals = bins.setdefault(cell, [0, 0])
+        totals[0] += count
+        totals[1] += count * SEVERITY_WEIGHTS.get(severity, 1)
+    return bins
+
+
+def feature_collection(bins, resolution):
+    """Build a GeoJSON FeatureCollection from {(q, r): [count, score]}."""
+    size = HEX_SIZES[resolution]
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Polygon", "coordinates": [hex_polygon(q, r, size)]},
+            "properties": {"count": count, "score": score},
+        }
+        for (q, r), (count, score) in bins.items()
+        if count > 0
+    ]
+    return {
+        "type": "FeatureCollection",
+        "resolution": resolution,
+        "max_count": max((f["properties"]["count"] for f in features), default=0),
+        "max_score": max((f["properties"]["score"] for f in features), default=0),
+        "features": features,
+    }
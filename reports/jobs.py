@@ -0,0 +1,178 @@
+import logging
+import traceback
+from datetime import timedelta
+from pathlib import PurePosixPath
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import PhotoJob
+from .utils import process_photo, render_derivatives
+
+logger = logging.getLogger(__name__)
+
+VISIBILITY_TIMEOUT = timedelta(minutes=10)
+RETRY_BASE_DELAY = timedelta(seconds=30)
+
+
+def enqueue_photo_job(submission):
+    """Queue the uploaded photo of ``submission`` for processing."""
+    return PhotoJob.objects.create(submission=submission)
+
+
+def claim_job():
+    """Claim the next ready job for this worker, or return None.
+
+    Ready means queued and due, or running with an expired visibility
+    timeout (its worker died). Rows locked by other workers are skipped, so
+    any number of workers can poll the same table.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            PhotoJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=PhotoJob.Status.QUEUED, run_after__lte=now)
+                | Q(status=PhotoJob.Status.RUNNING, locked_until__lt=now)
+            )
+            .order_by("run_after")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = PhotoJob.Status.RUNNING
+        job.attempts += 1
+        job.locked_until = now + VISIBILITY_TIMEOUT
+        job.save(update_fields=["status", "attempts", "locked_until", "updated_at"])
+    return job
+
+
+class LeaseLost(Exception):
+    """Another worker reclaimed a job after its visibility timeout ran out."""
+
+
+def renew_lease(job):
+    """Lock a claimed job's row and extend its lease by VISIBILITY_TIMEOUT.
+
+    Call inside transaction.atomic(); the row stays locked until it ends,
+    so no other worker can reclaim the job meanwhile. Raises LeaseLost if
+    one already has.
+    """
+    held = (
+        PhotoJob.objects.select_for_update()
+        .filter(pk=job.pk, status=PhotoJob.Status.RUNNING, locked_until=job.locked_until)
+        .values_list("pk", flat=True)
+        .first()
+    )
+    if held is None:
+        raise LeaseLost(job.pk)
+    job.locked_until = timezone.now() + VISIBILITY_TIMEOUT
+    PhotoJob.objects.filter(pk=job.pk).update(locked_until=job.locked_until)
+
+
+def run_job(job):
+    """Process a claimed job, recording success, a retry, or failure.
+
+    Nothing is written, to storage or the database, unless the job still
+    holds the lease from claim_job; if it ran past VISIBILITY_TIMEOUT and
+    another worker reclaimed it, that worker's run decides. Returns whether
+    the outcome was recorded.
+    """
+    try:
+        process_submission_photo(job.submission, job)
+    except LeaseLost:
+        logger.warning("Photo job %s lost its lease; outcome not recorded", job.pk)
+        return False
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            job.status = PhotoJob.Status.FAILED
+            logger.error("Photo job %s failed permanently", job.pk)
+        else:
+            job.status = PhotoJob.Status.QUEUED
+            job.run_after = timezone.now() + RETRY_BASE_DELAY * 2 ** (job.attempts - 1)
+            logger.warning("Photo job %s failed, retrying at %s", job.pk, job.run_after)
+    else:
+        job.status = PhotoJob.Status.DONE
+    # Renewed by process_submission_photo if it got as far as saving
+    lease = job.locked_until
+    job.locked_until = None
+    recorded = PhotoJob.objects.filter(
+        pk=job.pk, status=PhotoJob.Status.RUNNING, locked_until=lease
+    ).update(
+        status=job.status,
+        run_after=job.run_after,
+        locked_until=None,
+        last_error=job.last_error,
+        updated_at=timezone.now(),
+    )
+    if not recorded:
+        logger.warning("Photo job %s lost its lease; outcome not recorded", job.pk)
+    return bool(recorded)
+
+
+def process_submission_photo(submission, job=None):
+    """Replace a submission's original upload with the resized JPEG and its
+    derivatives.
+
+    The photo is decoded and rendered first; storage and the submission are
+    only written after renewing ``job``'s lease, which raises LeaseLost if
+    another worker has taken it over.
+    """
+    original_name = submission.photo.name
+    with submission.photo.open("rb") as original:
+        _, exif_data, resized = process_photo(original)
+    rendered = render_derivatives(resized)
+
+    with transaction.atomic():
+        if job is not None:
+            renew_lease(job)
+        submission.photo.save(resized.name, resized, save=False)
+        store_derivatives(submission, rendered=rendered)
+        submission.processing = False
+        update_fields = ["photo", "photo_derivatives", "processing", "updated_at"]
+        if submission.exif_data is None and exif_data:
+            submission.exif_data = exif_data
+            update_fields.append("exif_data")
+        submission.save(update_fields=update_fields)
+
+    if original_name != submission.photo.name:
+        submission.photo.storage.delete(original_name)
+
+
+def store_derivatives(submission, source=None, rendered=None):
+    """Render and store the photo derivatives of ``submission``.
+
+    ``source`` is the resized photo if the caller still has it in memory;
+    otherwise the stored photo is read back. A caller that has already run
+    render_derivatives passes its result as ``rendered``. Derivatives are
+    saved next to the photo and any previous ones are deleted. The caller
+    saves the submission.
+    """
+    storage = submission.photo.storage
+    if rendered is None and source is None:
+        with submission.photo.open("rb") as photo:
+            rendered = render_derivatives(photo)
+    elif rendered is None:
+        rendered = render_derivatives(source)
+
+    stem = PurePosixPath(submission.photo.name).with_suffix("")
+    previous = submission.photo_derivatives or {}
+    derivatives = {}
+    for size, variant in rendered.items():
+        entry = {"width": variant["width"], "height": variant["height"]}
+        for fmt, ext in (("jpeg", "jpg"), ("webp", "webp")):
+            if fmt in variant:
+                entry[fmt] = storage.save(f"{stem}_{size}.{ext}", variant[fmt])
+            else:
+                entry[fmt] = submission.photo.name
+        derivatives[size] = entry
+    submission.photo_derivatives = derivatives
+
+    keep = {submission.photo.name}
+    for entry in previous.values():
+        for fmt in ("jpeg", "webp"):
+            name = entry.get(fmt)
+            if name and name not in keep:
+                storage.delete(name)
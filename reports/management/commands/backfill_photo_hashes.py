@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from reports.duplicates import hash_to_db
+from reports.models import Submission
+from reports.utils import photo_dhash
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute perceptual hashes for submissions uploaded before hashing "
+        "existed. Web workers pick the new hashes up when their duplicate "
+        "index next rebuilds."
+    )
+
+    def handle(self, *args, **options):
+        qs = Submission.objects.filter(photo_hash__isnull=True).order_by("pk")
+        done = 0
+        for submission in qs.iterator(chunk_size=100):
+            with submission.photo.open("rb") as photo:
+                value = photo_dhash(photo)
+            if value is None:
+                self.stderr.write(f"Submission #{submission.pk}: could not hash photo")
+                continue
+            Submission.objects.filter(pk=submission.pk).update(photo_hash=hash_to_db(value))
+            done += 1
+        self.stdout.write(self.style.SUCCESS(f"Hashed {done} photos."))
@@ -0,0 +1,83 @@
+import random
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.test import RequestFactory
+
+from reports.models import Category, Submission, User
+from reports.geojson import stream_feature_collection
+from reports.seeding import build_submissions
+from reports.views import _public_submissions, _submission_feature
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the list-building and streaming GeoJSON serializers on "
+        "synthetic data. All rows are created in a transaction that is "
+        "rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, nargs="+", default=[1000, 10000, 100000],
+            help="Row counts to benchmark (default: 1000 10000 100000).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(sorted(options["rows"]))
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, row_counts):
+        user = User.objects.create_user("benchmark@example.com")
+        category = Category.objects.create(
+            name="Benchmark", slug="benchmark-geojson", color="#888888"
+        )
+        request = RequestFactory().get("/api/submissions.geojson")
+
+        self.stdout.write(f"{'rows':>8} {'path':>10} {'seconds':>9} {'peak MiB':>9} {'bytes':>11}")
+        created = 0
+        for count in row_counts:
+            self._seed(user, category, count - created)
+            created = count
+            for name, func in (("list", self._list_path), ("streaming", self._stream_path)):
+                tracemalloc.start()
+                start = time.perf_counter()
+                size = func(request)
+                elapsed = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                self.stdout.write(
+                    f"{count:>8} {name:>10} {elapsed:>9.3f} {peak / 2**20:>9.1f} {size:>11}"
+                )
+
+    def _seed(self, user, category, count):
+        subs = build_submissions(
+            count, [user], [category], random.Random(), status=Submission.Status.APPROVED
+        )
+        Submission.objects.bulk_create(subs, batch_size=2000)
+
+    def _list_path(self, request):
+        """The pre-streaming implementation: build every feature, then encode."""
+        qs = _public_submissions(request).select_related("category")
+        features = [_submission_feature(sub) for sub in qs]
+        response = JsonResponse({"type": "FeatureCollection", "features": features})
+        return len(response.content)
+
+    def _stream_path(self, request):
+        """The streaming serializer over the same unpaginated queryset."""
+        response = StreamingHttpResponse(
+            stream_feature_collection(_public_submissions(request)),
+            content_type="application/json",
+        )
+        return sum(len(chunk) for chunk in response.streaming_content)
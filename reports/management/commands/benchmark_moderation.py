@@ -0,0 +1,56 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from reports.hexbins import apply_hexbin_deltas, count_hexbins
+from reports.models import Category, Submission, User
+from reports.moderation import transition_submissions
+from reports.seeding import build_submissions
+from reports.stats import apply_stat_deltas, count_submissions
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure batch moderation throughput: approve, then mark cleaned, "
+        "batches of pending submissions. Seeded rows are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--batches", type=int, default=5)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        # Commits are real here, so the after-commit change events (cache
+        # version bump, tile invalidation) are included in the timings
+        user = User.objects.create_user("moderation-benchmark@example.com")
+        category = Category.objects.create(
+            name="Benchmark", slug="benchmark-moderation", color="#888888"
+        )
+        try:
+            self.stdout.write(f"{'batch':>6} {'action':>9} {'seconds':>9} {'items/s':>9}")
+            for n in range(options["batches"]):
+                pks = self._seed(user, category, batch_size)
+                for target in (Submission.Status.APPROVED, Submission.Status.CLEANED):
+                    start = time.perf_counter()
+                    result = transition_submissions(pks, target, user)
+                    elapsed = time.perf_counter() - start
+                    self.stdout.write(
+                        f"{n + 1:>6} {target:>9} {elapsed:>9.3f} "
+                        f"{len(result.updated) / elapsed:>9.0f}"
+                    )
+        finally:
+            Submission.objects.filter(category=category).delete()
+            category.delete()
+            user.delete()
+
+    def _seed(self, user, category, count):
+        subs = build_submissions(
+            count, [user], [category], random.Random(), status=Submission.Status.PENDING
+        )
+        subs = Submission.objects.bulk_create(subs)
+        # Counted so the transitions and the final delete balance out
+        apply_stat_deltas(count_submissions(subs))
+        apply_hexbin_deltas(count_hexbins(subs))
+        return [sub.pk for sub in subs]
@@ -0,0 +1,60 @@
+import random
+import statistics
+import time
+
+from django.contrib.gis.geos import Point
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from reports.duplicates import nearby_submissions
+from reports.models import Category, Submission, User
+from reports.seeding import build_submissions, random_point
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the submit-time nearby-report check against a seeded table. "
+        "Rows are created in a transaction that is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100000)
+        parser.add_argument("--queries", type=int, default=500)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options["rows"], options["queries"])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, rows, queries):
+        user = User.objects.create_user("nearby-benchmark@example.com")
+        category = Category.objects.create(
+            name="Benchmark", slug="benchmark-nearby", color="#888888"
+        )
+        rng = random.Random()
+        subs = build_submissions(rows, [user], [category], rng)
+        Submission.objects.bulk_create(subs, batch_size=5000)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE reports_submission")
+
+        timings = []
+        for _ in range(queries):
+            point = Point(*random_point(rng), srid=4326)
+            start = time.perf_counter()
+            nearby_submissions(point)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        timings.sort()
+        self.stdout.write(
+            f"{rows} rows, {queries} lookups: "
+            f"p50 {statistics.median(timings):.2f} ms, "
+            f"p99 {timings[int(len(timings) * 0.99) - 1]:.2f} ms, "
+            f"max {timings[-1]:.2f} ms"
+        )
@@ -0,0 +1,97 @@
+import multiprocessing
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from PIL import Image, ImageOps
+
+from reports.seeding import make_sample_photo
+from reports.utils import extract_gps_from_exif, process_photo
+
+# Representative phone camera resolutions (megapixels -> size)
+SAMPLES = {
+    12: (4032, 3024),
+    24: (6000, 4000),
+    48: (8000, 6000),
+}
+
+
+def legacy_pipeline(data, max_edge=1920, quality=85):
+    """The pre-draft-mode implementation: two opens and a full-size decode."""
+    image_file = BytesIO(data)
+    extract_gps_from_exif(image_file)
+    image_file.seek(0)
+    img = Image.open(image_file)
+    img = ImageOps.exif_transpose(img)
+    img = img.convert("RGB")
+    img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+    out = BytesIO()
+    img.save(out, format="JPEG", quality=quality)
+    return out
+
+
+def current_pipeline(data):
+    return process_photo(BytesIO(data))
+
+
+PIPELINES = {"legacy": legacy_pipeline, "draft": current_pipeline}
+
+
+def _memory_kib(field):
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise RuntimeError(f"{field} missing from /proc/self/status")
+
+
+def _measure(name, data, queue):
+    """Run one pipeline in a fresh process and report its times and peak RSS growth.
+
+    A forked child inherits the parent's high-water mark (ru_maxrss), which
+    includes building the sample, so the peak is reset through
+    /proc/self/clear_refs and read back from VmHWM instead (Linux only).
+    """
+    with open("/proc/self/clear_refs", "w") as clear_refs:
+        clear_refs.write("5")
+    baseline = _memory_kib("VmRSS")
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+    PIPELINES[name](data)
+    queue.put((
+        time.perf_counter() - start_wall,
+        time.process_time() - start_cpu,
+        _memory_kib("VmHWM") - baseline,
+    ))
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the photo pipeline against the previous full-decode "
+        "implementation on synthetic 12/24/48 MP JPEGs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repeat", type=int, default=3,
+            help="Runs per pipeline and sample; the best is reported (default: 3).",
+        )
+
+    def handle(self, *args, **options):
+        ctx = multiprocessing.get_context("fork")
+        self.stdout.write(f"{'MP':>4} {'pipeline':>9} {'wall s':>8} {'cpu s':>8} {'RSS MiB':>8}")
+        for megapixels, size in SAMPLES.items():
+            data = make_sample_photo(size)
+            for name in PIPELINES:
+                results = []
+                for _ in range(options["repeat"]):
+                    # A fresh process per run so the peak reflects this run only
+                    queue = ctx.Queue()
+                    proc = ctx.Process(target=_measure, args=(name, data, queue))
+                    proc.start()
+                    results.append(queue.get())
+                    proc.join()
+                wall, cpu, rss = min(results)
+                self.stdout.write(
+                    f"{megapixels:>4} {name:>9} {wall:>8.3f} {cpu:>8.3f} {rss / 1024:>8.1f}"
+                )
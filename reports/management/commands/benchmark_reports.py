@@ -0,0 +1,209 @@
+import itertools
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from reports.cache import bump_category_version, bump_map_data_version
+from reports.models import Category, Submission, User
+from reports.seeding import make_sample_photo
+from reports.utils import extract_gps_from_exif, process_photo, resize_photo
+from reports.views import moderate_list, submission_detail, submissions_geojson
+
+# A central slice of the county, roughly a city-level map view
+BENCHMARK_BBOX = "-108.70,39.00,-108.40,39.20"
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the main views and the photo helpers against the current "
+        "database and write wall time, query counts and peak memory to JSON. "
+        "Seed data first with seed_submissions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default="benchmark.json", help="JSON file to write.")
+        parser.add_argument(
+            "--repeat", type=int, default=5,
+            help="Timed runs per case; the median is reported (default: 5).",
+        )
+        parser.add_argument("--compare", help="Previous results file to compare against.")
+        parser.add_argument(
+            "--threshold", type=float, default=1.2,
+            help="Slowdown ratio reported as a regression by --compare (default: 1.2).",
+        )
+        parser.add_argument("--only", help="Run only cases whose name contains this.")
+
+    def handle(self, *args, **options):
+        if settings.DEBUG:
+            self.stderr.write("DEBUG is on; query logging will inflate the timings.")
+        rows = Submission.objects.count()
+        if not rows:
+            raise CommandError("No submissions to benchmark; run seed_submissions first.")
+
+        results = {}
+        for name, func in self._cases():
+            if options["only"] and options["only"] not in name:
+                continue
+            results[name] = self._measure(func, options["repeat"])
+            r = results[name]
+            self.stdout.write(
+                f"{name:<60} {r['wall_ms']:>9.2f} ms {r['queries']:>4} q "
+                f"{r['peak_kib']:>9.0f} KiB"
+            )
+
+        report = {
+            "meta": {
+                "commit": _git_commit(),
+                "timestamp": timezone.now().isoformat(),
+                "rows": rows,
+                "repeat": options["repeat"],
+                "python": platform.python_version(),
+                "database": connection.vendor,
+            },
+            "results": results,
+        }
+        with open(options["output"], "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+        if options["compare"]:
+            self._compare(options["compare"], report, options["threshold"])
+
+    def _measure(self, func, repeat):
+        """Time ``func`` ``repeat`` times, then count queries and memory once more.
+
+        Tracing memory slows Python down, so it gets a run of its own.
+        """
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+
+        with CaptureQueriesContext(connection) as queries:
+            tracemalloc.start()
+            try:
+                func()
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+
+        return {
+            "wall_ms": statistics.median(timings),
+            "wall_ms_min": min(timings),
+            "queries": len(queries),
+            "peak_kib": peak / 1024,
+        }
+
+    def _cases(self):
+        factory = RequestFactory()
+        # Never saved; the views only check the role
+        moderator = User(email="benchmark@example.com", role=User.Role.MODERATOR)
+
+        category = Category.objects.values_list("slug", flat=True).first()
+        today = timezone.localdate()
+        filters = {
+            "category": {"category": category},
+            "severity": {"severity": Submission.Severity.values[-1]},
+            "status": {"status": Submission.Status.APPROVED},
+            "dates": {
+                "date_from": (today - timedelta(days=90)).isoformat(),
+                "date_to": today.isoformat(),
+            },
+            "bbox": {"bbox": BENCHMARK_BBOX},
+        }
+        for n in range(len(filters) + 1):
+            for combo in itertools.combinations(filters, n):
+                params = {}
+                for key in combo:
+                    params.update(filters[key])
+                name = "geojson[" + "+".join(combo or ("all",)) + "]"
+                yield name, self._view_call(
+                    submissions_geojson, factory.get("/", params), invalidate=bump_map_data_version
+                )
+
+        request = factory.get("/moderate/")
+        request.user = moderator
+        yield "moderate_list", self._view_call(moderate_list, request)
+
+        pk = (
+            Submission.objects.filter(status__in=Submission.PUBLIC_STATUSES)
+            .values_list("pk", flat=True).first()
+        )
+        if pk is not None:
+            request = factory.get(f"/submission/{pk}/")
+            request.user = AnonymousUser()
+            # A new category version misses the rendered-page cache
+            yield "submission_detail", self._view_call(
+                submission_detail, request, invalidate=bump_category_version, pk=pk
+            )
+
+        photo = make_sample_photo((4032, 3024))
+        yield "extract_gps_from_exif[12MP]", lambda: extract_gps_from_exif(BytesIO(photo))
+        yield "resize_photo[12MP]", lambda: resize_photo(BytesIO(photo)).close()
+        # What submit.js uploads: upright, baseline and already 1920px
+        with resize_photo(BytesIO(photo)) as resized:
+            small = resized.read()
+        yield "process_photo[pre-resized]", lambda: process_photo(BytesIO(small))[2].close()
+
+    def _view_call(self, view, request, invalidate=None, **kwargs):
+        def run():
+            if invalidate is not None:
+                # Measure the query path, not the response cache
+                invalidate()
+            response = view(request, **kwargs)
+            if response.status_code != 200:
+                raise CommandError(f"{view.__name__} returned {response.status_code}")
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+            else:
+                response.content
+        return run
+
+    def _compare(self, path, report, threshold):
+        with open(path) as f:
+            previous = json.load(f)
+        self.stdout.write(
+            f"\nCompared with {previous['meta'].get('commit') or path} "
+            f"({previous['meta'].get('rows')} rows):"
+        )
+        regressions = 0
+        for name, new in report["results"].items():
+            old = previous["results"].get(name)
+            if old is None:
+                continue
+            ratio = new["wall_ms"] / old["wall_ms"] if old["wall_ms"] else 1.0
+            flag = ""
+            if ratio > threshold or new["queries"] > old["queries"]:
+                flag = "  REGRESSION"
+                regressions += 1
+            self.stdout.write(
+                f"{name:<60} {old['wall_ms']:>9.2f} -> {new['wall_ms']:>9.2f} ms "
+                f"({ratio:.2f}x), {old['queries']} -> {new['queries']} q{flag}"
+            )
+        if regressions:
+            self.stdout.write(self.style.WARNING(f"{regressions} regression(s)."))
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
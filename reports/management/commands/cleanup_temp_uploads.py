@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from reports.utils import cleanup_temp_uploads
+
+
+class Command(BaseCommand):
+    help = "Delete expired temp photos kept for re-submitting the upload form."
+
+    def handle(self, *args, **options):
+        removed = cleanup_temp_uploads()
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} expired temp upload buckets."))
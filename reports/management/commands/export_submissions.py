@@ -0,0 +1,55 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+
+from reports.export import EXPORT_FORMATS, export_data, export_rows, export_zip, write_geopackage
+from reports.filters import parse_bbox, public_submissions
+
+
+class Command(BaseCommand):
+    help = (
+        "Export public submissions as CSV, GeoJSON lines or a GeoPackage, "
+        "with the map's filters. Rows are streamed, so memory use stays flat "
+        "however many there are."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="File to write.")
+        parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="csv")
+        parser.add_argument(
+            "--photos", action="store_true",
+            help="Write a zip holding the data file and every photo.",
+        )
+        parser.add_argument("--category", action="append", default=[], help="Category slug; repeatable.")
+        parser.add_argument("--severity")
+        parser.add_argument("--status")
+        parser.add_argument("--date-from", help="ISO date, inclusive.")
+        parser.add_argument("--date-to", help="ISO date, inclusive.")
+        parser.add_argument("--bbox", help="west,south,east,north")
+
+    def handle(self, *args, **options):
+        params = QueryDict(mutable=True)
+        params.setlist("category", options["category"])
+        for name in ("severity", "status", "date_from", "date_to"):
+            if options[name]:
+                params[name] = options[name]
+        qs = public_submissions(params)
+        if options["bbox"]:
+            bbox = parse_bbox(options["bbox"])
+            if bbox is None:
+                raise CommandError("Invalid bbox.")
+            qs = qs.filter(location__intersects=bbox)
+
+        output = Path(options["output"])
+        fmt = options["format"]
+        if fmt == "gpkg" and not options["photos"]:
+            # Written in place rather than through a temp copy
+            output.unlink(missing_ok=True)
+            write_geopackage(export_rows(qs), output)
+        else:
+            chunks = export_zip(qs, fmt) if options["photos"] else export_data(qs, fmt)
+            with output.open("wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {output}"))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from reports.jobs import store_derivatives
+from reports.models import Submission
+
+
+class Command(BaseCommand):
+    help = "Generate thumb/medium/full JPEG and WebP derivatives for existing photos."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force", action="store_true",
+            help="Regenerate derivatives even for submissions that already have them.",
+        )
+
+    def handle(self, *args, **options):
+        qs = Submission.objects.filter(processing=False).order_by("pk")
+        if not options["force"]:
+            qs = qs.filter(photo_derivatives={})
+
+        done = failed = 0
+        for submission in qs.iterator(chunk_size=100):
+            try:
+                store_derivatives(submission)
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f"Submission #{submission.pk}: {exc}")
+                continue
+            submission.save(update_fields=["photo_derivatives", "updated_at"])
+            done += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Generated derivatives for {done} submissions."))
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{failed} submissions failed."))
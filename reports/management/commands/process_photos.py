@@ -0,0 +1,67 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from reports.jobs import claim_job, run_job
+from reports.utils import TEMP_BUCKET_SECONDS, cleanup_temp_uploads
+
+
+class Command(BaseCommand):
+    help = "Run the photo processing worker: resize uploaded photos from the job queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency", type=int, default=2,
+            help="Number of jobs processed at once (default: 2).",
+        )
+        parser.add_argument(
+            "--poll-interval", type=float, default=2.0,
+            help="Seconds to sleep when the queue is empty (default: 2).",
+        )
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Exit once the queue is empty instead of polling.",
+        )
+
+    def handle(self, *args, **options):
+        # Pillow releases the GIL while decoding and resampling, so threads
+        # give real parallelism here without a process per job.
+        threads = [
+            threading.Thread(
+                target=self._work,
+                args=(options["poll_interval"], options["once"]),
+                daemon=True,
+            )
+            for _ in range(max(1, options["concurrency"]))
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            # The main thread sweeps expired temp uploads while workers run
+            last_sweep = None
+            while any(thread.is_alive() for thread in threads):
+                now = time.monotonic()
+                if not options["once"] and (
+                    last_sweep is None or now - last_sweep >= TEMP_BUCKET_SECONDS
+                ):
+                    cleanup_temp_uploads()
+                    last_sweep = now
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping; running jobs will be retried after their timeout.")
+
+    def _work(self, poll_interval, once):
+        try:
+            while True:
+                job = claim_job()
+                if job is None:
+                    if once:
+                        return
+                    time.sleep(poll_interval)
+                    continue
+                run_job(job)
+                self.stdout.write(f"Job #{job.pk}: {job.status}")
+        finally:
+            connection.close()
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from reports.sync import CHANGE_RETENTION_DAYS, prune_changes
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete old entries from the map's change log. Clients holding a sync "
+        "token older than that reload the map data from scratch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=CHANGE_RETENTION_DAYS,
+            help=f"Keep entries from this many days (default: {CHANGE_RETENTION_DAYS}).",
+        )
+
+    def handle(self, *args, **options):
+        removed = prune_changes(options["days"])
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} change log entries."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from reports.hexbins import rebuild_hexbins
+from reports.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily statistics rollup and the map hex bins from the submissions table."
+
+    def handle(self, *args, **options):
+        stats = rebuild_stats()
+        bins = rebuild_hexbins()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats rollup ({stats} rows) and hex bins ({bins} rows)."))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from reports.storage import reconcile_blob_refs
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount content-addressed file references from the submissions that "
+        "hold them. Stop the photo worker before running with --apply."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--apply", action="store_true",
+            help="Correct the counts and delete unreferenced files (default: report only).",
+        )
+
+    def handle(self, *args, **options):
+        mismatched = reconcile_blob_refs(apply=options["apply"])
+        for name, (recorded, held) in sorted(mismatched.items()):
+            self.stdout.write(f"{name}: {recorded} recorded, {held} held")
+        verb = "Corrected" if options["apply"] else "Found"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(mismatched)} mismatched reference counts."))
@@ -0,0 +1,82 @@
+import random
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from reports.cache import bump_map_data_version
+from reports.duplicates import hash_to_db
+from reports.hexbins import apply_hexbin_deltas, count_hexbins
+from reports.jobs import store_derivatives
+from reports.models import PUBLIC_STATUSES, Submission, User
+from reports.seeding import build_submissions, ensure_categories, make_sample_photo
+from reports.stats import apply_stat_deltas, count_submissions
+from reports.sync import record_changes
+from reports.utils import photo_dhash, process_photo
+
+SEED_USER_COUNT = 20
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-insert realistic synthetic submissions spread across Mesa County "
+        "for local testing and benchmarks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, required=True, help="Number of submissions to create.")
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument(
+            "--photos", type=int, default=10,
+            help="Distinct generated photos to share between submissions (default: 10).",
+        )
+        parser.add_argument("--days", type=int, default=365, help="Spread created_at over this many days.")
+        parser.add_argument("--seed", type=int, default=None, help="Random seed, for repeatable data.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        categories = ensure_categories()
+        users = [
+            User.objects.get_or_create(
+                email=f"seed-user-{i}@example.com",
+                defaults={"display_name": f"Seed User {i}"},
+            )[0]
+            for i in range(SEED_USER_COUNT)
+        ]
+        photos = [self._make_photo(rng, i) for i in range(max(1, options["photos"]))]
+
+        created = 0
+        while created < options["count"]:
+            size = min(options["batch_size"], options["count"] - created)
+            subs = build_submissions(size, users, categories, rng, photos=photos, days=options["days"])
+            created_at = [sub.created_at for sub in subs]
+            with transaction.atomic():
+                subs = Submission.objects.bulk_create(subs)
+                # auto_now_add replaced created_at on insert; put the spread back
+                for sub, value in zip(subs, created_at):
+                    sub.created_at = value
+                Submission.objects.bulk_update(subs, ["created_at"])
+                # bulk_create skips the post_save signal that counts new rows
+                apply_stat_deltas(count_submissions(subs))
+                apply_hexbin_deltas(count_hexbins(subs))
+                record_changes(sub.pk for sub in subs if sub.status in PUBLIC_STATUSES)
+            created += size
+            self.stdout.write(f"  {created}/{options['count']}")
+
+        # Likewise the map cache version bump
+        bump_map_data_version()
+        self.stdout.write(self.style.SUCCESS(f"Created {created} submissions."))
+
+    def _make_photo(self, rng, index):
+        """Generate, resize and store one sample photo with its derivatives."""
+        data = make_sample_photo((2400, 1800), rng)
+        _, _, resized = process_photo(BytesIO(data))
+        holder = Submission()
+        holder.photo.save(f"seed_{index}.jpg", resized, save=False)
+        store_derivatives(holder, resized)
+        photo_hash = photo_dhash(resized)
+        return (
+            holder.photo.name,
+            holder.photo_derivatives,
+            hash_to_db(photo_hash) if photo_hash is not None else None,
+        )
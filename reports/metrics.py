@@ -0,0 +1,141 @@
+"""In-process performance metrics, exposed in the Prometheus text format.
+
+Each worker process keeps its own histograms, so a scrape sees the worker
+that happened to serve it. That's enough to spot where time goes; summing
+across workers needs a scraper per worker or a shared store.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+BYTES_BUCKETS = (1024, 10240, 102400, 1048576, 10485760)
+
+METRICS = {
+    "reports_request_seconds": ("Wall time per request.", SECONDS_BUCKETS),
+    "reports_request_queries": ("Database queries per request.", COUNT_BUCKETS),
+    "reports_request_query_seconds": ("Time spent in database queries per request.", SECONDS_BUCKETS),
+    "reports_response_bytes": ("Size of response bodies.", BYTES_BUCKETS),
+    "reports_image_seconds": ("Time spent in image decode, resize and encode.", SECONDS_BUCKETS),
+}
+
+
+class Histogram:
+    """Cumulative-bucket histogram for one metric and label set."""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+_lock = threading.Lock()
+_histograms = {}
+
+
+def observe(name, value, **labels):
+    observe_many(((name, value),), tuple(sorted(labels.items())))
+
+
+def observe_many(values, labels=()):
+    """Record several (name, value) pairs sharing one label tuple."""
+    with _lock:
+        for name, value in values:
+            histogram = _histograms.get((name, labels))
+            if histogram is None:
+                histogram = _histograms[(name, labels)] = Histogram(METRICS[name][1])
+            histogram.observe(value)
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def render():
+    """Return all histograms in the Prometheus text exposition format."""
+    with _lock:
+        snapshot = [
+            (name, labels, h.bounds, list(h.counts), h.sum, h.count)
+            for (name, labels), h in _histograms.items()
+        ]
+    snapshot.sort(key=lambda item: (item[0], item[1]))
+
+    lines = []
+    current = None
+    for name, labels, bounds, counts, total, count in snapshot:
+        if name != current:
+            lines.append(f"# HELP {name} {METRICS[name][0]}")
+            lines.append(f"# TYPE {name} histogram")
+            current = name
+        cumulative = 0
+        for bound, n in zip(list(bounds) + ["+Inf"], counts):
+            cumulative += n
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+        lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+class RequestStats:
+    """Per-request query log; also the connection.execute_wrapper callable."""
+
+    __slots__ = ("queries", "query_seconds", "image_seconds")
+
+    def __init__(self):
+        self.queries = []
+        self.query_seconds = 0.0
+        self.image_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.query_seconds += elapsed
+            self.queries.append((elapsed, sql))
+
+    def top_queries(self, n=5):
+        return sorted(self.queries, key=lambda q: q[0], reverse=True)[:n]
+
+
+# Set by RequestMetricsMiddleware for the duration of a request
+current_request = ContextVar("reports_request_stats", default=None)
+
+
+@contextmanager
+def timed(stage):
+    """Record the time spent in an image pipeline ``stage``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe("reports_image_seconds", elapsed, stage=stage)
+        stats = current_request.get()
+        if stats is not None:
+            stats.image_seconds += elapsed
@@ -0,0 +1,118 @@
+import logging
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from . import metrics
+
+logger = logging.getLogger("reports.performance")
+
+
+class RequestMetricsMiddleware:
+    """Record wall time, query count/time and response size per view.
+
+    Requests slower than SLOW_REQUEST_SECONDS are logged with their slowest
+    queries attached.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_seconds = settings.SLOW_REQUEST_SECONDS
+
+    def __call__(self, request):
+        stats = metrics.RequestStats()
+        token = metrics.current_request.set(stats)
+        start = time.perf_counter()
+        try:
+            # One lookup of the thread's connection; the connection proxy
+            # goes through it on every attribute access
+            with connections[DEFAULT_DB_ALIAS].execute_wrapper(stats):
+                response = self.get_response(request)
+        finally:
+            metrics.current_request.reset(token)
+
+        # A FileResponse is left alone so the server can hand its file to
+        # wsgi.file_wrapper (sendfile); wrapping it would force Python to
+        # read it chunk by chunk. Its body runs no queries anyway.
+        file_response = getattr(response, "file_to_stream", None) is not None
+        if response.streaming and not response.is_async and not file_response:
+            # The body is produced (and queried for) after we return, so
+            # record once the server has iterated and closed it
+            response.streaming_content = MeteredStream(
+                response.streaming_content, stats,
+                lambda size: self.record(request, response, stats, start, size),
+            )
+        else:
+            self.record(request, response, stats, start)
+        return response
+
+    def record(self, request, response, stats, start, streamed_bytes=None):
+        elapsed = time.perf_counter() - start
+        match = request.resolver_match
+        view = match.view_name if match else "unmatched"
+        values = [
+            ("reports_request_seconds", elapsed),
+            ("reports_request_queries", len(stats.queries)),
+            ("reports_request_query_seconds", stats.query_seconds),
+        ]
+        # CommonMiddleware has set Content-Length; avoid joining the body.
+        # FileResponse sets it too, from the file's size, so file bodies
+        # are measured without being read.
+        size = response.get("Content-Length")
+        if size is not None:
+            values.append(("reports_response_bytes", int(size)))
+        elif streamed_bytes is not None:
+            values.append(("reports_response_bytes", streamed_bytes))
+        elif not response.streaming:
+            values.append(("reports_response_bytes", len(response.content)))
+        metrics.observe_many(values, (("view", view),))
+
+        if elapsed >= self.slow_seconds:
+            top = "\n".join(
+                f"  {duration * 1000:.1f} ms: {sql[:500]}"
+                for duration, sql in stats.top_queries()
+            )
+            logger.warning(
+                "Slow request %s %s (%s): %.3f s, %d queries in %.3f s, "
+                "%.3f s in image processing\n%s",
+                request.method, request.path, view, elapsed, len(stats.queries),
+                stats.query_seconds, stats.image_seconds, top,
+            )
+
+
+class MeteredStream:
+    """Streaming body that counts the queries run while producing each chunk.
+
+    The execute wrapper is installed only around each step of the wrapped
+    iterator, so nothing stays attached to the connection between chunks or
+    if the client goes away. ``finish(bytes sent)`` is called once, on
+    exhaustion or when the server closes the response.
+    """
+
+    def __init__(self, content, stats, finish):
+        self.content = iter(content)
+        self.stats = stats
+        self.finish = finish
+        self.size = 0
+        self.finished = False
+
+    def __iter__(self):
+        connection = connections[DEFAULT_DB_ALIAS]
+        while True:
+            token = metrics.current_request.set(self.stats)
+            try:
+                with connection.execute_wrapper(self.stats):
+                    chunk = next(self.content, None)
+            finally:
+                metrics.current_request.reset(token)
+            if chunk is None:
+                break
+            self.size += len(chunk)
+            yield chunk
+        self.close()
+
+    def close(self):
+        if not self.finished:
+            self.finished = True
+            self.finish(self.size)
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['status', '-created_at'], name='sub_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(condition=models.Q(('status__in', ('approved', 'in_progress', 'cleaned'))), fields=['-created_at', '-id'], name='sub_public_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['created_at', 'id'], name='sub_pending_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0003_submission_processing_photojob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='photo_derivatives',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
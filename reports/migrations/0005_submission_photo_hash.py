@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 14:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0004_submission_photo_derivatives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='photo_hash',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
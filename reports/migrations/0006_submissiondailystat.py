@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-17 16:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def populate_stats(apps, schema_editor):
+    # Days are local dates, as TruncDate makes them in reports.stats
+    Submission = apps.get_model('reports', 'Submission')
+    SubmissionDailyStat = apps.get_model('reports', 'SubmissionDailyStat')
+    quote = schema_editor.quote_name
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {quote(SubmissionDailyStat._meta.db_table)}
+                (day, category_id, severity, status, count)
+            SELECT (created_at AT TIME ZONE %s)::date, category_id, severity, status, COUNT(*)
+            FROM {quote(Submission._meta.db_table)}
+            GROUP BY 1, 2, 3, 4
+            """,
+            [timezone.get_current_timezone_name()],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0005_submission_photo_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('severity', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High')], max_length=10)),
+                ('status', models.CharField(choices=[('pending', 'Pending Review'), ('approved', 'Approved'), ('rejected', 'Rejected'), ('in_progress', 'Cleanup In Progress'), ('cleaned', 'Cleaned')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='reports.category')),
+            ],
+            options={
+                'ordering': ['day'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'category', 'severity', 'status'), name='dailystat_unique_key')],
+            },
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
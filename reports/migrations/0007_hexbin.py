@@ -0,0 +1,86 @@
+# Generated by Django 5.2 on 2026-10-17 18:05
+
+import math
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# A frozen copy of the grid in reports.hexbins as of this migration
+EARTH_RADIUS = 6378137.0
+METERS_PER_PIXEL_Z0 = 2 * math.pi * EARTH_RADIUS / 512
+HEX_SIZES = tuple(30 * METERS_PER_PIXEL_Z0 / 2 ** z for z in range(4, 10))
+PUBLIC_STATUSES = ['approved', 'in_progress', 'cleaned']
+
+
+def hex_cell(lng, lat, size):
+    lat = max(min(lat, 85.05112878), -85.05112878)
+    x = EARTH_RADIUS * math.radians(lng)
+    y = EARTH_RADIUS * math.log(math.tan(math.pi / 4 + math.radians(lat) / 2))
+    fq = (math.sqrt(3) / 3 * x - y / 3) / size
+    fr = (2 / 3 * y) / size
+    fs = -fq - fr
+    q, r, s = round(fq), round(fr), round(fs)
+    dq, dr, ds = abs(q - fq), abs(r - fr), abs(s - fs)
+    if dq > dr and dq > ds:
+        q = -r - s
+    elif dr > ds:
+        r = -q - s
+    return q, r
+
+
+def populate_hexbins(apps, schema_editor):
+    Submission = apps.get_model('reports', 'Submission')
+    HexBin = apps.get_model('reports', 'HexBin')
+    quote = schema_editor.quote_name
+    cells = Counter()
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT longitude, latitude, category_id, severity, status, COUNT(*)
+            FROM {quote(Submission._meta.db_table)}
+            WHERE status = ANY(%s)
+            GROUP BY 1, 2, 3, 4, 5
+            """,
+            [PUBLIC_STATUSES],
+        )
+        for lng, lat, category_id, severity, status, n in cursor.fetchall():
+            for resolution, size in enumerate(HEX_SIZES):
+                q, r = hex_cell(float(lng), float(lat), size)
+                cells[(resolution, q, r, category_id, severity, status)] += n
+        cursor.executemany(
+            f"""
+            INSERT INTO {quote(HexBin._meta.db_table)}
+                (resolution, q, r, category_id, severity, status, count)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """,
+            [(*key, n) for key, n in sorted(cells.items())],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0006_submissiondailystat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HexBin',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.PositiveSmallIntegerField()),
+                ('q', models.IntegerField()),
+                ('r', models.IntegerField()),
+                ('severity', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High')], max_length=10)),
+                ('status', models.CharField(choices=[('pending', 'Pending Review'), ('approved', 'Approved'), ('rejected', 'Rejected'), ('in_progress', 'Cleanup In Progress'), ('cleaned', 'Cleaned')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hex_bins', to='reports.category')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('resolution', 'q', 'r', 'category', 'severity', 'status'), name='hexbin_unique_key')],
+            },
+        ),
+        migrations.RunPython(populate_hexbins, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-17 21:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0008_storedblob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionChange',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('submission_id', models.BigIntegerField()),
+                ('changed_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['seq'],
+            },
+        ),
+    ]
@@ -1,9 +1,13 @@
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from django.contrib.gis.db import models as gis_models
 from django.db import models
+from django.utils import timezone
 
 from .managers import UserManager
 
+# Statuses shown on the public map and detail pages
+PUBLIC_STATUSES = ("approved", "in_progress", "cleaned")
+
 
 class User(AbstractBaseUser, PermissionsMixin):
     class Role(models.TextChoices):
@@ -55,6 +59,8 @@ class Submission(models.Model):
         IN_PROGRESS = "in_progress", "Cleanup In Progress"
         CLEANED = "cleaned", "Cleaned"
 
+    PUBLIC_STATUSES = PUBLIC_STATUSES
+
     user = models.ForeignKey(
         "reports.User", on_delete=models.CASCADE, related_name="submissions"
     )
@@ -85,9 +91,189 @@ class Submission(models.Model):
     )
     moderated_at = models.DateTimeField(null=True, blank=True)
     cleaned_at = models.DateTimeField(null=True, blank=True)
+    # True while the original upload is waiting on the photo worker
+    processing = models.BooleanField(default=False)
+    # {size: {"width", "height", "jpeg", "webp"}} with storage names, see
+    # utils.DERIVATIVE_SIZES. Empty until the photo worker has run.
+    photo_derivatives = models.JSONField(default=dict, blank=True)
+    # 64-bit dHash of the photo, stored signed to fit a bigint
+    photo_hash = models.BigIntegerField(null=True, blank=True)
 
     class Meta:
         ordering = ["-created_at"]
+        # location already has a GiST index (spatial_index defaults to True)
+        indexes = [
+            models.Index(
+                fields=["status", "-created_at"], name="sub_status_created_idx"
+            ),
+            # Public map and feed, paged newest first by (created_at, id)
+            models.Index(
+                fields=["-created_at", "-id"],
+                condition=models.Q(status__in=PUBLIC_STATUSES),
+                name="sub_public_created_idx",
+            ),
+            # Moderation queue, oldest first
+            models.Index(
+                fields=["created_at", "id"],
+                condition=models.Q(status="pending"),
+                name="sub_pending_queue_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"Submission #{self.pk} by {self.user} ({self.get_status_display()})"
+
+    def photo_variant_url(self, size, fmt="jpeg"):
+        """Return the URL of a photo derivative, falling back to the photo."""
+        name = self.photo_derivatives.get(size, {}).get(fmt)
+        if name:
+            return self.photo.storage.url(name)
+        return self.photo.url if self.photo else ""
+
+    @property
+    def thumb_url(self):
+        return self.photo_variant_url("thumb")
+
+    def _srcset(self, fmt):
+        variants = sorted(self.photo_derivatives.values(), key=lambda v: v["width"])
+        return ", ".join(
+            f"{self.photo.storage.url(v[fmt])} {v['width']}w"
+            for v in variants
+            if v.get(fmt)
+        )
+
+    @property
+    def photo_srcset(self):
+        return self._srcset("jpeg")
+
+    @property
+    def photo_srcset_webp(self):
+        return self._srcset("webp")
+
+
+class PhotoJob(models.Model):
+    """A queued photo-processing task, claimed by the process_photos worker."""
+
+    class Status(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        RUNNING = "running", "Running"
+        DONE = "done", "Done"
+        FAILED = "failed", "Failed"
+
+    submission = models.ForeignKey(
+        Submission, on_delete=models.CASCADE, related_name="photo_jobs"
+    )
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    # While running, the job is invisible to other workers until this passes
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["run_after"]
+        indexes = [
+            models.Index(
+                fields=["run_after"],
+                condition=models.Q(status__in=["queued", "running"]),
+                name="photojob_ready_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Photo job #{self.pk} for submission #{self.submission_id} ({self.status})"
+
+
+class SubmissionDailyStat(models.Model):
+    """Submission counts by local day x category x severity x status.
+
+    Kept up to date incrementally by reports.stats; rebuild it with the
+    rebuild_stats command if it ever drifts.
+    """
+
+    day = models.DateField()
+    category = models.ForeignKey(
+        Category, on_delete=models.CASCADE, related_name="daily_stats"
+    )
+    severity = models.CharField(max_length=10, choices=Submission.Severity.choices)
+    status = models.CharField(max_length=20, choices=Submission.Status.choices)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ["day"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "category", "severity", "status"],
+                name="dailystat_unique_key",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.category_id} {self.severity} {self.status}: {self.count}"
+
+
+class HexBin(models.Model):
+    """Public submission counts per hexagonal map cell.
+
+    Cells are axial (q, r) coordinates on a Web Mercator hex grid, one grid
+    per ``resolution`` (see reports.hexbins). Kept up to date incrementally
+    alongside SubmissionDailyStat.
+    """
+
+    resolution = models.PositiveSmallIntegerField()
+    q = models.IntegerField()
+    r = models.IntegerField()
+    category = models.ForeignKey(
+        Category, on_delete=models.CASCADE, related_name="hex_bins"
+    )
+    severity = models.CharField(max_length=10, choices=Submission.Severity.choices)
+    status = models.CharField(max_length=20, choices=Submission.Status.choices)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["resolution", "q", "r", "category", "severity", "status"],
+                name="hexbin_unique_key",
+            ),
+        ]
+
+    def __str__(self):
+        return f"r{self.resolution} ({self.q}, {self.r}) {self.category_id}: {self.count}"
+
+
+class StoredBlob(models.Model):
+    """Reference count of a file in ContentAddressedStorage."""
+
+    name = models.CharField(max_length=100, primary_key=True)
+    refs = models.PositiveIntegerField(default=1)
+    size = models.PositiveBigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.refs} refs)"
+
+
+class SubmissionChange(models.Model):
+    """One change to a public submission, for the map's delta feed.
+
+    Appended in the same transaction as the change, so ``seq`` order is
+    commit order except for transactions still in flight (see reports.sync).
+    ``submission_id`` is a plain integer so entries outlive deleted rows.
+    """
+
+    seq = models.BigAutoField(primary_key=True)
+    submission_id = models.BigIntegerField()
+    changed_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        ordering = ["seq"]
+
+    def __str__(self):
+        return f"#{self.seq}: submission #{self.submission_id}"
@@ -0,0 +1,101 @@
+from collections import Counter
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import PUBLIC_STATUSES, Submission
+from .signals import submissions_changed
+from .hexbins import apply_hexbin_deltas, hexbin_key
+from .stats import apply_stat_deltas, stat_key
+from .sync import record_changes
+
+Status = Submission.Status
+
+# Allowed status changes, keyed by current status
+TRANSITIONS = {
+    Status.PENDING: {Status.APPROVED, Status.REJECTED},
+    Status.APPROVED: {Status.IN_PROGRESS, Status.CLEANED, Status.REJECTED},
+    Status.IN_PROGRESS: {Status.CLEANED, Status.APPROVED},
+    Status.REJECTED: {Status.APPROVED},
+    Status.CLEANED: set(),
+}
+
+MAX_BATCH_SIZE = 5000
+
+
+@dataclass
+class TransitionResult:
+    updated: list = field(default_factory=list)
+    # pk -> reason: "locked", "invalid_transition", "processing" or "not_found"
+    skipped: dict = field(default_factory=dict)
+
+
+def transition_submissions(pks, target, user):
+    """Move submissions to ``target`` status in a single transaction.
+
+    Rows another moderator currently holds are skipped rather than waited
+    on (SELECT ... FOR UPDATE SKIP LOCKED), as are rows for which the change
+    isn't in TRANSITIONS. Rows whose photo is still being processed can't
+    be made public, since until then the stored photo is the untouched
+    original with its EXIF. The rest are updated with one UPDATE, with the
+    moderation/cleanup timestamps set and the stats rollup, hex bins and
+    change log adjusted in the same transaction, and one submissions_changed
+    signal is sent after commit covering all of them.
+    """
+    target = Status(target)
+    pks = set(pks)
+    now = timezone.now()
+    result = TransitionResult()
+
+    with transaction.atomic():
+        rows = list(
+            Submission.objects.select_for_update(skip_locked=True)
+            .filter(pk__in=pks)
+            .order_by()
+            .values_list(
+                "pk", "status", "longitude", "latitude",
+                "created_at", "category_id", "severity", "processing",
+            )
+        )
+        locked = {row[0] for row in rows}
+
+        changes = []
+        stat_deltas = Counter()
+        hex_deltas = Counter()
+        for pk, status, lng, lat, created_at, category_id, severity, processing in rows:
+            if processing and target in PUBLIC_STATUSES:
+                result.skipped[pk] = "processing"
+            elif target in TRANSITIONS.get(status, ()):
+                changes.append((pk, status, target.value, lng, lat))
+                stat_deltas[stat_key(created_at, category_id, severity, status)] -= 1
+                stat_deltas[stat_key(created_at, category_id, severity, target.value)] += 1
+                hex_deltas[hexbin_key(lng, lat, category_id, severity, status)] -= 1
+                hex_deltas[hexbin_key(lng, lat, category_id, severity, target.value)] += 1
+            else:
+                result.skipped[pk] = "invalid_transition"
+
+        if changes:
+            fields = {"status": target, "updated_at": now}
+            if target in (Status.APPROVED, Status.REJECTED):
+                fields.update(moderated_by=user, moderated_at=now)
+            if target == Status.CLEANED:
+                fields["cleaned_at"] = now
+            Submission.objects.filter(pk__in=[c[0] for c in changes]).update(**fields)
+            apply_stat_deltas(stat_deltas)
+            apply_hexbin_deltas(hex_deltas)
+            record_changes(
+                pk for pk, old, new, _, _ in changes
+                if old in PUBLIC_STATUSES or new in PUBLIC_STATUSES
+            )
+            transaction.on_commit(
+                lambda: submissions_changed.send(sender=Submission, changes=changes)
+            )
+
+    result.updated = sorted(c[0] for c in changes)
+    if len(locked) < len(pks):
+        # Distinguish rows held by another transaction from missing ones
+        existing = set(Submission.objects.filter(pk__in=pks - locked).values_list("pk", flat=True))
+        for pk in pks - locked:
+            result.skipped[pk] = "locked" if pk in existing else "not_found"
+    return result
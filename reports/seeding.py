@@ -0,0 +1,126 @@
+"""Synthetic data for the seed_submissions command and the benchmarks."""
+
+import random
+from datetime import timedelta
+from io import BytesIO
+
+from django.contrib.gis.geos import Point
+from django.utils import timezone
+from PIL import Image
+from PIL.TiffImagePlugin import IFDRational
+
+from .models import Category, Submission
+
+# Rough Mesa County bounding box (west, south, east, north)
+MESA_COUNTY_BBOX = (-109.06, 38.50, -107.85, 39.37)
+
+DEFAULT_CATEGORIES = [
+    ("Household Dumping", "household_dumping", "#d97706"),
+    ("Vehicle / Tire Debris", "vehicle_tire", "#4b5563"),
+    ("Hazardous Materials", "hazardous", "#dc2626"),
+]
+
+# Rough share of each status in a live system
+STATUS_WEIGHTS = {
+    Submission.Status.PENDING: 10,
+    Submission.Status.APPROVED: 45,
+    Submission.Status.REJECTED: 10,
+    Submission.Status.IN_PROGRESS: 10,
+    Submission.Status.CLEANED: 25,
+}
+
+DESCRIPTIONS = [
+    "",
+    "Couch and mattress dumped off the side of the road.",
+    "Pile of tires near the wash, maybe 20 or so.",
+    "Several paint cans and an old battery, leaking.",
+    "Construction debris, drywall and lumber scraps.",
+    "Bags of household trash spread along the trail.",
+]
+
+
+def ensure_categories():
+    """Create the launch categories if they don't exist and return them all."""
+    for name, slug, color in DEFAULT_CATEGORIES:
+        Category.objects.get_or_create(slug=slug, defaults={"name": name, "color": color})
+    return list(Category.objects.all())
+
+
+def random_point(rng):
+    west, south, east, north = MESA_COUNTY_BBOX
+    return rng.uniform(west, east), rng.uniform(south, north)
+
+
+def _to_dms(value):
+    value = abs(value)
+    degrees = int(value)
+    minutes = int((value - degrees) * 60)
+    seconds = round((value - degrees - minutes / 60) * 3600, 2)
+    return degrees, minutes, seconds
+
+
+def sample_exif(rng, lng, lat, taken_at):
+    """A serialized EXIF dict like the one extract_gps_from_exif stores."""
+    return {
+        "Make": rng.choice(["Apple", "samsung", "Google"]),
+        "Model": rng.choice(["iPhone 13", "SM-G991U", "Pixel 7"]),
+        "DateTimeOriginal": taken_at.strftime("%Y:%m:%d %H:%M:%S"),
+        "Orientation": rng.choice([1, 6]),
+        "GPSInfo": str({
+            1: "N", 2: _to_dms(lat), 3: "W", 4: _to_dms(lng),
+        }),
+    }
+
+
+def make_sample_photo(size, rng=None, lng=-108.55, lat=39.07):
+    """Build a phone-like JPEG: noisy content, rotated orientation, GPS EXIF."""
+    rng = rng or random.Random()
+    img = Image.merge(
+        "RGB", [Image.effect_noise(size, rng.uniform(30, 90)) for _ in range(3)]
+    )
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotate 90 CW
+    exif.get_ifd(0x8825).update({
+        1: "N" if lat >= 0 else "S",
+        2: tuple(IFDRational(v) for v in _to_dms(lat)),
+        3: "E" if lng >= 0 else "W",
+        4: tuple(IFDRational(v) for v in _to_dms(lng)),
+    })
+    buffer = BytesIO()
+    img.save(buffer, format="JPEG", quality=92, exif=exif)
+    return buffer.getvalue()
+
+
+def build_submissions(count, users, categories, rng, photos=None, days=365,
+                      status=None):
+    """Return ``count`` unsaved, randomly distributed Submissions.
+
+    ``photos`` is a list of (photo name, derivatives, photo hash) tuples to
+    cycle through. ``created_at`` is set but auto_now_add overrides it on
+    insert, so callers that care re-apply it with bulk_update.
+    """
+    photos = photos or [("submissions/seed.jpg", {}, None)]
+    statuses = list(STATUS_WEIGHTS)
+    weights = list(STATUS_WEIGHTS.values())
+    now = timezone.now()
+    subs = []
+    for i in range(count):
+        lng, lat = random_point(rng)
+        created_at = now - timedelta(seconds=rng.uniform(0, days * 86400))
+        photo, derivatives, photo_hash = photos[i % len(photos)]
+        subs.append(Submission(
+            user=rng.choice(users),
+            category=rng.choice(categories),
+            photo=photo,
+            photo_derivatives=derivatives,
+            photo_hash=photo_hash,
+            latitude=round(lat, 6),
+            longitude=round(lng, 6),
+            location=Point(lng, lat, srid=4326),
+            severity=rng.choice(Submission.Severity.values),
+            status=status or rng.choices(statuses, weights)[0],
+            description=rng.choice(DESCRIPTIONS),
+            exif_data=sample_exif(rng, lng, lat, created_at),
+            created_at=created_at,
+        ))
+    return subs
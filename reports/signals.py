@@ -0,0 +1,129 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import Signal, receiver
+
+from .cache import bump_category_version, bump_map_data_version, forget_submission_versions
+from .models import Category, Submission
+from .hexbins import apply_hexbin_deltas, hexbin_key
+from .stats import apply_stat_deltas, stat_key
+from .sync import record_changes, record_queryset_changes
+from .tiles import invalidate_tiles_for_points
+
+# Sent once per batch of status changes made with a bulk UPDATE (which
+# skips post_save). ``changes`` is a list of
+# (pk, old_status, new_status, longitude, latitude) tuples.
+submissions_changed = Signal()
+
+
+@receiver(post_init, sender=Submission)
+def remember_loaded_status(sender, instance, **kwargs):
+    """Keep the status as loaded so saves can tell if public data changed."""
+    # Read __dict__ directly so a deferred status doesn't trigger a query
+    instance._loaded_status = instance.__dict__.get("status")
+    instance._loaded_rollup_keys = _rollup_keys(instance.__dict__)
+
+
+ROLLUP_FIELDS = ("created_at", "category_id", "severity", "status", "longitude", "latitude")
+
+
+def _rollup_keys(values):
+    """(stat key, hex-bin key) for a row's field values, or None if deferred."""
+    if any(name not in values for name in ROLLUP_FIELDS):
+        return None
+    return (
+        stat_key(values["created_at"], values["category_id"], values["severity"], values["status"]),
+        hexbin_key(
+            values["longitude"], values["latitude"], values["category_id"],
+            values["severity"], values["status"],
+        ),
+    )
+
+
+def _apply_rollup_deltas(new_keys, old_keys):
+    new_stat, new_hex = new_keys or (None, None)
+    old_stat, old_hex = old_keys or (None, None)
+    if new_stat != old_stat:
+        apply_stat_deltas({new_stat: 1, old_stat: -1})
+    if new_hex != old_hex:
+        apply_hexbin_deltas({new_hex: 1, old_hex: -1})
+
+
+def _affects_map(instance):
+    public = Submission.PUBLIC_STATUSES
+    return instance.status in public or instance._loaded_status in public
+
+
+def _map_changed(points):
+    # After commit, or a reader could cache the old rows under the new version
+    def changed():
+        bump_map_data_version()
+        invalidate_tiles_for_points(points)
+
+    transaction.on_commit(changed)
+
+
+@receiver(post_save, sender=Submission)
+def submission_saved(sender, instance, created, **kwargs):
+    if _affects_map(instance):
+        _map_changed([(instance.longitude, instance.latitude)])
+        record_changes([instance.pk])
+    instance._loaded_status = instance.status
+    # After commit, so a reader can't re-cache the old row in between
+    pk = instance.pk
+    transaction.on_commit(lambda: forget_submission_versions([pk]))
+
+    # Runs in the saving transaction, so the rollups commit (or roll back)
+    # with the row. A save from a partially loaded instance can't tell what
+    # it changed and isn't counted; rebuild_stats repairs that.
+    keys = _rollup_keys(instance.__dict__)
+    if created:
+        _apply_rollup_deltas(keys, None)
+    elif instance._loaded_rollup_keys is not None:
+        _apply_rollup_deltas(keys, instance._loaded_rollup_keys)
+    instance._loaded_rollup_keys = keys
+
+
+@receiver(post_delete, sender=Submission)
+def submission_deleted(sender, instance, **kwargs):
+    if _affects_map(instance):
+        _map_changed([(instance.longitude, instance.latitude)])
+        record_changes([instance.pk])
+    if instance._loaded_rollup_keys is not None:
+        _apply_rollup_deltas(None, instance._loaded_rollup_keys)
+    pk = instance.pk
+    transaction.on_commit(lambda: forget_submission_versions([pk]))
+
+
+@receiver(submissions_changed, sender=Submission)
+def submissions_batch_changed(sender, changes, **kwargs):
+    public = Submission.PUBLIC_STATUSES
+    points = [
+        (lng, lat)
+        for _, old, new, lng, lat in changes
+        if old in public or new in public
+    ]
+    if points:
+        _map_changed(points)
+    # Already sent after commit
+    forget_submission_versions([pk for pk, *_ in changes])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, **kwargs):
+    transaction.on_commit(bump_category_version)
+    # Features carry the category's name and color
+    transaction.on_commit(bump_map_data_version)
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created, **kwargs):
+    # Resend the category's public features so delta-feed clients pick up
+    # the new name and color. Logged after commit, in one statement, so a
+    # big category doesn't hold the saving transaction open. Deleting a
+    # category cascades to its submissions, whose own post_delete logs them.
+    if not created:
+        public = Submission.objects.filter(
+            category_id=instance.pk, status__in=Submission.PUBLIC_STATUSES
+        )
+        transaction.on_commit(lambda: record_queryset_changes(public))
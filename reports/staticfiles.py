@@ -0,0 +1,146 @@
+"""Hashed, precompressed static files and the middleware that serves them."""
+
+import gzip
+import mimetypes
+import os
+import re
+from stat import S_ISREG
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags
+
+try:
+    import brotli
+except ImportError:  # .br variants are skipped without it
+    brotli = None
+
+COMPRESS_EXTENSIONS = (".css", ".js", ".json", ".svg", ".txt", ".html", ".map", ".webmanifest", ".ico")
+# Below this, compression saves less than the extra response overhead
+COMPRESS_MIN_SIZE = 512
+
+# ManifestStaticFilesStorage inserts 12 hex digits of MD5 before the extension
+HASHED_NAME_RE = re.compile(r"\.[0-9a-f]{12}\.[^./]+$")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+STATIC_CACHE_CONTROL = "public, max-age=3600"
+
+# (Content-Encoding, file suffix), most preferred first
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _compress_variants(data):
+    yield ".gz", gzip.compress(data, compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield ".br", brotli.compress(data, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Content-hashed static files with .gz and .br copies of text assets.
+
+    The copies are written next to both the original and hashed names at
+    collectstatic time, so nothing is compressed per request.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if not isinstance(processed, Exception):
+                names.add(name)
+                if hashed_name:
+                    names.add(hashed_name)
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name in sorted(names):
+            if name.endswith(COMPRESS_EXTENSIONS):
+                self._write_compressed(name)
+
+    def _write_compressed(self, name):
+        path = self.path(name)
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return
+        for suffix, compressed in _compress_variants(data):
+            # Keep only variants that are meaningfully smaller
+            if len(compressed) < len(data) * 0.95:
+                with open(path + suffix, "wb") as f:
+                    f.write(compressed)
+
+
+def _accepts(header, coding):
+    for item in header.split(","):
+        token, _, params = item.strip().partition(";")
+        if token.strip().lower() == coding:
+            q = params.strip()
+            if not q.startswith("q="):
+                return True
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return False
+    return False
+
+
+class PrecompressedStaticMiddleware:
+    """Serve collected static files, preferring a precompressed variant.
+
+    Files with a content hash in their name are cached as immutable; others
+    get a short max-age. Anything not in STATIC_ROOT falls through.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL
+        self.root = settings.STATIC_ROOT
+
+    def __call__(self, request):
+        if request.method in ("GET", "HEAD") and request.path_info.startswith(self.prefix):
+            response = self.serve(request, request.path_info[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        try:
+            path = safe_join(self.root, name)
+        except SuspiciousFileOperation:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if not S_ISREG(stat.st_mode):
+            return None
+
+        accept = request.headers.get("Accept-Encoding", "")
+        encoding = None
+        for coding, suffix in ENCODINGS:
+            if _accepts(accept, coding) and os.path.isfile(path + suffix):
+                encoding, path = coding, path + suffix
+                stat = os.stat(path)
+                break
+
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}-{encoding or "identity"}"'
+        if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+        if "*" in if_none_match or any(tag.removeprefix("W/") == etag for tag in if_none_match):
+            response = HttpResponseNotModified()
+        else:
+            content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            response = FileResponse(open(path, "rb"), content_type=content_type)
+            # FileResponse names the file from its path; static assets are
+            # shown inline and need no Content-Disposition
+            del response["Content-Disposition"]
+            response["Last-Modified"] = http_date(stat.st_mtime)
+            if encoding:
+                response["Content-Encoding"] = encoding
+        response["ETag"] = etag
+        response["Vary"] = "Accept-Encoding"
+        response["Cache-Control"] = (
+            IMMUTABLE_CACHE_CONTROL if HASHED_NAME_RE.search(name) else STATIC_CACHE_CONTROL
+        )
+        return response
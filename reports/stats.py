@@ -0,0 +1,119 @@
+"""Incremental maintenance of the SubmissionDailyStat rollup."""
+
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Submission, SubmissionDailyStat
+
+UPSERT_SQL = """
+    INSERT INTO {table} ({columns}, count)
+    VALUES ({placeholders}, %s)
+    ON CONFLICT ({columns})
+    DO UPDATE SET count = {table}.count + EXCLUDED.count
+"""
+
+STAT_COLUMNS = ("day", "category_id", "severity", "status")
+
+
+def stat_key(created_at, category_id, severity, status):
+    """The rollup row a submission counts towards, or None if unknown."""
+    if None in (created_at, category_id, severity, status):
+        return None
+    return (timezone.localdate(created_at), category_id, severity, status)
+
+
+def increment_counts(model, columns, deltas):
+    """Add ``{key: change}`` to ``model``'s count column, one upsert per key.
+
+    ``columns`` names the unique key columns in key order. Keys are applied
+    in sorted order so concurrent callers lock rows in the same order and
+    can't deadlock.
+    """
+    rows = sorted((*key, n) for key, n in deltas.items() if key and n)
+    if not rows:
+        return
+    sql = UPSERT_SQL.format(
+        table=model._meta.db_table,
+        columns=", ".join(columns),
+        placeholders=", ".join(["%s"] * len(columns)),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def apply_stat_deltas(deltas):
+    """Add ``{stat_key: change}`` to the daily rollup."""
+    increment_counts(SubmissionDailyStat, STAT_COLUMNS, deltas)
+
+
+def count_submissions(submissions):
+    """Deltas that add each of ``submissions`` to the rollup."""
+    return Counter(
+        stat_key(s.created_at, s.category_id, s.severity, s.status) for s in submissions
+    )
+
+
+def rebuild_stats(submission_model=Submission, stat_model=SubmissionDailyStat):
+    """Recompute the whole rollup from the submissions table.
+
+    Runs in a transaction with the rollup locked against incremental
+    updates, which wait and then apply on top of the rebuilt counts.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f"LOCK TABLE {stat_model._meta.db_table} IN EXCLUSIVE MODE")
+        stat_model.objects.all().delete()
+        grouped = (
+            submission_model.objects.order_by()
+            .annotate(day=TruncDate("created_at"))
+            .values("day", "category_id", "severity", "status")
+            .annotate(n=Count("id"))
+        )
+        return len(stat_model.objects.bulk_create(
+            [
+                stat_model(
+                    day=row["day"],
+                    category_id=row["category_id"],
+                    severity=row["severity"],
+                    status=row["status"],
+                    count=row["n"],
+                )
+                for row in grouped.iterator()
+            ],
+            batch_size=2000,
+        ))
+
+
+def summarize(statuses, date_from=None, date_to=None, categories=None):
+    """Totals from the rollup alone, so the cost doesn't grow with submissions.
+
+    ``date_from``/``date_to`` are inclusive local dates; ``categories`` is
+    a list of category slugs.
+    """
+    qs = SubmissionDailyStat.objects.filter(status__in=statuses).order_by()
+    if date_from:
+        qs = qs.filter(day__gte=date_from)
+    if date_to:
+        qs = qs.filter(day__lte=date_to)
+    if categories:
+        qs = qs.filter(category__slug__in=categories)
+
+    def by(field):
+        return {
+            str(row[field]): row["n"]
+            for row in qs.values(field).annotate(n=Sum("count")).order_by(field)
+            if row["n"]
+        }
+
+    by_status = by("status")
+    return {
+        "total": sum(by_status.values()),
+        "by_status": by_status,
+        "by_category": by("category__slug"),
+        "by_severity": by("severity"),
+        "by_day": by("day"),
+    }
@@ -0,0 +1,140 @@
+import hashlib
+import os
+import re
+import tempfile
+from collections import Counter
+from pathlib import PurePosixPath
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+
+# "cas/ab/cd/<sha256><ext>"; anything else is a file from before this storage
+CAS_NAME_RE = re.compile(r"^cas/([0-9a-f]{2})/([0-9a-f]{2})/(\1\2[0-9a-f]{60})(\.[a-z0-9]{1,5})?$")
+
+
+def content_hash(name):
+    """Return the SHA-256 a content-addressed name was built from, or None."""
+    match = CAS_NAME_RE.match(name)
+    return match.group(3) if match else None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File storage that names files by the SHA-256 of their content.
+
+    Files are sharded two directory levels deep by hash prefix. Saving
+    content that is already stored adds a reference to the existing file
+    (counted in StoredBlob) instead of writing a copy, and delete() only
+    removes the file when its last reference goes. Names not in the
+    content-addressed layout are older files and are handled as plain
+    FileSystemStorage ones.
+
+    A save commits its reference straight away unless the caller's
+    transaction encloses it, as submit_view's does. Otherwise a failure
+    between the save and writing the row that holds the name leaves the
+    count one too high: the file is kept rather than deleted early, and
+    reconcile_blob_refs() puts the count right.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The name is derived from the content in _save; nothing to avoid
+        return name
+
+    def _save(self, name, content):
+        from .models import StoredBlob
+
+        digest = hashlib.sha256()
+        size = 0
+        for chunk in content.chunks():
+            digest.update(chunk)
+            size += len(chunk)
+        h = digest.hexdigest()
+        ext = PurePosixPath(name).suffix.lower()
+        if not re.fullmatch(r"\.[a-z0-9]{1,5}", ext):
+            ext = ""
+        name = f"cas/{h[:2]}/{h[2:4]}/{h}{ext}"
+
+        # The blob row lock serializes saves and deletes of the same content
+        with transaction.atomic():
+            blob, created = StoredBlob.objects.select_for_update().get_or_create(
+                name=name, defaults={"refs": 1, "size": size}
+            )
+            if not created:
+                StoredBlob.objects.filter(pk=name).update(refs=F("refs") + 1)
+            if created or not self.exists(name):
+                self._write(self.path(name), content)
+        return name
+
+    def _write(self, full_path, content):
+        """Write ``content`` into place atomically, moving temp files."""
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        if hasattr(content, "temporary_file_path"):
+            file_move_safe(content.temporary_file_path(), full_path, allow_overwrite=True)
+        else:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    for chunk in content.chunks():
+                        f.write(chunk)
+                os.replace(tmp_path, full_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+
+    def delete(self, name):
+        from .models import StoredBlob
+
+        if not name or content_hash(name) is None:
+            return super().delete(name)
+        with transaction.atomic():
+            blob = StoredBlob.objects.select_for_update().filter(pk=name).first()
+            if blob is None:
+                # Unknown reference count; leaving the file is the safe side
+                return
+            if blob.refs > 1:
+                StoredBlob.objects.filter(pk=name).update(refs=F("refs") - 1)
+                return
+            blob.delete()
+            super().delete(name)
+
+
+def reconcile_blob_refs(apply=False):
+    """Compare StoredBlob.refs with the references submissions hold.
+
+    Returns {name: (recorded, held)} for every mismatch. With ``apply`` the
+    counts are corrected and files nothing holds are deleted. A save that
+    hasn't written its row yet looks like a leak, so only apply this with
+    the photo worker stopped and no uploads in flight.
+    """
+    from .models import StoredBlob, Submission
+
+    held = Counter()
+    rows = Submission.objects.order_by().values_list("photo", "photo_derivatives")
+    for photo, derivatives in rows.iterator(chunk_size=2000):
+        held[photo] += 1
+        # The same names store_derivatives() saves and later deletes
+        for entry in (derivatives or {}).values():
+            for fmt in ("jpeg", "webp"):
+                name = entry.get(fmt)
+                if name and name != photo:
+                    held[name] += 1
+
+    mismatched = {
+        name: (refs, held[name])
+        for name, refs in StoredBlob.objects.values_list("name", "refs").iterator()
+        if refs != held[name]
+    }
+    if apply:
+        storage = Submission._meta.get_field("photo").storage
+        for name, (_, count) in mismatched.items():
+            with transaction.atomic():
+                # Down to the last reference, delete() drops the row and file
+                StoredBlob.objects.filter(pk=name).update(refs=count or 1)
+                if not count:
+                    storage.delete(name)
+    return mismatched
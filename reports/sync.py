@@ -0,0 +1,94 @@
+"""The change log behind the map's ``?since=`` delta feed.
+
+Every change to a public submission appends a SubmissionChange row in the
+same transaction (category edits, right after theirs), and a sync token is
+just a ``seq``. Sequence values are
+handed out before commit, though, so a transaction still in flight can
+commit an entry below one a reader has already seen. Tokens therefore
+only move past entries older than CHANGE_SETTLE_SECONDS; newer ones are
+sent again on the next poll, which clients apply idempotently.
+"""
+
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import SubmissionChange
+
+# Longer than any transaction that logs changes is expected to stay open
+CHANGE_SETTLE_SECONDS = 30
+CHANGE_RETENTION_DAYS = 30
+
+
+def record_changes(pks):
+    """Log a change to each of ``pks``; call inside the changing transaction."""
+    now = timezone.now()
+    SubmissionChange.objects.bulk_create(
+        [SubmissionChange(submission_id=pk, changed_at=now) for pk in sorted(set(pks))]
+    )
+
+
+def record_queryset_changes(queryset):
+    """Log a change to every submission in ``queryset`` with one INSERT ... SELECT.
+
+    For edits that touch many submissions at once, such as renaming a
+    category, so the pks never pass through Python. Returns the number of
+    entries logged.
+    """
+    select_sql, params = queryset.order_by().values("pk").query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {SubmissionChange._meta.db_table} (submission_id, changed_at) "
+            f"SELECT changed.id, %s FROM ({select_sql}) AS changed",
+            [timezone.now(), *params],
+        )
+        return cursor.rowcount
+
+
+def settled_token():
+    """Return the newest seq that no in-flight transaction can commit below."""
+    cutoff = timezone.now() - timedelta(seconds=CHANGE_SETTLE_SECONDS)
+    seq = (
+        SubmissionChange.objects.filter(changed_at__lt=cutoff)
+        .order_by("-seq")
+        .values_list("seq", flat=True)
+        .first()
+    )
+    return seq or 0
+
+
+def changes_since(since, limit):
+    """Return (submission pks, next token, has_more) for entries after ``since``.
+
+    At most ``limit`` entries are read; ``has_more`` says to ask again with
+    the next token straight away. Returns None when entries after ``since``
+    have been pruned (or the token is from another log), in which case the
+    client has to reload everything.
+    """
+    bounds = SubmissionChange.objects.aggregate(oldest=Min("seq"), newest=Max("seq"))
+    if since and (bounds["newest"] is None or since > bounds["newest"] or since + 1 < bounds["oldest"]):
+        return None
+
+    rows = list(
+        SubmissionChange.objects.filter(seq__gt=since)
+        .order_by("seq")
+        .values_list("seq", "submission_id")[:limit + 1]
+    )
+    more = len(rows) > limit
+    rows = rows[:limit]
+    token = since
+    if rows:
+        token = max(since, min(rows[-1][0], settled_token()))
+    return {pk for _, pk in rows}, token, more and token > since
+
+
+def prune_changes(days=CHANGE_RETENTION_DAYS):
+    """Delete entries older than ``days``, keeping the newest so tokens stay checkable."""
+    newest = SubmissionChange.objects.aggregate(newest=Max("seq"))["newest"]
+    if newest is None:
+        return 0
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = SubmissionChange.objects.filter(changed_at__lt=cutoff, seq__lt=newest).delete()
+    return deleted
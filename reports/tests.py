@@ -1,3 +1,1377 @@
-from django.test import TestCase
+import csv
+import json
+import mimetypes
+import os
+import random
+import re
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+import tracemalloc
+import zipfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.gis.geos import Point, Polygon
+from django.contrib.gis.measure import D
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.signals import request_finished
+from django.db import close_old_connections, connection, connections, transaction
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image, ImageCms
+
+from . import duplicates, export, jobs, metrics, tiles, utils, views
+from .cache import (
+    bump_category_version,
+    bump_map_data_version,
+    get_map_data_version,
+    get_tile_version,
+)
+from .duplicates import (
+    NEARBY_RADIUS_M,
+    MultiIndexHash,
+    PhotoHashIndex,
+    find_similar_photos,
+    hash_to_db,
+)
+from .filters import parse_bbox
+from .geojson import MAX_PK, decode_cursor, encode_cursor
+from .hexbins import rebuild_hexbins
+from .jobs import claim_job, enqueue_photo_job, run_job, store_derivatives
+from .middleware import RequestMetricsMiddleware
+from .models import (
+    Category,
+    HexBin,
+    PhotoJob,
+    StoredBlob,
+    Submission,
+    SubmissionChange,
+    SubmissionDailyStat,
+    User,
+)
+from .moderation import MAX_BATCH_SIZE, transition_submissions
+from .seeding import make_sample_photo
+from .staticfiles import PrecompressedStaticMiddleware
+from .stats import rebuild_stats
+from .storage import ContentAddressedStorage, content_hash, reconcile_blob_refs
+from .utils import DERIVATIVE_SIZES, cleanup_temp_uploads, process_photo, render_derivatives
+from .views import (
+    PAGE_ORDERING,
+    _abbreviate_count,
+    _public_submissions,
+    export_submissions,
+    map_view,
+    media_view,
+    moderate_action,
+    moderate_batch,
+    moderate_list,
+    submission_detail,
+    submission_tile,
+    submissions_clusters,
+    submissions_geojson,
+    submissions_hexbins,
+    submit_view,
+)
+
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+# Templates using {% static %} need a manifest from collectstatic otherwise
+PLAIN_STATIC_STORAGES = {
+    **settings.STORAGES,
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+def make_submission(user, category, lng=-108.55, lat=39.07, **fields):
+    return Submission.objects.create(
+        user=user,
+        category=category,
+        photo="submissions/seed.jpg",
+        latitude=lat,
+        longitude=lng,
+        location=Point(lng, lat, srid=4326),
+        **fields,
+    )
+
+
+class SubmissionQueryPlanTests(TestCase):
+    """Hot Submission queries must be answerable from an index.
+
+    Sequential scans are disabled for the session, which makes the planner
+    pick any usable index; a Seq Scan left in the plan means none applies.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("seed@example.com")
+        category = Category.objects.create(name="Tires", slug="tires", color="#333333")
+        statuses = [value for value, _ in Submission.Status.choices]
+        rng = random.Random(0)
+        subs = []
+        for _ in range(500):
+            lng = rng.uniform(-109.06, -107.85)
+            lat = rng.uniform(38.50, 39.37)
+            subs.append(Submission(
+                user=user,
+                category=category,
+                photo="submissions/seed.jpg",
+                latitude=round(lat, 6),
+                longitude=round(lng, 6),
+                location=Point(lng, lat, srid=4326),
+                status=rng.choice(statuses),
+            ))
+        Submission.objects.bulk_create(subs)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE reports_submission")
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertIndexed(self, queryset):
+        plan = queryset.explain()
+        self.assertNotIn("Seq Scan on reports_submission", plan, plan)
+
+    def _public(self, **params):
+        return _public_submissions(RequestFactory().get("/", params))
+
+    def test_public_map(self):
+        self.assertIndexed(self._public().order_by(*PAGE_ORDERING))
+
+    def test_public_map_status_filter(self):
+        self.assertIndexed(self._public(status="cleaned").order_by(*PAGE_ORDERING))
+
+    def test_public_map_date_range(self):
+        today = timezone.localdate()
+        qs = self._public(
+            date_from=(today - timedelta(days=30)).isoformat(),
+            date_to=today.isoformat(),
+        )
+        self.assertIndexed(qs.order_by(*PAGE_ORDERING))
+
+    def test_public_map_bbox(self):
+        bbox = Polygon.from_bbox((-108.7, 39.0, -108.4, 39.2))
+        self.assertIndexed(self._public().filter(location__intersects=bbox))
+
+    def test_nearby_reports(self):
+        point = Point(-108.55, 39.07, srid=4326)
+        qs = (
+            Submission.objects.filter(location__dwithin=(point, D(m=NEARBY_RADIUS_M)))
+            .exclude(status=Submission.Status.REJECTED)
+        )
+        self.assertIndexed(qs)
+
+    def test_moderation_queue(self):
+        self.assertIndexed(
+            Submission.objects.filter(status="pending").order_by("created_at", "id")
+        )
+
+    def test_submission_detail(self):
+        pk = Submission.objects.values_list("pk", flat=True).first()
+        self.assertIndexed(
+            Submission.objects.filter(pk=pk, status__in=Submission.PUBLIC_STATUSES)
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TileCacheTests(TestCase):
+    """Only unfiltered tiles are cached, one file per tile and tile version."""
+
+    Z = 12
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch.object(tiles, "TILE_CACHE_DIR", Path(tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        user = User.objects.create_user("tiles@example.com")
+        category = Category.objects.create(name="Tires", slug="tires", color="#333333")
+        make_submission(user, category, status=Submission.Status.APPROVED)
+        self.x, self.y = tiles.tile_for_point(-108.55, 39.07, self.Z)
+        self.tile_dir = tiles._tile_dir(self.Z, self.x, self.y)
+
+    def _get(self, **params):
+        request = RequestFactory().get("/", params)
+        return submission_tile(request, self.Z, self.x, self.y).content
+
+    def _files(self):
+        return [p.name for p in self.tile_dir.glob("*.mvt")]
+
+    def test_unfiltered_tile_cached_per_version(self):
+        self.assertTrue(self._get())
+        version = get_tile_version(self.Z, self.x, self.y)
+        self.assertEqual(self._files(), [f"{version}.mvt"])
+
+        tiles.invalidate_tiles_for_points([(-108.55, 39.07)])
+        self.assertGreater(get_tile_version(self.Z, self.x, self.y), version)
+        self._get()
+        self.assertEqual(self._files(), [f"{get_tile_version(self.Z, self.x, self.y)}.mvt"])
+
+    def test_change_elsewhere_keeps_tile(self):
+        self._get()
+        version = get_tile_version(self.Z, self.x, self.y)
+        # Across the county, so in other tiles at this zoom
+        tiles.invalidate_tiles_for_points([(-108.0, 39.4)])
+        bump_map_data_version()
+        self.assertEqual(get_tile_version(self.Z, self.x, self.y), version)
+        self.assertEqual(self._files(), [f"{version}.mvt"])
+
+    def test_category_change_invalidates_tile(self):
+        self._get()
+        version = get_tile_version(self.Z, self.x, self.y)
+        bump_category_version()
+        self.assertGreater(get_tile_version(self.Z, self.x, self.y), version)
+
+    def test_filtered_tile_not_cached(self):
+        self.assertTrue(self._get(date_from="2020-01-01"))
+        self.assertFalse(self.tile_dir.exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class HexbinEndpointTests(TestCase):
+    """Hex bins are served from the rollup, or binned on the fly for dates."""
+
+    def setUp(self):
+        user = User.objects.create_user("hexbins@example.com")
+        tires = Category.objects.create(name="Tires", slug="tires", color="#333333")
+        trash = Category.objects.create(name="Trash", slug="trash", color="#999999")
+        approved = Submission.Status.APPROVED
+        make_submission(user, tires, status=approved, severity=Submission.Severity.HIGH)
+        make_submission(user, tires, status=approved, severity=Submission.Severity.LOW)
+        make_submission(user, trash, status=Submission.Status.CLEANED)
+        # Not public, so never binned
+        make_submission(user, trash)
+
+    def _get(self, **params):
+        response = submissions_hexbins(RequestFactory().get("/", params))
+        if response.status_code != 200:
+            return response.status_code, None
+        return response.status_code, json.loads(response.content)
+
+    def test_response_shape(self):
+        status, data = self._get(zoom=6)
+        self.assertEqual(status, 200)
+        self.assertEqual(data["type"], "FeatureCollection")
+        self.assertEqual(data["resolution"], 2)
+        [feature] = data["features"]
+        self.assertEqual(feature["geometry"]["type"], "Polygon")
+        ring = feature["geometry"]["coordinates"][0]
+        self.assertEqual(len(ring), 7)
+        self.assertEqual(ring[0], ring[-1])
+        # Severity weights: high 3, low 1, medium 2
+        self.assertEqual(feature["properties"], {"count": 3, "score": 6})
+        self.assertEqual((data["max_count"], data["max_score"]), (3, 6))
+
+    def test_zoom_validated_and_clamped(self):
+        for zoom in ("", "abc", "-1", "25"):
+            self.assertEqual(self._get(zoom=zoom)[0], 400, zoom)
+        self.assertEqual(self._get(zoom=0)[1]["resolution"], 0)
+        self.assertEqual(self._get(zoom=9.5)[1]["resolution"], 5)
+        self.assertEqual(self._get(zoom=20)[1]["resolution"], 5)
+
+    def test_bbox_ignored(self):
+        # Bins cover the whole county whatever is in view
+        self.assertEqual(self._get(zoom=6), self._get(zoom=6, bbox="-108.6,39.0,-108.5,39.1"))
+        self.assertEqual(self._get(zoom=6), self._get(zoom=6, bbox="0,0,1,1"))
+
+    def test_filters_agree_with_date_path(self):
+        _, data = self._get(zoom=6, category="tires")
+        self.assertEqual(data["features"][0]["properties"], {"count": 2, "score": 4})
+        # Date filters bin the submissions themselves, with the same result
+        _, dated = self._get(zoom=6, category="tires", date_from="2000-01-01")
+        self.assertEqual(dated, data)
+        _, data = self._get(zoom=6, status=Submission.Status.CLEANED)
+        self.assertEqual(data["features"][0]["properties"], {"count": 1, "score": 2})
+
+
+class ClusterTests(TestCase):
+    """Server-side clusters count points as ints and return singles as features."""
+
+    BBOX = "-109,38.8,-108,39.5"
+
+    def setUp(self):
+        self.user = User.objects.create_user("clusters@example.com")
+        self.category = Category.objects.create(name="Tires", slug="tires", color="#333333")
+        approved = Submission.Status.APPROVED
+        self.near = [
+            make_submission(
+                self.user, self.category, lng=-108.55 + d, lat=39.07 + d, status=approved
+            )
+            for d in (-0.0001, 0, 0.0001)
+        ]
+        self.far = make_submission(self.user, self.category, lng=-108.2, lat=39.3, status=approved)
+        # Not public, so never counted
+        make_submission(self.user, self.category, lng=-108.55, lat=39.07)
+
+    def _get(self, **params):
+        response = submissions_clusters(RequestFactory().get("/", params))
+        if response.status_code != 200:
+            return response.status_code, None
+        return response.status_code, json.loads(response.content)
+
+    def test_clusters_and_single_points(self):
+        status, data = self._get(zoom=10, bbox=self.BBOX)
+        self.assertEqual(status, 200)
+        clusters = [f for f in data["features"] if f["properties"].get("cluster")]
+        singles = [f for f in data["features"] if not f["properties"].get("cluster")]
+
+        self.assertEqual(len(clusters), 1)
+        props = clusters[0]["properties"]
+        self.assertIs(type(props["point_count"]), int)
+        self.assertEqual(props["point_count"], 3)
+        self.assertEqual(props["point_count_abbreviated"], "3")
+        self.assertEqual(props["categories"], {"tires": 3})
+        self.assertEqual([f["properties"]["id"] for f in singles], [self.far.pk])
+        self.assertEqual(
+            singles[0]["properties"]["detail_url"], f"/submission/{self.far.pk}/"
+        )
+
+    def test_individual_points_past_cluster_zoom(self):
+        _, data = self._get(zoom=15, bbox=self.BBOX)
+        self.assertEqual(
+            sorted(f["properties"]["id"] for f in data["features"]),
+            sorted(sub.pk for sub in [*self.near, self.far]),
+        )
+
+    def test_bbox_and_zoom_validated(self):
+        _, data = self._get(zoom=10, bbox="-108.3,39.2,-108.1,39.4")
+        self.assertEqual([f["properties"]["id"] for f in data["features"]], [self.far.pk])
+        self.assertEqual(self._get(zoom=25, bbox=self.BBOX)[0], 400)
+        self.assertEqual(self._get(zoom="x", bbox=self.BBOX)[0], 400)
+        self.assertEqual(self._get(zoom=10)[0], 400)
+
+    def test_abbreviated_counts(self):
+        self.assertEqual(
+            [_abbreviate_count(n) for n in (999, 1234, 12345)], ["999", "1.2k", "12k"]
+        )
+
+
+class GeoJSONParamTests(SimpleTestCase):
+    """Query parameters are validated before they reach the database."""
+
+    def test_bbox_across_antimeridian_is_split(self):
+        bbox = parse_bbox("170,-10,-170,10")
+        self.assertEqual(bbox.geom_type, "MultiPolygon")
+        self.assertEqual([part.extent for part in bbox], [(170, -10, 180, 10), (-180, -10, -170, 10)])
+        self.assertIsNone(parse_bbox("10,10,10,20"))
+        self.assertIsNone(parse_bbox("0,0,200,10"))
+
+    def test_cursor_pk_must_fit_bigint(self):
+        now = timezone.now()
+        self.assertEqual(decode_cursor(encode_cursor(now, MAX_PK)), (now, MAX_PK))
+        self.assertIsNone(decode_cursor(encode_cursor(now, MAX_PK + 1)))
+        self.assertIsNone(decode_cursor(encode_cursor(now, 0)))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class GeoJSONCacheTests(TestCase):
+    """Pages stream on a miss, are cached whole, and follow category edits."""
+
+    def _get(self):
+        response = submissions_geojson(RequestFactory().get("/"))
+        if response.streaming:
+            return b"".join(response.streaming_content)
+        return response.content
+
+    def test_streamed_page_is_cached_until_category_edit(self):
+        user = User.objects.create_user("pages@example.com")
+        category = Category.objects.create(name="Tires", slug="tires", color="#333333")
+        with self.captureOnCommitCallbacks(execute=True):
+            make_submission(user, category, status=Submission.Status.APPROVED)
+
+        first = self._get()
+        self.assertIn(b'"category_name": "Tires"', first)
+        with self.assertNumQueries(0):
+            self.assertEqual(self._get(), first)
+
+        category.name = "Old tires"
+        with self.captureOnCommitCallbacks(execute=True):
+            category.save()
+        self.assertIn(b'"category_name": "Old tires"', self._get())
+
+    def test_version_bumped_only_after_commit(self):
+        user = User.objects.create_user("pages@example.com")
+        category = Category.objects.create(name="Tires", slug="tires", color="#333333")
+        version = get_map_data_version()
+        with self.captureOnCommitCallbacks() as callbacks:
+            make_submission(user, category, status=Submission.Status.APPROVED)
+            # A reader inside the window still sees the old version
+            self.assertEqual(get_map_data_version(), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_map_data_version(), version)
+
+
+class PhotoDerivativeTests(TestCase):
+    """Each derivative size is rendered as JPEG and WebP and offered in a srcset."""
+
+    # What process_photo leaves: at most 1920px on the long edge
+    PHOTO_SIZE = (1920, 1440)
+    EXPECTED = {"full": (1920, 1440), "medium": (960, 720), "thumb": (320, 240)}
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = override_settings(MEDIA_ROOT=tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.storage = Submission._meta.get_field("photo").storage
+        self.photo = make_sample_photo(self.PHOTO_SIZE)
+
+    def _image(self, f):
+        with Image.open(f) as img:
+            return img.format, img.size
+
+    def test_render_sizes_and_formats(self):
+        rendered = render_derivatives(BytesIO(self.photo))
+        self.assertEqual(list(rendered), [size for size, _ in DERIVATIVE_SIZES])
+        for size, variant in rendered.items():
+            dimensions = self.EXPECTED[size]
+            self.assertEqual((variant["width"], variant["height"]), dimensions)
+            self.assertEqual(self._image(variant["webp"]), ("WEBP", dimensions))
+            if size == "full":
+                # The resized photo itself is the full-size JPEG
+                self.assertNotIn("jpeg", variant)
+            else:
+                self.assertEqual(self._image(variant["jpeg"]), ("JPEG", dimensions))
+
+    def test_stored_derivatives_in_srcset(self):
+        user = User.objects.create_user("photos@example.com")
+        category = Category.objects.create(name="Tires", slug="tires", color="#333333")
+        sub = make_submission(user, category)
+        sub.photo.save("upload.jpg", ContentFile(self.photo), save=False)
+        store_derivatives(sub, BytesIO(self.photo))
+        sub.save()
+
+        self.assertEqual(sub.photo_derivatives["full"]["jpeg"], sub.photo.name)
+        names = {}
+        for size, entry in sub.photo_derivatives.items():
+            for fmt in ("jpeg", "webp"):
+                with self.storage.open(entry[fmt]) as f:
+                    self.assertEqual(self._image(f), (fmt.upper(), self.EXPECTED[size]))
+                names[self.storage.url(entry[fmt])] = entry[fmt]
+
+        html = render_to_string(
+            "includes/submission_photo.html", {"submission": sub, "sizes": "80px"}
+        )
+        srcsets = re.findall(r'srcset="([^"]*)"', html)
+        self.assertEqual(len(srcsets), 2)
+        self.assertIn('type="image/webp"', html)
+        self.assertIn('sizes="80px"', html)
+        for srcset, fmt in zip(srcsets, ("WEBP", "JPEG")):
+            candidates = [c.split() for c in srcset.split(", ")]
+            self.assertEqual(
+                [width for _, width in candidates],
+                [f"{w}w" for w, _ in sorted(self.EXPECTED.values())],
+            )
+            for url, width in candidates:
+                with self.storage.open(names[url]) as f:
+                    found, (found_width, _) = self._image(f)
+                self.assertEqual((found, f"{found_width}w"), (fmt, width))
+
+
+class PhotoProcessingTests(TestCase):
+    """Unprocessed uploads stay private, and jobs respect their lease."""
+
+    def setUp(self):
+        self.user = User.objects.create_user("jobs@example.com")
+        self.category = Category.objects.create(name="Tires", slug="tires", color="#333333")
+
+    def test_processing_submission_cannot_be_approved(self):
+        sub = make_submission(self.user, self.category, processing=True)
+        result = transition_submissions([sub.pk], Submission.Status.APPROVED, self.user)
+        self.assertEqual(result.skipped, {sub.pk: "processing"})
+        # Rejecting doesn't publish anything
+        result = transition_submissions([sub.pk], Submission.Status.REJECTED, self.user)
+        self.assertEqual(result.updated, [sub.pk])
+
+    def test_outcome_discarded_after_lease_lost(self):
+        sub = make_submission(self.user, self.category, processing=True)
+        enqueue_photo_job(sub)
+        job = claim_job()
+        # The lease ran out and another worker reclaimed the job
+        PhotoJob.objects.filter(pk=job.pk).update(locked_until=timezone.now() + timedelta(minutes=5))
+
+        self.assertFalse(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, PhotoJob.Status.RUNNING)
+        self.assertEqual(job.last_error, "")
+
+    def _uploaded(self, media_root):
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        storage = Submission._meta.get_field("photo").storage
+        name = storage.save("submissions/upload.jpg", ContentFile(make_sample_photo((64, 64))))
+        sub = make_submission(self.user, self.category, processing=True)
+        Submission.objects.filter(pk=sub.pk).update(photo=name)
+        enqueue_photo_job(sub)
+        return sub, name
+
+    def test_storage_untouched_after_lease_lost(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        sub, name = self._uploaded(tmp.name)
+        job = claim_job()
+        render = jobs.render_derivatives
+
+        def slow_render(*args, **kwargs):
+            # Rendering outlived the lease and another worker reclaimed the job
+            PhotoJob.objects.filter(pk=job.pk).update(
+                locked_until=timezone.now() + timedelta(minutes=5)
+            )
+            return render(*args, **kwargs)
+
+        with mock.patch.object(jobs, "render_derivatives", slow_render):
+            self.assertFalse(run_job(job))
+        sub.refresh_from_db()
+        self.assertTrue(sub.processing)
+        self.assertEqual(sub.photo.name, name)
+        self.assertEqual(sub.photo_derivatives, {})
+        files = [p for p in Path(tmp.name).rglob("*") if p.is_file()]
+        self.assertEqual(len(files), 1)
+
+    def test_lease_renewed_before_saving(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        sub, _ = self._uploaded(tmp.name)
+        job = claim_job()
+
+        with mock.patch.object(jobs, "renew_lease", wraps=jobs.renew_lease) as renew:
+            self.assertTrue(run_job(job))
+        renew.assert_called_once_with(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, PhotoJob.Status.DONE)
+        sub.refresh_from_db()
+        self.assertFalse(sub.processing)
+        self.assertEqual(set(sub.photo_derivatives), {"full", "medium", "thumb"})
+
+
+class UploadMemoryTests(TransactionTestCase):
+    """Concurrent full-size uploads must not be buffered in memory."""
+
+    UPLOAD_SIZE = 20 * 1024 * 1024
+    CONCURRENT_UPLOADS = 4
+
+    def setUp(self):
+        self.user = User.objects.create_user("uploader@example.com")
+        self.category = Category.objects.create(name="Tires", slug="tires", color="#333333")
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        override = override_settings(MEDIA_ROOT=media_root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def _upload_request(self):
+        # A real JPEG padded to 20 MB; decoders ignore trailing bytes
+        data = make_sample_photo((64, 64))
+        data += b"\0" * (self.UPLOAD_SIZE - len(data))
+        photo = SimpleUploadedFile("photo.jpg", data, content_type="image/jpeg")
+        request = RequestFactory().post("/submit/", {
+            "photo": photo,
+            "category": self.category.pk,
+            "severity": Submission.Severity.LOW,
+            "latitude": "39.07",
+            "longitude": "-108.55",
+            "confirm_nearby": "on",
+        })
+        request.user = self.user
+        request._messages = CookieStorage(request)
+        return request
+
+    def test_concurrent_uploads_stream_to_disk(self):
+        requests = [self._upload_request() for _ in range(self.CONCURRENT_UPLOADS)]
+        responses = []
+
+        def handle(request):
+            try:
+                responses.append(submit_view(request))
+            finally:
+                connections.close_all()
+
+        tracemalloc.start()
+        try:
+            threads = [threading.Thread(target=handle, args=(r,)) for r in requests]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual([r.status_code for r in responses], [302] * self.CONCURRENT_UPLOADS)
+        self.assertEqual(Submission.objects.filter(processing=True).count(), self.CONCURRENT_UPLOADS)
+        for submission in Submission.objects.all():
+            self.assertEqual(submission.photo.size, self.UPLOAD_SIZE)
+        # Well under the size of even one upload held in memory
+        self.assertLess(peak, self.UPLOAD_SIZE // 4)
+
+
+class TempUploadCleanupTests(SimpleTestCase):
+    """Only temp photos older than TEMP_MAX_AGE are removed, in either layout."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        patcher = mock.patch.object(utils, "TEMP_PHOTO_DIR", self.root)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _file(self, path, age):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"photo")
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_expired_buckets_and_flat_files_removed(self):
+        now = time.time()
+        old_bucket = int((now - 2 * utils.TEMP_MAX_AGE) // utils.TEMP_BUCKET_SECONDS)
+        new_bucket = int(now // utils.TEMP_BUCKET_SECONDS)
+        old_age, new_age = 2 * utils.TEMP_MAX_AGE, 60
+        self._file(self.root / str(old_bucket) / "a.jpg", old_age)
+        kept = [
+            self._file(self.root / str(new_bucket) / "b.jpg", new_age),
+            # The old flat layout, still being written by a previous release
+            self._file(self.root / "recent.jpg", new_age),
+        ]
+        self._file(self.root / "stale.jpg", old_age)
+
+        self.assertEqual(cleanup_temp_uploads(), 1)
+        self.assertEqual(
+            sorted(p for p in self.root.rglob("*") if p.is_file()), sorted(kept)
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORAGES=PLAIN_STATIC_STORAGES)
+class ModerationQueueTests(TestCase):
+    """The queue pages by keyset, caps its count and moves on after each action."""
+
+    def setUp(self):
+        self.user = User.objects.create_user("queue@example.com", role="moderator")
+        category = Category.objects.create(name="Tires", slug="tires", color="#333333")
+        self.pending = [make_submission(self.user, category) for _ in range(5)]
+        # Equal timestamps, so pages are told apart by id alone
+        Submission.objects.update(created_at=timezone.now())
+        make_submission(self.user, category, status=Submission.Status.APPROVED)
+
+    def _list(self, **params):
+        request = RequestFactory().get("/moderate/", params)
+        request.user = self.user
+        with mock.patch.object(views, "render", wraps=views.render) as render:
+            response = moderate_list(request)
+        context = render.call_args.args[2] if render.called else None
+        return response, context
+
+    def test_pages_follow_after_cursor(self):
+        pages = []
+        params = {}
+        with mock.patch.object(views, "MODERATION_PAGE_SIZE", 2):
+            while True:
+                response, context = self._list(**params)
+                self.assertEqual(response.status_code, 200)
+                pages.append([sub.pk for sub in context["submissions"]])
+                self.assertEqual(context["is_first_page"], not params)
+                if context["next_cursor"] is None:
+                    break
+                params = {"after": context["next_cursor"]}
+
+        pks = [sub.pk for sub in self.pending]
+        self.assertEqual(pages, [pks[0:2], pks[2:4], pks[4:]])
+        self.assertEqual(self._list(after="not-a-cursor")[0].status_code, 400)
+
+    def test_pending_count_capped(self):
+        self.assertEqual(self._list()[1]["pending_count"], 5)
+        with mock.patch.object(views, "PENDING_COUNT_CAP", 5):
+            self.assertEqual(self._list()[1]["pending_count"], 5)
+        with mock.patch.object(views, "PENDING_COUNT_CAP", 3):
+            self.assertEqual(self._list()[1]["pending_count"], "3+")
+
+    def _act(self, submission, action="approve"):
+        request = RequestFactory().post(f"/moderate/{submission.pk}/action/", {"action": action})
+        request.user = self.user
+        request._messages = CookieStorage(request)
+        return moderate_action(request, submission.pk)
+
+    def test_action_redirects_to_next_pending(self):
+        first, second, *_, last = self.pending
+        response = self._act(second)
+        self.assertEqual(response.url, reverse("reports:moderate_detail", args=[self.pending[2].pk]))
+        # Past the newest, it wraps around to the oldest still pending
+        response = self._act(last, "reject")
+        self.assertEqual(response.url, reverse("reports:moderate_detail", args=[first.pk]))
+        # Already moderated
+        with self.assertRaises(Http404):
+            self._act(second)
+
+    def test_last_action_returns_to_list(self):
+        Submission.objects.filter(pk__in=[sub.pk for sub in self.pending[1:]]).delete()
+        response = self._act(self.pending[0])
+        self.assertEqual(response.url, reverse("reports:moderate_list"))
+
+
+class BatchModerationTests(TestCase):
+    """Batch moderation applies only allowed transitions, in bounded batches."""
+
+    def setUp(self):
+        self.user = User.objects.create_user("batch@example.com", role="moderator")
+        self.category = Category.objects.create(name="Tires", slug="tires", color="#333333")
+
+    def _post(self, payload):
+        request = RequestFactory().post(
+            "/moderate/batch/", json.dumps(payload), content_type="application/json"
+        )
+        request.user = self.user
+        return moderate_batch(request)
+
+    def test_disallowed_transitions_are_skipped(self):
+        pending = make_submission(self.user, self.category)
+        cleaned = make_submission(self.user, self.category, status=Submission.Status.CLEANED)
+
+        result = transition_submissions(
+            [pending.pk, cleaned.pk, 0], Submission.Status.APPROVED, self.user
+        )
+
+        self.assertEqual(result.updated, [pending.pk])
+        self.assertEqual(result.skipped, {cleaned.pk: "invalid_transition", 0: "not_found"})
+        cleaned.refresh_from_db()
+        self.assertEqual(cleaned.status, Submission.Status.CLEANED)
+
+    def test_batch_limit(self):
+        response = self._post({"ids": list(range(1, MAX_BATCH_SIZE + 2)), "action": "approve"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_ids_must_be_a_list(self):
+        sub = make_submission(self.user, self.category)
+        response = self._post({"ids": str(sub.pk), "action": "approve"})
+        self.assertEqual(response.status_code, 400)
+
+        response = self._post({"ids": [sub.pk], "action": "approve"})
+        self.assertEqual(json.loads(response.content), {"updated": [sub.pk], "skipped": {}})
+
+
+class BatchModerationLockTests(TransactionTestCase):
+    """Rows locked by another transaction are skipped, not waited on."""
+
+    def test_locked_rows_are_skipped(self):
+        user = User.objects.create_user("locks@example.com")
+        category = Category.objects.create(name="Tires", slug="tires", color="#333333")
+        held = make_submission(user, category)
+        free = make_submission(user, category)
+        locked = threading.Event()
+        release = threading.Event()
+
+        def hold_lock():
+            try:
+                with transaction.atomic():
+                    list(Submission.objects.select_for_update().filter(pk=held.pk))
+                    locked.set()
+                    release.wait(10)
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=hold_lock)
+        thread.start()
+        try:
+            self.assertTrue(locked.wait(10))
+            result = transition_submissions([held.pk, free.pk], Submission.Status.APPROVED, user)
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(result.updated, [free.pk])
+        self.assertEqual(result.skipped, {held.pk: "locked"})
+
+
+class MultiIndexHashTests(SimpleTestCase):
+    """The block index finds exactly the hashes a linear scan would."""
+
+    MAX_DISTANCE = 5
+
+    def _flip(self, value, rng, bits):
+        for bit in rng.sample(range(64), bits):
+            value ^= 1 << bit
+        return value
+
+    def test_matches_brute_force(self):
+        rng = random.Random(7)
+        index = MultiIndexHash(self.MAX_DISTANCE)
+        query = rng.getrandbits(64)
+        hashes = {}
+        # Near and far variants of the query, plus unrelated hashes
+        for key in range(300):
+            if key < 100:
+                hashes[key] = self._flip(query, rng, key % (self.MAX_DISTANCE + 3))
+            else:
+                hashes[key] = rng.getrandbits(64)
+            index.add(key, hashes[key])
+
+        expected = {
+            key: (value ^ query).bit_count()
+            for key, value in hashes.items()
+            if (value ^ query).bit_count() <= self.MAX_DISTANCE
+        }
+        self.assertEqual(dict(index.search(query)), expected)
+        self.assertTrue(all(key < 100 for key in expected))
+        # Every distance up to the maximum was recalled, none beyond it
+        self.assertEqual(set(expected.values()), set(range(self.MAX_DISTANCE + 1)))
+
+
+class SimilarPhotoTests(TestCase):
+    """Near-duplicate lookups return the closest few, excluding rejected reports."""
+
+    def setUp(self):
+        patcher = mock.patch.object(duplicates, "photo_hash_index", PhotoHashIndex())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user("hashes@example.com")
+        self.category = Category.objects.create(name="Tires", slug="tires", color="#333333")
+
+    def _submission(self, value, **fields):
+        return make_submission(self.user, self.category, photo_hash=hash_to_db(value), **fields)
+
+    def test_closest_first_and_limited(self):
+        query = (1 << 63) | 0xF0F0
+        exact = self._submission(query)
+        rejected = self._submission(query ^ 0b1, status=Submission.Status.REJECTED)
+        near = [self._submission(query ^ (0b11 << n)) for n in range(0, 20, 2)]
+        far = self._submission(query ^ 0b111111)
+
+        result = find_similar_photos(query, limit=3)
+        self.assertEqual(
+            [(sub.pk, distance) for sub, distance in result],
+            [(exact.pk, 0), (near[0].pk, 2), (near[1].pk, 2)],
+        )
+
+        pks = [sub.pk for sub, _ in find_similar_photos(hash_to_db(query), limit=20)]
+        self.assertEqual(len(pks), 11)
+        self.assertNotIn(rejected.pk, pks)
+        self.assertNotIn(far.pk, pks)
+
+    def test_rebuild_finds_backfilled_hashes(self):
+        query = 0xF0F0
+        old = make_submission(self.user, self.category)
+        self._submission(~query & ((1 << 64) - 1))
+        self.assertEqual(find_similar_photos(query), [])
+
+        # Behind the index's last pk, as backfill_photo_hashes leaves it
+        Submission.objects.filter(pk=old.pk).update(photo_hash=hash_to_db(query))
+        self.assertEqual(find_similar_photos(query), [])
+
+        duplicates.photo_hash_index.built_at -= duplicates.HASH_INDEX_REBUILD_INTERVAL
+        self.assertEqual([(sub.pk, d) for sub, d in find_similar_photos(query)], [(old.pk, 0)])
+
+
+class RequestMetricsTests(TestCase):
+    """Streaming responses are measured until their body has been sent."""
+
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        # As in the test client: closing a response must not close the
+        # connection holding the test transaction
+        request_finished.disconnect(close_old_connections)
+        self.addCleanup(request_finished.connect, close_old_connections)
+
+    def _middleware(self, response):
+        return RequestMetricsMiddleware(lambda request: response)
+
+    def _streaming_response(self):
+        def body():
+            for n in range(2):
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT %s", [n])
+                yield b"chunk"
+
+        return StreamingHttpResponse(body())
+
+    def test_queries_while_streaming_are_counted(self):
+        response = self._middleware(self._streaming_response())(RequestFactory().get("/"))
+        self.assertNotIn("reports_request_queries", metrics.render())
+
+        self.assertEqual(b"".join(response), b"chunkchunk")
+        response.close()
+
+        rendered = metrics.render()
+        self.assertIn('reports_request_queries_sum{view="unmatched"} 2.0', rendered)
+        self.assertIn('reports_request_queries_count{view="unmatched"} 1', rendered)
+        self.assertIn('reports_response_bytes_sum{view="unmatched"} 10.0', rendered)
+        self.assertEqual(connection.execute_wrappers, [])
+
+    def test_closed_before_iteration_is_recorded_once(self):
+        response = self._middleware(self._streaming_response())(RequestFactory().get("/"))
+        response.close()
+        response.close()
+
+        rendered = metrics.render()
+        self.assertIn('reports_request_seconds_count{view="unmatched"} 1', rendered)
+        self.assertIn('reports_request_queries_sum{view="unmatched"} 0.0', rendered)
+
+    def test_file_response_left_for_file_wrapper(self):
+        response = FileResponse(BytesIO(b"x" * 100))
+        stream = response.streaming_content
+        self.assertIs(self._middleware(response)(RequestFactory().get("/")), response)
+        # Not wrapped, so the server can still send the file itself
+        self.assertIs(response.streaming_content, stream)
+
+        rendered = metrics.render()
+        self.assertIn('reports_request_seconds_count{view="unmatched"} 1', rendered)
+        self.assertIn('reports_response_bytes_sum{view="unmatched"} 100.0', rendered)
+        response.close()
+
+
+class StatsRollupTests(TestCase):
+    """Incremental rollup updates must match a rebuild from scratch."""
+
+    def _snapshot(self):
+        stats = set(
+            SubmissionDailyStat.objects.filter(count__gt=0)
+            .values_list("day", "category_id", "severity", "status", "count")
+        )
+        bins = set(
+            HexBin.objects.filter(count__gt=0)
+            .values_list("resolution", "q", "r", "category_id", "severity", "status", "count")
+        )
+        return stats, bins
+
+    def test_incremental_matches_rebuild(self):
+        user = User.objects.create_user("stats@example.com")
+        tires = Category.objects.create(name="Tires", slug="tires", color="#333333")
+        trash = Category.objects.create(name="Trash", slug="trash", color="#999999")
+        subs = [
+            Submission.objects.create(
+                user=user,
+                category=category,
+                photo="submissions/seed.jpg",
+                latitude=39.07,
+                longitude=-108.55,
+                location=Point(-108.55, 39.07, srid=4326),
+            )
+            for category in (tires, tires, trash)
+        ]
+        transition_submissions([subs[0].pk, subs[1].pk], Submission.Status.APPROVED, user)
+        sub = Submission.objects.get(pk=subs[2].pk)
+        sub.severity = Submission.Severity.HIGH
+        sub.save()
+        Submission.objects.get(pk=subs[1].pk).delete()
+
+        incremental = self._snapshot()
+        rebuild_stats()
+        rebuild_hexbins()
+        self.assertEqual(incremental, self._snapshot())
+
+
+class ExportTests(TestCase):
+    """Exports read back in every format, and only staff may download them."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        override = override_settings(MEDIA_ROOT=tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.staff = User.objects.create_user("staff@example.com", is_staff=True)
+        category = Category.objects.create(name="Tires", slug="tires", color="#333333")
+        storage = Submission._meta.get_field("photo").storage
+        self.photos = {}
+        self.subs = []
+        for lng, lat, size in ((-108.55, 39.07, 32), (-108.40, 39.10, 48)):
+            sub = make_submission(
+                self.staff, category, lng=lng, lat=lat, status=Submission.Status.APPROVED
+            )
+            data = make_sample_photo((size, size))
+            name = storage.save(f"submissions/{size}.jpg", ContentFile(data))
+            Submission.objects.filter(pk=sub.pk).update(photo=name)
+            self.photos[sub.pk] = (name, data)
+            self.subs.append(sub)
+        # Not public, so never exported
+        make_submission(self.staff, category)
+
+    def _export(self, user=None, **params):
+        request = RequestFactory().get("/export/", params)
+        request.user = user or self.staff
+        response = export_submissions(request)
+        if not response.streaming:
+            return response, None
+        return response, list(response.streaming_content)
+
+    def test_staff_only(self):
+        request = RequestFactory().get("/export/")
+        request.user = AnonymousUser()
+        self.assertEqual(export_submissions(request).status_code, 302)
+        user = User.objects.create_user("user@example.com")
+        self.assertEqual(self._export(user)[0].status_code, 403)
+        self.assertEqual(self._export(format="xml")[0].status_code, 400)
+
+        response, _ = self._export()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn('filename="submissions-', response["Content-Disposition"])
+
+    def test_csv(self):
+        _, chunks = self._export(format="csv")
+        rows = list(csv.reader(StringIO(b"".join(chunks).decode())))
+        self.assertEqual(tuple(rows[0]), export.EXPORT_COLUMNS)
+        records = [dict(zip(rows[0], row)) for row in rows[1:]]
+        self.assertEqual([int(r["id"]) for r in records], [sub.pk for sub in self.subs])
+        self.assertEqual(
+            (float(records[1]["longitude"]), float(records[1]["latitude"])), (-108.40, 39.10)
+        )
+        self.assertEqual(records[0]["category"], "tires")
+        self.assertEqual(records[0]["cleaned_at"], "")
+
+    def test_ndjson(self):
+        _, chunks = self._export(format="ndjson")
+        features = [json.loads(line) for line in b"".join(chunks).decode().splitlines()]
+        self.assertEqual([f["properties"]["id"] for f in features], [sub.pk for sub in self.subs])
+        self.assertEqual(features[1]["geometry"], {"type": "Point", "coordinates": [-108.4, 39.1]})
+        self.assertNotIn("latitude", features[0]["properties"])
+        self.assertIsNone(features[0]["properties"]["cleaned_at"])
+
+    def test_geopackage(self):
+        _, chunks = self._export(format="gpkg")
+        path = Path(self.tmp) / "export.gpkg"
+        path.write_bytes(b"".join(chunks))
+        conn = sqlite3.connect(path)
+        self.addCleanup(conn.close)
+
+        self.assertEqual(conn.execute("PRAGMA application_id").fetchone()[0], 1196444487)
+        rows = conn.execute("SELECT submission_id, geom FROM submissions ORDER BY fid").fetchall()
+        self.assertEqual([pk for pk, _ in rows], [sub.pk for sub in self.subs])
+        magic, _, flags, srs_id = struct.unpack("<2sBBi", rows[1][1][:8])
+        self.assertEqual((magic, flags, srs_id), (b"GP", 1, 4326))
+        self.assertEqual(struct.unpack("<BIdd", rows[1][1][8:]), (1, 1, -108.40, 39.10))
+        bounds = conn.execute(
+            "SELECT min_x, min_y, max_x, max_y FROM gpkg_contents WHERE table_name = 'submissions'"
+        ).fetchone()
+        self.assertEqual(bounds, (-108.55, 39.07, -108.40, 39.10))
+
+    def test_zip_with_photos(self):
+        # Flush after every write, so the zip arrives in many pieces
+        with mock.patch.object(export, "ZIP_FLUSH_BYTES", 1):
+            response, chunks = self._export(format="ndjson", photos="1")
+        self.assertEqual(response["Content-Type"], "application/zip")
+        self.assertGreater(len(chunks), 2)
+
+        with zipfile.ZipFile(BytesIO(b"".join(chunks))) as zf:
+            self.assertIsNone(zf.testzip())
+            expected = ["submissions.geojsonl"] + [
+                f"photos/{pk}{Path(name).suffix}" for pk, (name, _) in self.photos.items()
+            ]
+            self.assertEqual(zf.namelist(), expected)
+            lines = zf.read("submissions.geojsonl").decode().splitlines()
+            self.assertEqual(len(lines), len(self.subs))
+            for pk, (name, data) in self.photos.items():
+                self.assertEqual(zf.read(f"photos/{pk}{Path(name).suffix}"), data)
+
+
+class ContentAddressedStorageTests(TestCase):
+    """Identical content is stored once and removed with its last reference."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.storage = ContentAddressedStorage(location=self.tmp.name)
+
+    def test_duplicate_saves_share_one_file(self):
+        first = self.storage.save("submissions/a.jpg", ContentFile(b"same bytes"))
+        second = self.storage.save("submissions/b.jpg", ContentFile(b"same bytes"))
+        other = self.storage.save("submissions/c.jpg", ContentFile(b"other bytes"))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertRegex(first, r"^cas/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$")
+        self.assertEqual(StoredBlob.objects.get(pk=first).refs, 2)
+
+        self.storage.delete(first)
+        self.assertTrue(self.storage.exists(first))
+        self.storage.delete(second)
+        self.assertFalse(self.storage.exists(first))
+        self.assertFalse(StoredBlob.objects.filter(pk=first).exists())
+
+
+class StoredBlobReconcileTests(TestCase):
+    """Reference counts can be recounted from the submissions holding them."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = override_settings(MEDIA_ROOT=tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.storage = Submission._meta.get_field("photo").storage
+
+    def test_leaked_and_orphaned_refs_are_corrected(self):
+        user = User.objects.create_user("blobs@example.com")
+        category = Category.objects.create(name="Tires", slug="tires", color="#333333")
+        held = self.storage.save("submissions/a.jpg", ContentFile(b"held"))
+        # A second save whose submission was never written
+        self.storage.save("submissions/b.jpg", ContentFile(b"held"))
+        orphan = self.storage.save("submissions/c.jpg", ContentFile(b"orphan"))
+        sub = make_submission(user, category)
+        Submission.objects.filter(pk=sub.pk).update(photo=held)
+
+        self.assertEqual(reconcile_blob_refs(), {held: (2, 1), orphan: (1, 0)})
+        self.assertEqual(StoredBlob.objects.get(pk=held).refs, 2)
+
+        reconcile_blob_refs(apply=True)
+        self.assertEqual(StoredBlob.objects.get(pk=held).refs, 1)
+        self.assertFalse(StoredBlob.objects.filter(pk=orphan).exists())
+        self.assertFalse(self.storage.exists(orphan))
+        self.assertTrue(self.storage.exists(held))
+        self.assertEqual(reconcile_blob_refs(), {})
+
+    def test_media_etag_matches_any_listed_tag(self):
+        name = self.storage.save("submissions/a.jpg", ContentFile(b"photo"))
+        etag = f'"{content_hash(name)}"'
+
+        def get(if_none_match):
+            request = RequestFactory().get(f"/media/{name}", HTTP_IF_NONE_MATCH=if_none_match)
+            return media_view(request, name)
+
+        self.assertEqual(get(f'"other", W/{etag}').status_code, 304)
+        self.assertEqual(get("*").status_code, 304)
+        self.assertEqual(get(f'"x{etag[1:]}').status_code, 200)
+
+
+class PrecompressedStaticTests(SimpleTestCase):
+    """Collected files are served in the best encoding the client accepts."""
+
+    NAME = "js/map.0123456789ab.js"
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = Path(tmp.name, self.NAME)
+        path.parent.mkdir()
+        path.write_bytes(b"plain")
+        Path(f"{path}.gz").write_bytes(b"gzipped")
+        Path(f"{path}.br").write_bytes(b"brotli")
+        override = override_settings(STATIC_URL="/static/", STATIC_ROOT=tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.middleware = PrecompressedStaticMiddleware(lambda request: HttpResponse(status=404))
+
+    def _get(self, accept_encoding=None, **headers):
+        if accept_encoding is not None:
+            headers["HTTP_ACCEPT_ENCODING"] = accept_encoding
+        response = self.middleware(RequestFactory().get(f"/static/{self.NAME}", **headers))
+        if response.streaming:
+            body = b"".join(response.streaming_content)
+            response.file_to_stream.close()
+        else:
+            body = response.content
+        return response, body
+
+    def test_encoding_negotiation(self):
+        for accept, encoding, body in (
+            ("gzip, deflate, br", "br", b"brotli"),
+            ("br;q=0, gzip", "gzip", b"gzipped"),
+            ("gzip;q=0.5", "gzip", b"gzipped"),
+            ("identity", None, b"plain"),
+            (None, None, b"plain"),
+        ):
+            with self.subTest(accept=accept):
+                response, content = self._get(accept)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.get("Content-Encoding"), encoding)
+                self.assertEqual(content, body)
+                self.assertEqual(response["Content-Type"], mimetypes.guess_type(self.NAME)[0])
+                self.assertEqual(response["Vary"], "Accept-Encoding")
+                self.assertIn("immutable", response["Cache-Control"])
+                self.assertNotIn("Content-Disposition", response)
+
+    def test_not_modified_per_encoding(self):
+        response, _ = self._get("br")
+        etag = response["ETag"]
+
+        response, content = self._get("br", HTTP_IF_NONE_MATCH=f'"other", W/{etag}')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(content, b"")
+        self.assertEqual(response["ETag"], etag)
+        response, _ = self._get("br", HTTP_IF_NONE_MATCH="*")
+        self.assertEqual(response.status_code, 304)
+        # The gzip variant is a different representation
+        response, _ = self._get("gzip", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_files_fall_through(self):
+        response = self.middleware(RequestFactory().get("/static/js/missing.js"))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORAGES=PLAIN_STATIC_STORAGES)
+class DetailCacheTests(TestCase):
+    """Cached detail pages cost no queries and follow edits."""
+
+    def setUp(self):
+        user = User.objects.create_user("detail@example.com")
+        category = Category.objects.create(name="Tires", slug="tires", color="#333333")
+        self.submission = Submission.objects.create(
+            user=user,
+            category=category,
+            photo="submissions/seed.jpg",
+            latitude=39.07,
+            longitude=-108.55,
+            location=Point(-108.55, 39.07, srid=4326),
+            status=Submission.Status.APPROVED,
+            description="Before",
+        )
+
+    def _get(self):
+        request = RequestFactory().get("/")
+        request.user = AnonymousUser()
+        return submission_detail(request, self.submission.pk).content.decode()
+
+    def test_cached_until_saved(self):
+        self.assertIn("Before", self._get())
+        with self.assertNumQueries(0):
+            self.assertIn("Before", self._get())
+
+        self.submission.description = "After"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.submission.save()
+        self.assertIn("After", self._get())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_submissions([self.submission.pk], Submission.Status.REJECTED, None)
+        with self.assertRaises(Http404):
+            self._get()
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORAGES=PLAIN_STATIC_STORAGES)
+class SidebarCacheTests(TestCase):
+    """The map sidebar is rendered once per category version."""
+
+    def _get(self):
+        request = RequestFactory().get("/")
+        request.user = AnonymousUser()
+        return map_view(request).content.decode()
+
+    def test_cached_until_categories_change(self):
+        category = Category.objects.create(name="Tires", slug="tires", color="#333333")
+        bump_category_version()
+        self.assertIn("Tires", self._get())
+        with self.assertNumQueries(0):
+            self.assertIn("Tires", self._get())
+
+        category.name = "Old tires"
+        with self.captureOnCommitCallbacks(execute=True):
+            category.save()
+        self.assertIn("Old tires", self._get())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class DeltaFeedTests(TestCase):
+    """The since feed reports changed public submissions and tombstones."""
+
+    def _since(self, token):
+        request = RequestFactory().get("/", {"since": token})
+        return json.loads(b"".join(submissions_geojson(request).streaming_content))
+
+    def test_changes_and_tombstones(self):
+        user = User.objects.create_user("feed@example.com")
+        category = Category.objects.create(name="Tires", slug="tires", color="#333333")
+        sub = Submission.objects.create(
+            user=user,
+            category=category,
+            photo="submissions/seed.jpg",
+            latitude=39.07,
+            longitude=-108.55,
+            location=Point(-108.55, 39.07, srid=4326),
+        )
+        # Pending submissions aren't public, so nothing to report yet
+        self.assertEqual(self._since(0)["features"], [])
+
+        transition_submissions([sub.pk], Submission.Status.APPROVED, user)
+        feed = self._since(0)
+        self.assertEqual([f["properties"]["id"] for f in feed["features"]], [sub.pk])
+        self.assertEqual(feed["features"][0]["properties"]["category"], "tires")
+        self.assertEqual(feed["deleted"], [])
+
+        transition_submissions([sub.pk], Submission.Status.REJECTED, user)
+        feed = self._since(0)
+        self.assertEqual(feed["features"], [])
+        self.assertEqual(feed["deleted"], [sub.pk])
+
+        self.assertTrue(self._since(10**9)["reset"])
+
+    def test_category_edit_resends_its_public_features(self):
+        user = User.objects.create_user("feed@example.com")
+        category = Category.objects.create(name="Tires", slug="tires", color="#333333")
+        other = Category.objects.create(name="Glass", slug="glass", color="#00ff00")
+        approved = make_submission(user, category, status=Submission.Status.APPROVED)
+        make_submission(user, category)
+        make_submission(user, other, status=Submission.Status.APPROVED)
+        SubmissionChange.objects.all().delete()
+
+        category.color = "#ff0000"
+        with self.captureOnCommitCallbacks() as callbacks:
+            category.save()
+        # Logged only once the edit has committed
+        self.assertFalse(SubmissionChange.objects.exists())
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(
+            list(SubmissionChange.objects.values_list("submission_id", flat=True)), [approved.pk]
+        )
+        feed = self._since(0)
+        self.assertEqual(feed["features"][0]["properties"]["color"], "#ff0000")
+
+
+class PhotoFastPathTests(SimpleTestCase):
+    """Small upright baseline JPEGs are stored without re-encoding."""
+
+    def _jpeg(self, orientation=1, **options):
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        exif[0x8825] = {1: "N", 2: (39.0, 4.0, 12.0), 3: "W", 4: (108.0, 33.0, 0.0)}
+        buffer = BytesIO()
+        Image.effect_mandelbrot((800, 600), (-2, -1.5, 1, 1.5), 50).convert("RGB").save(
+            buffer, format="JPEG", exif=exif.tobytes(), **options
+        )
+        return buffer.getvalue()
+
+    def test_metadata_stripped_losslessly(self):
+        data = self._jpeg()
+        gps, _, stored = process_photo(BytesIO(data + b"trailing"))
+        stored = stored.read()
+        self.assertEqual(gps, (39.07, -108.55))
+        self.assertNotIn(b"Exif", stored)
+        # The compressed image data is copied byte for byte
+        self.assertEqual(stored[stored.index(b"\xff\xda"):], data[data.index(b"\xff\xda"):])
+
+    def test_icc_profile_kept(self):
+        profile = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB")).tobytes()
+        _, _, stored = process_photo(BytesIO(self._jpeg(icc_profile=profile)))
+        stored = stored.read()
+        self.assertNotIn(b"Exif", stored)
+        self.assertEqual(Image.open(BytesIO(stored)).info["icc_profile"], profile)
+
+    def test_others_are_reencoded(self):
+        _, _, rotated = process_photo(BytesIO(self._jpeg(orientation=6)))
+        self.assertEqual(Image.open(rotated).size, (600, 800))
+        _, _, progressive = process_photo(BytesIO(self._jpeg(progressive=True)))
+        self.assertNotIn(b"\xff\xc2", progressive.read())
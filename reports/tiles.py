@@ -0,0 +1,111 @@
+import math
+import os
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+
+from .cache import bump_tile_versions
+
+TILE_CACHE_DIR = Path(settings.TILE_CACHE_DIR)
+TILE_MAX_ZOOM = 20
+TILE_LAYER = "submissions"
+
+TILE_SQL = """
+    WITH bounds AS (
+        SELECT ST_TileEnvelope(%s, %s, %s) AS geom
+    ),
+    mvtgeom AS (
+        SELECT
+            ST_AsMVTGeom(ST_Transform(s.location::geometry, 3857), bounds.geom) AS geom,
+            s.id,
+            c.slug AS category,
+            c.name AS category_name,
+            c.color,
+            s.severity,
+            s.status
+        FROM reports_submission s
+        JOIN reports_category c ON c.id = s.category_id
+        CROSS JOIN bounds
+        WHERE s.id IN ({ids_sql})
+          AND s.location && ST_Transform(bounds.geom, 4326)::geography
+    )
+    SELECT ST_AsMVT(mvtgeom.*, %s) FROM mvtgeom
+"""
+
+
+def is_valid_tile(z, x, y):
+    """Return True if z/x/y addresses a tile we are willing to serve."""
+    return 0 <= z <= TILE_MAX_ZOOM and 0 <= x < 2**z and 0 <= y < 2**z
+
+
+def tile_for_point(lng, lat, z):
+    """Return the (x, y) of the zoom-z tile containing a WGS84 point."""
+    n = 2**z
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def _tile_dir(z, x, y):
+    return TILE_CACHE_DIR / str(z) / str(x) / str(y)
+
+
+def render_tile(queryset, z, x, y):
+    """Render the submissions in ``queryset`` that fall in a tile as MVT bytes."""
+    ids_sql, ids_params = queryset.order_by().values("pk").query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            TILE_SQL.format(ids_sql=ids_sql), [z, x, y, *ids_params, TILE_LAYER]
+        )
+        row = cursor.fetchone()
+    return bytes(row[0]) if row and row[0] else b""
+
+
+def get_tile(queryset, z, x, y, version=None):
+    """Return MVT bytes for a tile, serving from the on-disk cache if present.
+
+    Only callers passing the tile's ``version`` are cached, at
+    ``<z>/<x>/<y>/<version>.mvt``; the view does that for the unfiltered
+    map alone, so arbitrary filter values can't grow the cache. A render
+    that started before a change and finishes after it is written under
+    the old version, which is never read again, and writing a tile removes
+    older versions of it, so each tile keeps about one file.
+    """
+    if version is None:
+        return render_tile(queryset, z, x, y)
+
+    tile_dir = _tile_dir(z, x, y)
+    path = tile_dir / f"{version}.mvt"
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        pass
+
+    data = render_tile(queryset, z, x, y)
+
+    # Write to a temp name and rename so readers never see a partial tile
+    tile_dir.mkdir(parents=True, exist_ok=True)
+    tmp = tile_dir / f".{uuid.uuid4().hex}.tmp"
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    for old in tile_dir.glob("*.mvt"):
+        if old.stem.isdigit() and int(old.stem) < version:
+            old.unlink(missing_ok=True)
+    return data
+
+
+def invalidate_tiles_for_points(points):
+    """Bump the version of every tile, at every zoom, covering each (lng, lat) point.
+
+    Nothing is deleted here; the stale files are replaced, and removed,
+    the next time each tile is requested.
+    """
+    tiles = set()
+    for lng, lat in points:
+        for z in range(TILE_MAX_ZOOM + 1):
+            tiles.add((z, *tile_for_point(float(lng), float(lat), z)))
+    # Nearby points share their low-zoom tiles, so each is bumped only once
+    bump_tile_versions(tiles)
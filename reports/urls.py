@@ -8,8 +8,15 @@ urlpatterns = [
     path("", views.map_view, name="map"),
     path("upload/", views.submit_view, name="submit"),
     path("api/submissions.geojson", views.submissions_geojson, name="submissions_geojson"),
+    path("api/stats.json", views.submission_stats, name="submission_stats"),
+    path("api/clusters.geojson", views.submissions_clusters, name="submissions_clusters"),
+    path("api/hexbins.geojson", views.submissions_hexbins, name="submissions_hexbins"),
+    path("tiles/<int:z>/<int:x>/<int:y>.mvt", views.submission_tile, name="submission_tile"),
     path("moderate/", views.moderate_list, name="moderate_list"),
+    path("moderate/batch/", views.moderate_batch, name="moderate_batch"),
     path("moderate/<int:pk>/", views.moderate_detail, name="moderate_detail"),
     path("moderate/<int:pk>/action/", views.moderate_action, name="moderate_action"),
     path("submission/<int:pk>/", views.submission_detail, name="submission_detail"),
+    path("export/", views.export_submissions, name="export_submissions"),
+    path("metrics/", views.metrics_view, name="metrics"),
 ]
@@ -1,23 +1,76 @@
+import os
+import re
+import shutil
 import time
-from io import BytesIO
+import uuid
 from pathlib import Path
 
 from django.conf import settings
-from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.core.files.uploadedfile import TemporaryUploadedFile
 from PIL import Image, ImageOps
 
+from .metrics import timed
+
 TEMP_PHOTO_DIR = Path(settings.MEDIA_ROOT) / "tmp_uploads"
 TEMP_MAX_AGE = 30 * 60  # 30 minutes in seconds
+# Temp photos are grouped into one directory per bucket of this many seconds,
+# so expiry can drop whole buckets without stat()ing individual files.
+TEMP_BUCKET_SECONDS = 5 * 60
+
+# "<bucket>-<uuid hex><ext>"; also keeps user-supplied names from escaping
+TEMP_PHOTO_NAME_RE = re.compile(r"^(\d+)-[0-9a-f]{32}(\.[a-z]{3,4})?$")
+
+
+def new_temp_photo_path(ext):
+    """Return (filename, path) for a new temp photo in the current bucket."""
+    ext = ext.lower()
+    if not re.fullmatch(r"\.[a-z]{3,4}", ext):
+        ext = ".jpg"
+    bucket = int(time.time() // TEMP_BUCKET_SECONDS)
+    filename = f"{bucket}-{uuid.uuid4().hex}{ext}"
+    bucket_dir = TEMP_PHOTO_DIR / str(bucket)
+    bucket_dir.mkdir(parents=True, exist_ok=True)
+    return filename, bucket_dir / filename
+
+
+def temp_photo_path(filename):
+    """Return the path for a temp photo filename, or None if it's malformed."""
+    match = TEMP_PHOTO_NAME_RE.match(filename or "")
+    if not match:
+        return None
+    return TEMP_PHOTO_DIR / match.group(1) / filename
+
+
+def temp_photo_url(filename):
+    """Return the media URL of a temp photo, or "" if the name is malformed."""
+    path = temp_photo_path(filename)
+    if path is None:
+        return ""
+    return f"{settings.MEDIA_URL}{path.relative_to(settings.MEDIA_ROOT).as_posix()}"
 
 
 def cleanup_temp_uploads():
-    """Delete files in tmp_uploads older than 30 minutes."""
+    """Delete temp photo buckets whose newest possible file is past TEMP_MAX_AGE.
+
+    Only bucket directories are listed, and each expired bucket is removed
+    wholesale, so the cost is proportional to what has expired rather than
+    to the number of files waiting. Returns the number of buckets removed.
+    """
     if not TEMP_PHOTO_DIR.is_dir():
-        return
+        return 0
     cutoff = time.time() - TEMP_MAX_AGE
-    for path in TEMP_PHOTO_DIR.iterdir():
-        if path.is_file() and path.stat().st_mtime < cutoff:
-            path.unlink(missing_ok=True)
+    # A bucket's files are all older than its end time
+    expired_before = int(cutoff // TEMP_BUCKET_SECONDS)
+    removed = 0
+    for entry in os.scandir(TEMP_PHOTO_DIR):
+        if entry.is_dir() and entry.name.isdigit() and int(entry.name) < expired_before:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+        elif entry.is_file() and entry.stat().st_mtime < cutoff:
+            # Left over from the old flat layout, possibly by a worker that
+            # is still running the old code and needs it until submit
+            Path(entry.path).unlink(missing_ok=True)
+    return removed
 
 
 def extract_gps_from_exif(image_file):
@@ -29,42 +82,80 @@ def extract_gps_from_exif(image_file):
     try:
         image_file.seek(0)
         img = Image.open(image_file)
-        exif_data = img._getexif()
-        if not exif_data:
+        return _read_gps_exif(img)
+    except Exception:
+        return None, None
+    finally:
+        try:
             image_file.seek(0)
-            return None, None
+        except Exception:
+            pass
 
-        # Tag 34853 = GPSInfo
-        gps_info = exif_data.get(34853)
-        if not gps_info:
-            image_file.seek(0)
-            return None, _serialize_exif(exif_data)
-
-        def dms_to_decimal(dms, ref):
-            degrees = float(dms[0])
-            minutes = float(dms[1])
-            seconds = float(dms[2])
-            decimal = degrees + minutes / 60.0 + seconds / 3600.0
-            if ref in ("S", "W"):
-                decimal = -decimal
-            return decimal
-
-        # GPSLatitude = tag 2, GPSLatitudeRef = tag 1
-        # GPSLongitude = tag 4, GPSLongitudeRef = tag 3
+
+def _read_gps_exif(img):
+    """Read GPS coordinates and serialized EXIF from an opened image.
+
+    Only the header is parsed; no pixel data is decoded.
+    """
+    try:
+        exif_data = img._getexif()
+    except Exception:
+        return None, None
+    if not exif_data:
+        return None, None
+
+    # Tag 34853 = GPSInfo
+    gps_info = exif_data.get(34853)
+    if not gps_info:
+        return None, _serialize_exif(exif_data)
+
+    def dms_to_decimal(dms, ref):
+        degrees = float(dms[0])
+        minutes = float(dms[1])
+        seconds = float(dms[2])
+        decimal = degrees + minutes / 60.0 + seconds / 3600.0
+        if ref in ("S", "W"):
+            decimal = -decimal
+        return decimal
+
+    # GPSLatitude = tag 2, GPSLatitudeRef = tag 1
+    # GPSLongitude = tag 4, GPSLongitudeRef = tag 3
+    try:
         if 2 in gps_info and 1 in gps_info and 4 in gps_info and 3 in gps_info:
             lat = dms_to_decimal(gps_info[2], gps_info[1])
             lng = dms_to_decimal(gps_info[4], gps_info[3])
-            image_file.seek(0)
             return (lat, lng), _serialize_exif(exif_data)
+    except (TypeError, ValueError, ZeroDivisionError, IndexError):
+        pass
+    return None, _serialize_exif(exif_data)
 
+
+def photo_dhash(image_file):
+    """Compute a 64-bit difference hash (dHash) of a photo, or None.
+
+    The JPEG is decoded in draft mode at 1/8 scale and luminance only, so
+    this costs a few milliseconds even for large phone photos.
+    """
+    try:
         image_file.seek(0)
-        return None, _serialize_exif(exif_data)
+        img = Image.open(image_file)
+        img.draft("L", (64, 64))
+        img = ImageOps.exif_transpose(img)
+        px = img.convert("L").resize((9, 8), Image.LANCZOS).tobytes()
     except Exception:
+        return None
+    finally:
         try:
             image_file.seek(0)
         except Exception:
             pass
-        return None, None
+
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            i = row * 9 + col
+            value = (value << 1) | (px[i] > px[i + 1])
+    return value
 
 
 def _serialize_exif(exif_data):
@@ -89,26 +180,189 @@ def _serialize_exif(exif_data):
     return result
 
 
+def process_photo(image_file, max_edge=1920, quality=85):
+    """Read EXIF GPS and produce the resized JPEG from a single open.
+
+    A baseline JPEG that is already upright and within ``max_edge`` (what
+    submit.js uploads) only has its metadata stripped; anything else is
+    decoded, resized and re-encoded.
+
+    Returns ((lat, lng) or None, exif_dict or None, TemporaryUploadedFile).
+    """
+    image_file.seek(0)
+    img = Image.open(image_file)
+    gps_coords, exif_data = _read_gps_exif(img)
+    if (
+        img.format == "JPEG"
+        and max(img.size) <= max_edge
+        and img.getexif().get(EXIF_ORIENTATION, 1) == 1
+    ):
+        stripped = strip_jpeg_metadata(image_file, max_edge)
+        if stripped is not None:
+            return gps_coords, exif_data, stripped
+    return gps_coords, exif_data, _resize_image(img, max_edge, quality)
+
+
+EXIF_ORIENTATION = 0x0112
+
+# Start-of-frame markers other than baseline (SOF0); DHT, JPG and DAC share
+# the range but aren't frames
+NON_BASELINE_SOF = set(range(0xC1, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Segments dropped by strip_jpeg_metadata: APP1-APP15 (EXIF, XMP, IPTC,
+# MPF...) and comments. JFIF (APP0), ICC profiles and Adobe's color
+# transform (APP14) are kept, since they affect how pixels are read. APP2
+# also carries MPF and FlashPix, so it's decided per segment.
+STRIPPED_SEGMENTS = set(range(0xE1, 0xF0)) - {0xE2, 0xEE} | {0xFE}
+
+
+def strip_jpeg_metadata(image_file, max_edge):
+    """Copy a JPEG without its metadata, leaving the image data untouched.
+
+    Returns a TemporaryUploadedFile, or None if the file isn't a
+    well-formed baseline JPEG (8-bit, grayscale or YCbCr, at most
+    ``max_edge`` on its longest side). Anything after the end-of-image
+    marker, such as the extra images some phones append, is dropped.
+    """
+    image_file.seek(0)
+    out = TemporaryUploadedFile(
+        name="photo.jpg", content_type="image/jpeg", size=0, charset=None
+    )
+    with timed("strip"):
+        ok = _copy_jpeg(image_file.read, out.file, max_edge)
+    if not ok:
+        out.close()
+        return None
+    out.size = out.file.tell()
+    out.seek(0)
+    return out
+
+
+def _copy_jpeg(read, dest, max_edge):
+    if read(2) != b"\xff\xd8":
+        return False
+    dest.write(b"\xff\xd8")
+    has_frame = False
+    while True:
+        prefix, marker = read(1), read(1)
+        while marker == b"\xff":  # Fill bytes before a marker
+            marker = read(1)
+        if prefix != b"\xff" or not marker:
+            return False
+        marker = marker[0]
+        length = int.from_bytes(read(2), "big")
+        payload = read(length - 2) if length >= 2 else b""
+        if length < 2 or len(payload) != length - 2:
+            return False
+
+        if marker in NON_BASELINE_SOF:
+            return False
+        if marker == 0xC0:
+            if len(payload) < 6:
+                return False
+            height = int.from_bytes(payload[1:3], "big")
+            width = int.from_bytes(payload[3:5], "big")
+            if payload[0] != 8 or payload[5] not in (1, 3):
+                return False
+            if not (0 < width <= max_edge and 0 < height <= max_edge):
+                return False
+            has_frame = True
+        if marker in STRIPPED_SEGMENTS or (marker == 0xE2 and not payload.startswith(b"ICC_PROFILE\0")):
+            continue
+        dest.write(bytes((0xFF, marker)) + length.to_bytes(2, "big") + payload)
+        if marker == 0xDA:  # Start of scan: the compressed data follows
+            return has_frame and _copy_scan(read, dest)
+
+
+def _copy_scan(read, dest, chunk_size=64 * 1024):
+    """Copy entropy-coded data up to and including the EOI marker.
+
+    Inside the scan a 0xFF byte is always followed by 0x00 (stuffing) or a
+    restart marker, so the first FF D9 is the end of the image.
+    """
+    carry = b""
+    while True:
+        chunk = read(chunk_size)
+        if not chunk:
+            return False
+        data = carry + chunk
+        end = data.find(b"\xff\xd9")
+        if end != -1:
+            dest.write(data[:end + 2])
+            return True
+        # Hold back a trailing 0xFF in case the marker spans two chunks
+        carry = data[-1:] if data.endswith(b"\xff") else b""
+        dest.write(data[:len(data) - len(carry)])
+
+
+def _encode(img, fmt, name, quality):
+    """Encode an image into a temp file on disk.
+
+    The result is a TemporaryUploadedFile, so FileSystemStorage moves it into
+    place rather than copying it through memory.
+    """
+    encoded = TemporaryUploadedFile(
+        name=name, content_type=f"image/{fmt.lower()}", size=0, charset=None
+    )
+    with timed("encode"):
+        img.save(encoded.file, format=fmt, quality=quality)
+    encoded.size = encoded.file.tell()
+    encoded.seek(0)
+    return encoded
+
+
 def resize_photo(image_file, max_edge=1920, quality=85):
     """Resize a photo, normalize orientation, and convert to JPEG.
 
-    Returns an InMemoryUploadedFile with .jpg extension.
+    Returns a TemporaryUploadedFile with .jpg extension.
     """
     image_file.seek(0)
     img = Image.open(image_file)
-    img = ImageOps.exif_transpose(img)
-    img = img.convert("RGB")
-    img.thumbnail((max_edge, max_edge), Image.LANCZOS)
-
-    buffer = BytesIO()
-    img.save(buffer, format="JPEG", quality=quality)
-    buffer.seek(0)
-
-    return InMemoryUploadedFile(
-        file=buffer,
-        field_name="photo",
-        name="photo.jpg",
-        content_type="image/jpeg",
-        size=buffer.getbuffer().nbytes,
-        charset=None,
-    )
+    return _resize_image(img, max_edge, quality)
+
+
+def _resize_image(img, max_edge, quality):
+    # Ask the JPEG decoder to scale down (by 1/2, 1/4 or 1/8) while decoding,
+    # to the smallest size still at least as large as the target. This has to
+    # happen before exif_transpose, which would otherwise force a full-size
+    # decode. Non-JPEG images ignore it.
+    scale = min(1.0, max_edge / max(img.size))
+    img.draft("RGB", (round(img.width * scale), round(img.height * scale)))
+
+    with timed("decode"):
+        img.load()
+    with timed("resize"):
+        img = ImageOps.exif_transpose(img)
+        img = img.convert("RGB")
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+    return _encode(img, "JPEG", "photo.jpg", quality)
+
+
+# Derivative sizes by longest edge, largest first. "full" matches the
+# resize_photo output, which is kept as the full-size JPEG.
+DERIVATIVE_SIZES = (("full", 1920), ("medium", 960), ("thumb", 320))
+
+
+def render_derivatives(image_file, quality=80):
+    """Render the smaller JPEG/WebP derivatives of an already-resized photo.
+
+    Returns {size: {"width", "height", "jpeg", "webp"}}, where each format
+    is a TemporaryUploadedFile. The "full" size has no "jpeg" entry because
+    the resized photo itself is that file.
+    """
+    image_file.seek(0)
+    img = Image.open(image_file)
+    with timed("decode"):
+        img = img.convert("RGB")
+
+    derivatives = {}
+    for size, max_edge in DERIVATIVE_SIZES:
+        # Each size is shrunk from the previous one, which is cheaper than
+        # resampling from the full image every time
+        with timed("resize"):
+            img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        variant = {"width": img.width, "height": img.height}
+        if size != "full":
+            variant["jpeg"] = _encode(img, "JPEG", f"{size}.jpg", quality)
+        variant["webp"] = _encode(img, "WEBP", f"{size}.webp", quality)
+        derivatives[size] = variant
+    return derivatives
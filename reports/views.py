@@ -1,35 +1,100 @@
-import uuid
+import hashlib
+import json
+import mimetypes
+import os
+from datetime import date
 from decimal import Decimal
 from pathlib import Path
+from stat import S_ISREG
+from urllib.parse import quote
 
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.gis.geos import Point
-from django.core.files.uploadedfile import InMemoryUploadedFile
-from django.http import HttpResponseBadRequest, JsonResponse
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.move import file_move_safe
+from django.core.files.uploadedfile import UploadedFile
+from django.db import connection, transaction
+from django.db.models import Q, Sum
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseNotModified,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, redirect, render
-from django.utils import timezone
+from django.template.loader import render_to_string
 from django.urls import reverse
-from django.views.decorators.http import require_POST
-
-from .decorators import moderator_required
+from django.utils import timezone
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from django.views.decorators.http import condition, require_POST
+
+from . import metrics
+from .cache import (
+    FRAGMENT_CACHE_TIMEOUT,
+    GEOJSON_CACHE_TIMEOUT,
+    get_category_version,
+    get_map_data_version,
+    get_submission_version,
+    get_tile_version,
+    version_last_modified,
+)
+from .decorators import moderator_required, staff_required
+from .duplicates import (
+    NEARBY_RADIUS_M,
+    find_similar_photos,
+    hash_to_db,
+    nearby_submissions,
+)
+from .export import EXPORT_FORMATS, export_data, export_zip
+from .filters import parse_bbox, public_submissions
 from .forms import SubmissionForm
-from .models import Category, Submission
-from .utils import cleanup_temp_uploads, extract_gps_from_exif, resize_photo
-
-TEMP_PHOTO_DIR = Path(settings.MEDIA_ROOT) / "tmp_uploads"
+from .geojson import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    PAGE_ORDERING,
+    decode_cursor,
+    encode_cursor,
+    stream_feature_collection,
+)
+from .hexbins import SEVERITY_WEIGHTS, bin_points, feature_collection, resolution_for_zoom
+from .jobs import enqueue_photo_job
+from .models import Category, HexBin, Submission
+from .moderation import MAX_BATCH_SIZE, transition_submissions
+from .stats import summarize
+from .storage import content_hash
+from .sync import changes_since, settled_token
+from .tiles import get_tile, is_valid_tile
+from .utils import (
+    extract_gps_from_exif,
+    new_temp_photo_path,
+    photo_dhash,
+    temp_photo_path,
+    temp_photo_url,
+)
+
+
+def _is_moderator(user):
+    return user.is_authenticated and user.role in ("moderator", "admin")
 
 
 def map_view(request):
+    # Lazy: the sidebar fragment is cached per category version, so the
+    # query only runs when it's re-rendered
     categories = Category.objects.all()
-    is_moderator = (
-        request.user.is_authenticated
-        and request.user.role in ("moderator", "admin")
-    )
+    is_moderator = _is_moderator(request.user)
     context = {
         "mapbox_token": settings.MAPBOX_TOKEN,
         "categories": categories,
+        "category_version": get_category_version(),
+        "fragment_cache_timeout": FRAGMENT_CACHE_TIMEOUT,
         "severity_choices": Submission.Severity.choices,
         # Only public statuses for the filter dropdown
         "status_choices": [
@@ -44,51 +109,54 @@ def map_view(request):
 
 def _save_temp_photo(uploaded_file):
     """Save an uploaded photo to a temp file and return the filename."""
-    TEMP_PHOTO_DIR.mkdir(parents=True, exist_ok=True)
     ext = Path(uploaded_file.name).suffix or ".jpg"
-    filename = f"{uuid.uuid4().hex}{ext}"
-    path = TEMP_PHOTO_DIR / filename
-    with open(path, "wb") as f:
-        for chunk in uploaded_file.chunks():
-            f.write(chunk)
+    filename, path = new_temp_photo_path(ext)
+    if hasattr(uploaded_file, "temporary_file_path"):
+        # Already on disk: move it (a rename on the same filesystem)
+        file_move_safe(uploaded_file.temporary_file_path(), str(path))
+    else:
+        with open(path, "wb") as f:
+            for chunk in uploaded_file.chunks():
+                f.write(chunk)
     return filename
 
 
+class TempPhotoFile(UploadedFile):
+    """A previously saved temp photo, read straight from disk.
+
+    Exposing temporary_file_path() lets FileSystemStorage move the file into
+    place instead of copying its bytes.
+    """
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
 def _load_temp_photo(filename):
-    """Load a temp photo file and return it as an InMemoryUploadedFile, or None."""
-    # Sanitize: only allow a hex UUID + extension, no path traversal
-    safe = Path(filename).name
-    path = TEMP_PHOTO_DIR / safe
-    if not path.is_file():
+    """Open a temp photo file as an UploadedFile, or return None."""
+    path = temp_photo_path(filename)
+    if path is None or not path.is_file():
         return None
-    from io import BytesIO
-
-    data = path.read_bytes()
-    buf = BytesIO(data)
     ext = path.suffix.lower()
     content_type = {
         ".jpg": "image/jpeg", ".jpeg": "image/jpeg",
         ".png": "image/png", ".webp": "image/webp",
     }.get(ext, "image/jpeg")
-    return InMemoryUploadedFile(
-        file=buf, field_name="photo", name=safe,
-        content_type=content_type, size=len(data), charset=None,
+    return TempPhotoFile(
+        file=open(path, "rb"), name=path.name, content_type=content_type,
+        size=path.stat().st_size, charset=None,
     )
 
 
 def _delete_temp_photo(filename):
     """Remove a temp photo file if it exists."""
-    if not filename:
-        return
-    safe = Path(filename).name
-    path = TEMP_PHOTO_DIR / safe
-    path.unlink(missing_ok=True)
+    path = temp_photo_path(filename)
+    if path is not None:
+        path.unlink(missing_ok=True)
 
 
 @login_required
 def submit_view(request):
-    cleanup_temp_uploads()
-
     if request.method == "POST":
         form = SubmissionForm(request.POST, request.FILES)
         if form.is_valid():
@@ -105,49 +173,94 @@ def submit_view(request):
                         "mapbox_token": settings.MAPBOX_TOKEN,
                     })
 
-            # Extract EXIF GPS before resize strips it
-            gps_coords, exif_data = extract_gps_from_exif(photo)
-
-            # User pin takes priority over EXIF
-            lat = form.cleaned_data.get("latitude")
-            lng = form.cleaned_data.get("longitude")
-
-            if lat is None or lng is None:
-                if gps_coords:
-                    lat, lng = gps_coords
-                else:
-                    # Save the photo so the user doesn't have to reselect it
+            try:
+                # EXIF is read from the header only, so this stays cheap in the
+                # request; the expensive resize happens in the photo worker
+                gps_coords, exif_data = extract_gps_from_exif(photo)
+
+                # User pin takes priority over EXIF
+                lat = form.cleaned_data.get("latitude")
+                lng = form.cleaned_data.get("longitude")
+
+                if lat is None or lng is None:
+                    if gps_coords:
+                        lat, lng = gps_coords
+                    else:
+                        # Save the photo so the user doesn't have to reselect it
+                        if not temp_photo_name:
+                            temp_photo_name = _save_temp_photo(photo)
+                        form.add_error(
+                            None,
+                            "No location found. Please place a pin on the map or "
+                            "upload a photo with GPS data.",
+                        )
+                        return render(request, "reports/submit.html", {
+                            "form": form,
+                            "mapbox_token": settings.MAPBOX_TOKEN,
+                            "temp_photo": temp_photo_name,
+                            "temp_photo_url": temp_photo_url(temp_photo_name),
+                        })
+
+                # Perceptual hash for near-duplicate detection (1/8-scale decode)
+                photo_hash = photo_dhash(photo)
+                if (
+                    settings.BLOCK_DUPLICATE_PHOTOS
+                    and photo_hash is not None
+                    and find_similar_photos(photo_hash)
+                ):
                     if not temp_photo_name:
                         temp_photo_name = _save_temp_photo(photo)
                     form.add_error(
-                        None,
-                        "No location found. Please place a pin on the map or "
-                        "upload a photo with GPS data.",
+                        "photo",
+                        "This photo looks like one that has already been reported.",
                     )
                     return render(request, "reports/submit.html", {
                         "form": form,
                         "mapbox_token": settings.MAPBOX_TOKEN,
                         "temp_photo": temp_photo_name,
+                        "temp_photo_url": temp_photo_url(temp_photo_name),
                     })
 
-            # Resize photo
-            resized = resize_photo(photo)
-
-            submission = form.save(commit=False)
-            submission.user = request.user
-            submission.status = Submission.Status.PENDING
-            submission.latitude = Decimal(str(round(lat, 6)))
-            submission.longitude = Decimal(str(round(lng, 6)))
-            submission.location = Point(float(lng), float(lat), srid=4326)
-            submission.exif_data = exif_data
-            submission.photo = resized
-            submission.save()
-
-            # Clean up temp file if one was used
-            _delete_temp_photo(temp_photo_name)
-
-            messages.success(request, "Report submitted! It will appear on the map after review.")
-            return redirect("reports:map")
+                point = Point(float(lng), float(lat), srid=4326)
+                if not form.cleaned_data.get("confirm_nearby"):
+                    nearby = nearby_submissions(point)
+                    if nearby:
+                        if not temp_photo_name:
+                            temp_photo_name = _save_temp_photo(photo)
+                        return render(request, "reports/submit.html", {
+                            "form": form,
+                            "mapbox_token": settings.MAPBOX_TOKEN,
+                            "temp_photo": temp_photo_name,
+                            "temp_photo_url": temp_photo_url(temp_photo_name),
+                            "nearby": nearby,
+                            "public_statuses": Submission.PUBLIC_STATUSES,
+                        })
+
+                submission = form.save(commit=False)
+                submission.user = request.user
+                submission.status = Submission.Status.PENDING
+                submission.latitude = Decimal(str(round(lat, 6)))
+                submission.longitude = Decimal(str(round(lng, 6)))
+                submission.location = point
+                submission.exif_data = exif_data
+                if photo_hash is not None:
+                    submission.photo_hash = hash_to_db(photo_hash)
+                # Store the original; the photo worker resizes it
+                submission.photo = photo
+                submission.processing = True
+                with transaction.atomic():
+                    submission.save()
+                    enqueue_photo_job(submission)
+
+                # Clean up temp file if one was used
+                _delete_temp_photo(temp_photo_name)
+
+                messages.success(request, "Report submitted! It will appear on the map after review.")
+                return redirect("reports:map")
+            finally:
+                # A reused temp photo is opened here; uploads are closed by Django
+                if isinstance(photo, TempPhotoFile):
+                    photo.close()
     else:
         form = SubmissionForm()
 
@@ -157,77 +270,420 @@ def submit_view(request):
     })
 
 
+PUBLIC_STATUSES = Submission.PUBLIC_STATUSES
+
+# Past this zoom the cluster endpoint returns individual points, matching
+# clusterMaxZoom on the client-side source.
+CLUSTER_MAX_ZOOM = 14
+# Cluster radius in screen pixels at 512px tiles, matching clusterRadius.
+CLUSTER_RADIUS_PX = 50
+EARTH_CIRCUMFERENCE_M = 40075016.686
+
+
+def _public_submissions(request):
+    """Return public submissions filtered by the map's query parameters."""
+    return public_submissions(request.GET)
+
+
+MAP_FILTER_PARAMS = ("category", "severity", "status", "date_from", "date_to")
+
+
+def _filter_key(request, extra=()):
+    """Return a stable hash of the map filters in a request.
+
+    ``extra`` names further single-valued parameters (e.g. bbox, cursor)
+    that should also distinguish the key.
+    """
+    normalized = [
+        ("category", sorted(request.GET.getlist("category"))),
+        ("severity", request.GET.get("severity", "")),
+        ("status", request.GET.get("status", "")),
+        ("date_from", request.GET.get("date_from", "")),
+        ("date_to", request.GET.get("date_to", "")),
+    ]
+    normalized += [(name, request.GET.get(name, "")) for name in extra]
+    return hashlib.sha1(json.dumps(normalized).encode()).hexdigest()[:16]
+
+
+GEOJSON_KEY_PARAMS = ("bbox", "cursor", "limit", "since")
+
+
+def _geojson_etag(request):
+    return f"{get_map_data_version()}-{_filter_key(request, GEOJSON_KEY_PARAMS)}"
+
+
+def _geojson_last_modified(request):
+    return version_last_modified(get_map_data_version())
+
+
+def _submission_feature(sub):
+    """Build a GeoJSON Feature for a single submission."""
+    return {
+        "type": "Feature",
+        "geometry": {
+            "type": "Point",
+            "coordinates": [float(sub.longitude), float(sub.latitude)],
+        },
+        "properties": {
+            "id": sub.pk,
+            "category": sub.category.slug,
+            "category_name": sub.category.name,
+            "color": sub.category.color,
+            "severity": sub.severity,
+            "status": sub.status,
+            "status_display": sub.get_status_display(),
+            "description": sub.description[:200] if sub.description else "",
+            "created_at": sub.created_at.strftime("%b %d, %Y"),
+            "created_on": timezone.localdate(sub.created_at).isoformat(),
+            "photo_url": sub.thumb_url,
+            "detail_url": reverse("reports:submission_detail", args=[sub.pk]),
+        },
+    }
+
+
+@condition(etag_func=_geojson_etag, last_modified_func=_geojson_last_modified)
 def submissions_geojson(request):
-    """Return approved/in_progress/cleaned submissions as GeoJSON."""
-    PUBLIC_STATUSES = ["approved", "in_progress", "cleaned"]
-    qs = Submission.objects.filter(status__in=PUBLIC_STATUSES).select_related(
-        "category"
-    )
+    """Return approved/in_progress/cleaned submissions as GeoJSON.
+
+    Results are paged newest first, at most MAX_PAGE_SIZE per request. When
+    more remain, the collection carries a ``next_cursor`` to pass back as
+    ``cursor``. An optional ``bbox`` (west,south,east,north) limits results
+    to the viewport.
+
+    Pages are cached per filter set under the current map data version, and
+    unchanged data is answered with a 304 via the ETag/Last-Modified headers.
+    The first page carries a ``sync_token`` for the ``since`` mode (see
+    _submission_changes), taken before the query so nothing is missed.
+    """
+    if "since" in request.GET:
+        return _submission_changes(request)
+
+    version = get_map_data_version()
+    cache_key = f"reports:geojson:{version}:{_filter_key(request, GEOJSON_KEY_PARAMS)}"
+    content = cache.get(cache_key)
+    if content is not None:
+        return _geojson_response(content)
+
+    qs = _public_submissions(request).order_by(*PAGE_ORDERING)
+
+    bbox_param = request.GET.get("bbox")
+    if bbox_param:
+        bbox = parse_bbox(bbox_param)
+        if bbox is None:
+            return HttpResponseBadRequest("Invalid bbox.")
+        qs = qs.filter(location__intersects=bbox)
+
+    cursor_param = request.GET.get("cursor")
+    if cursor_param:
+        cursor = decode_cursor(cursor_param)
+        if cursor is None:
+            return HttpResponseBadRequest("Invalid cursor.")
+        created_at, pk = cursor
+        qs = qs.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+        )
+
+    limit = _page_limit(request)
+    if limit is None:
+        return HttpResponseBadRequest("Invalid limit.")
 
-    # Filter by category slug(s)
-    categories = request.GET.getlist("category")
-    if categories:
-        qs = qs.filter(category__slug__in=categories)
+    extra = None if cursor_param else {"sync_token": str(settled_token())}
+    chunks = stream_feature_collection(qs, limit=limit, extra=extra)
+    return _geojson_response(_stream_into_cache(chunks, cache_key))
 
-    # Filter by severity
-    severity = request.GET.get("severity")
-    if severity:
-        qs = qs.filter(severity=severity)
 
-    # Filter by status
-    status = request.GET.get("status")
-    if status and status in PUBLIC_STATUSES:
-        qs = qs.filter(status=status)
+def _stream_into_cache(chunks, cache_key):
+    """Yield ``chunks`` as they are produced, caching the page once complete.
 
-    # Filter by date range
-    date_from = request.GET.get("date_from")
-    if date_from:
-        qs = qs.filter(created_at__date__gte=date_from)
+    The kept copy is bounded by MAX_PAGE_SIZE features; a client that
+    disconnects part way leaves nothing cached.
+    """
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    cache.set(cache_key, "".join(parts).encode(), GEOJSON_CACHE_TIMEOUT)
 
-    date_to = request.GET.get("date_to")
-    if date_to:
-        qs = qs.filter(created_at__date__lte=date_to)
+
+def _page_limit(request):
+    try:
+        limit = int(request.GET.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return None
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def _submission_changes(request):
+    """The ``since`` mode of submissions_geojson.
+
+    Returns the public submissions changed after a sync token as features,
+    the ids of changed ones that are no longer public as ``deleted``, and
+    the ``sync_token`` to pass next time (``has_more`` means straight away).
+    Map filters and bbox don't apply: the client keeps every public
+    submission and filters them itself. ``reset`` means the token is too
+    old and the client has to reload from scratch.
+    """
+    try:
+        since = int(request.GET["since"])
+    except ValueError:
+        return HttpResponseBadRequest("Invalid since token.")
+    if since < 0:
+        return HttpResponseBadRequest("Invalid since token.")
+    limit = _page_limit(request)
+    if limit is None:
+        return HttpResponseBadRequest("Invalid limit.")
+
+    changes = changes_since(since, limit)
+    if changes is None:
+        return _geojson_response(
+            json.dumps({"type": "FeatureCollection", "features": [], "reset": True}).encode()
+        )
+    pks, token, has_more = changes
+    qs = Submission.objects.filter(pk__in=pks, status__in=PUBLIC_STATUSES)
+    # Clients drop ``deleted`` before adding features, so a submission made
+    # public again in between the two queries still ends up shown
+    public = set(qs.values_list("pk", flat=True))
+    extra = {"deleted": sorted(pks - public), "sync_token": str(token), "has_more": has_more}
+    return _geojson_response(stream_feature_collection(qs.order_by("pk"), extra=extra))
+
+
+def _geojson_response(content):
+    """Wrap cached bytes, or a generator of chunks, in a GeoJSON response."""
+    if isinstance(content, bytes):
+        response = HttpResponse(content, content_type="application/json")
+    else:
+        response = StreamingHttpResponse(content, content_type="application/json")
+    # Let clients keep the data but revalidate it on every use
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+CLUSTER_SQL = """
+    WITH cells AS (
+        SELECT
+            ST_SnapToGrid(ST_Transform(s.location::geometry, 3857), %s) AS cell,
+            c.slug AS slug,
+            COUNT(*) AS n,
+            MIN(s.id) AS min_id,
+            SUM(ST_X(ST_Transform(s.location::geometry, 3857))) AS sum_x,
+            SUM(ST_Y(ST_Transform(s.location::geometry, 3857))) AS sum_y
+        FROM reports_submission s
+        JOIN reports_category c ON c.id = s.category_id
+        WHERE s.id IN ({ids_sql})
+        GROUP BY cell, c.slug
+    ),
+    clusters AS (
+        SELECT
+            SUM(n)::int AS point_count,
+            MIN(min_id) AS pk,
+            SUM(sum_x) / SUM(n) AS x,
+            SUM(sum_y) / SUM(n) AS y,
+            jsonb_object_agg(slug, n) AS categories
+        FROM cells
+        GROUP BY cell
+    )
+    SELECT
+        ST_X(ST_Transform(ST_SetSRID(ST_MakePoint(x, y), 3857), 4326)),
+        ST_Y(ST_Transform(ST_SetSRID(ST_MakePoint(x, y), 3857), 4326)),
+        point_count,
+        categories,
+        pk
+    FROM clusters
+"""
+
+
+def submissions_clusters(request):
+    """Return public submissions pre-clustered for a zoom level and viewport.
+
+    Takes ``zoom`` and ``bbox`` (west,south,east,north) plus the same filters
+    as ``submissions_geojson``. Below CLUSTER_MAX_ZOOM, points are snapped to
+    a Web Mercator grid sized to the client's cluster radius and aggregated
+    in PostGIS; past it, individual features are returned. A cell holding
+    a single submission comes back as that submission's feature, so it
+    can be opened like any other point.
+    """
+    try:
+        zoom = int(request.GET.get("zoom", ""))
+    except ValueError:
+        return HttpResponseBadRequest("Invalid zoom.")
+    if not 0 <= zoom <= 24:
+        return HttpResponseBadRequest("Invalid zoom.")
+
+    bbox = parse_bbox(request.GET.get("bbox"))
+    if bbox is None:
+        return HttpResponseBadRequest("Invalid bbox.")
+
+    qs = _public_submissions(request).filter(location__intersects=bbox)
+
+    if zoom > CLUSTER_MAX_ZOOM:
+        features = [_submission_feature(sub) for sub in qs.select_related("category")]
+        return JsonResponse({"type": "FeatureCollection", "features": features})
+
+    grid_size = EARTH_CIRCUMFERENCE_M / (512 * 2**zoom) * CLUSTER_RADIUS_PX
+    ids_sql, ids_params = qs.order_by().values("pk").query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            CLUSTER_SQL.format(ids_sql=ids_sql), [grid_size, *ids_params]
+        )
+        rows = cursor.fetchall()
+
+    singles = {pk for _, _, point_count, _, pk in rows if point_count == 1}
+    single_features = {
+        sub.pk: _submission_feature(sub)
+        for sub in qs.filter(pk__in=singles).select_related("category")
+    }
 
     features = []
-    for sub in qs:
+    for lng, lat, point_count, categories, pk in rows:
+        if point_count == 1:
+            if pk in single_features:
+                features.append(single_features[pk])
+            continue
+        if isinstance(categories, str):
+            categories = json.loads(categories)
         features.append(
             {
                 "type": "Feature",
-                "geometry": {
-                    "type": "Point",
-                    "coordinates": [float(sub.longitude), float(sub.latitude)],
-                },
+                "geometry": {"type": "Point", "coordinates": [lng, lat]},
                 "properties": {
-                    "id": sub.pk,
-                    "category_name": sub.category.name,
-                    "color": sub.category.color,
-                    "severity": sub.severity,
-                    "status": sub.status,
-                    "status_display": sub.get_status_display(),
-                    "description": sub.description[:200] if sub.description else "",
-                    "created_at": sub.created_at.strftime("%b %d, %Y"),
-                    "photo_url": sub.photo.url if sub.photo else "",
-                    "detail_url": reverse("reports:submission_detail", args=[sub.pk]),
+                    "cluster": True,
+                    "point_count": point_count,
+                    "point_count_abbreviated": _abbreviate_count(point_count),
+                    "categories": categories,
                 },
             }
         )
 
-    return JsonResponse(
-        {"type": "FeatureCollection", "features": features}
+    return JsonResponse({"type": "FeatureCollection", "features": features})
+
+
+def _abbreviate_count(count):
+    """Format a cluster count the way Mapbox does (e.g. 1.2k)."""
+    if count >= 10000:
+        return f"{round(count / 1000)}k"
+    if count >= 1000:
+        return f"{count / 1000:.1f}k"
+    return str(count)
+
+
+def submissions_hexbins(request):
+    """Return hexagonal bins of public submissions for a zoom level.
+
+    Each hexagon carries a ``count`` and a severity-weighted ``score``; the
+    collection has ``max_count``/``max_score`` for scaling colors. Category,
+    severity and status filters are answered from the incrementally kept
+    HexBin table. Date filters need the submissions themselves, so those
+    are binned on the fly. Either way the result is cached under the map
+    data version.
+    """
+    try:
+        zoom = float(request.GET.get("zoom", ""))
+    except ValueError:
+        return HttpResponseBadRequest("Invalid zoom.")
+    if not 0 <= zoom <= 24:
+        return HttpResponseBadRequest("Invalid zoom.")
+    resolution = resolution_for_zoom(zoom)
+
+    version = get_map_data_version()
+    cache_key = f"reports:hexbins:{version}:{resolution}:{_filter_key(request)}"
+    content = cache.get(cache_key)
+    if content is not None:
+        return _geojson_response(content)
+
+    if request.GET.get("date_from") or request.GET.get("date_to"):
+        rows = (
+            _public_submissions(request).order_by()
+            .values_list("longitude", "latitude", "severity")
+        )
+        bins = bin_points(((lng, lat, sev, 1) for lng, lat, sev in rows.iterator()), resolution)
+    else:
+        qs = HexBin.objects.filter(resolution=resolution, status__in=PUBLIC_STATUSES)
+        categories = request.GET.getlist("category")
+        if categories:
+            qs = qs.filter(category__slug__in=categories)
+        if request.GET.get("severity"):
+            qs = qs.filter(severity=request.GET["severity"])
+        if request.GET.get("status") in PUBLIC_STATUSES:
+            qs = qs.filter(status=request.GET["status"])
+        bins = {}
+        for q, r, severity, count in (
+            qs.order_by().values_list("q", "r", "severity").annotate(n=Sum("count"))
+        ):
+            totals = bins.setdefault((q, r), [0, 0])
+            totals[0] += count
+            totals[1] += count * SEVERITY_WEIGHTS.get(severity, 1)
+
+    content = json.dumps(feature_collection(bins, resolution)).encode()
+    cache.set(cache_key, content, GEOJSON_CACHE_TIMEOUT)
+    return _geojson_response(content)
+
+
+def submission_tile(request, z, x, y):
+    """Return public submissions in a z/x/y tile as a Mapbox Vector Tile.
+
+    map.js loads these past the cluster zooms on phones, and GIS clients
+    can use them too. Only unfiltered tiles are cached on disk, keyed by
+    the tile's own version so a change elsewhere on the map leaves them
+    alone; filtered ones are rendered per request.
+    """
+    if not is_valid_tile(z, x, y):
+        raise Http404("Tile out of range.")
+    filtered = any(request.GET.get(name) for name in MAP_FILTER_PARAMS)
+    version = None if filtered else get_tile_version(z, x, y)
+    data = get_tile(_public_submissions(request), z, x, y, version)
+    return HttpResponse(data, content_type="application/vnd.mapbox-vector-tile")
+
+
+MODERATION_PAGE_SIZE = 50
+# Upcoming submissions whose pages and thumbnails moderate_detail prefetches
+MODERATION_PREFETCH = 3
+# Past this the queue badge shows "1000+" instead of counting every row
+PENDING_COUNT_CAP = 1000
+
+
+def _pending_queue():
+    """Pending submissions, oldest first, in keyset order."""
+    return Submission.objects.filter(status="pending").order_by("created_at", "id")
+
+
+def _pending_after(created_at, pk):
+    return _pending_queue().filter(
+        Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk)
     )
 
 
+def _approximate_pending_count():
+    """Count pending submissions, stopping at PENDING_COUNT_CAP."""
+    count = _pending_queue().order_by()[:PENDING_COUNT_CAP + 1].count()
+    return f"{PENDING_COUNT_CAP}+" if count > PENDING_COUNT_CAP else count
+
+
 @moderator_required
 def moderate_list(request):
-    submissions = (
-        Submission.objects.filter(status="pending")
-        .select_related("category", "user")
-        .order_by("created_at")
-    )
+    submissions = _pending_queue().select_related("category", "user")
+
+    after = request.GET.get("after")
+    if after:
+        cursor = decode_cursor(after)
+        if cursor is None:
+            return HttpResponseBadRequest("Invalid cursor.")
+        submissions = _pending_after(*cursor).select_related("category", "user")
+
+    page = list(submissions[:MODERATION_PAGE_SIZE + 1])
+    next_cursor = None
+    if len(page) > MODERATION_PAGE_SIZE:
+        page = page[:MODERATION_PAGE_SIZE]
+        next_cursor = encode_cursor(page[-1].created_at, page[-1].pk)
+
     return render(
         request,
         "reports/moderate_list.html",
-        {"submissions": submissions, "pending_count": submissions.count()},
+        {
+            "submissions": page,
+            "pending_count": _approximate_pending_count(),
+            "next_cursor": next_cursor,
+            "is_first_page": not after,
+        },
     )
 
 
@@ -236,10 +692,23 @@ def moderate_detail(request, pk):
     submission = get_object_or_404(
         Submission.objects.select_related("category", "user"), pk=pk
     )
+    upcoming = list(
+        _pending_after(submission.created_at, submission.pk)[:MODERATION_PREFETCH]
+    )
+    similar_photos = find_similar_photos(submission.photo_hash, exclude_pk=submission.pk)
+    nearby = nearby_submissions(submission.location, exclude_pk=submission.pk)
     return render(
         request,
         "reports/moderate_detail.html",
-        {"submission": submission, "mapbox_token": settings.MAPBOX_TOKEN},
+        {
+            "submission": submission,
+            "upcoming": upcoming,
+            "similar_photos": similar_photos,
+            "nearby": nearby,
+            "nearby_radius_m": NEARBY_RADIUS_M,
+            "next_submission": upcoming[0] if upcoming else None,
+            "mapbox_token": settings.MAPBOX_TOKEN,
+        },
     )
 
 
@@ -251,24 +720,262 @@ def moderate_action(request, pk):
     if action not in ("approve", "reject"):
         return HttpResponseBadRequest("Invalid action.")
 
-    submission.status = "approved" if action == "approve" else "rejected"
-    submission.moderated_by = request.user
-    submission.moderated_at = timezone.now()
-    submission.save()
+    target = "approved" if action == "approve" else "rejected"
+    result = transition_submissions([submission.pk], target, request.user)
+    if result.updated:
+        messages.success(request, f"Submission #{submission.pk} has been {target}.")
+    elif result.skipped.get(submission.pk) == "processing":
+        messages.error(
+            request,
+            f"Submission #{submission.pk} can't be approved until its photo has been processed.",
+        )
+    else:
+        messages.error(
+            request, f"Submission #{submission.pk} is being moderated by someone else."
+        )
 
-    label = "approved" if action == "approve" else "rejected"
-    messages.success(request, f"Submission #{submission.pk} has been {label}.")
+    # Carry on to the next item in the queue, wrapping around to the oldest
+    next_submission = (
+        _pending_after(submission.created_at, submission.pk).first()
+        or _pending_queue().first()
+    )
+    if next_submission:
+        return redirect("reports:moderate_detail", pk=next_submission.pk)
     return redirect("reports:moderate_list")
 
 
-def submission_detail(request, pk):
-    submission = get_object_or_404(
-        Submission.objects.select_related("category", "user"),
-        pk=pk,
-        status__in=["approved", "in_progress", "cleaned"],
-    )
-    return render(
-        request,
-        "reports/submission_detail.html",
-        {"submission": submission, "mapbox_token": settings.MAPBOX_TOKEN},
+BATCH_ACTIONS = {
+    "approve": Submission.Status.APPROVED,
+    "reject": Submission.Status.REJECTED,
+    "in_progress": Submission.Status.IN_PROGRESS,
+    "cleaned": Submission.Status.CLEANED,
+}
+
+
+@moderator_required
+@require_POST
+def moderate_batch(request):
+    """Apply one status change to many submissions.
+
+    Expects a JSON body ``{"ids": [...], "action": "approve" | "reject" |
+    "in_progress" | "cleaned"}`` and returns the updated ids plus the
+    skipped ones with a reason.
+    """
+    try:
+        payload = json.loads(request.body)
+        if not isinstance(payload["ids"], list):
+            raise TypeError("ids must be a list")
+        pks = [int(pk) for pk in payload["ids"]]
+        target = BATCH_ACTIONS[payload["action"]]
+    except (ValueError, KeyError, TypeError):
+        return HttpResponseBadRequest("Expected JSON with ids and a valid action.")
+    if len(pks) > MAX_BATCH_SIZE:
+        return HttpResponseBadRequest(f"At most {MAX_BATCH_SIZE} ids per batch.")
+
+    result = transition_submissions(pks, target, request.user)
+    return JsonResponse(
+        {
+            "updated": result.updated,
+            "skipped": {str(pk): reason for pk, reason in result.skipped.items()},
+        }
     )
+
+
+def submission_detail(request, pk):
+    """Public detail page, cached as rendered HTML.
+
+    The cache key holds the submission's ``updated_at``, the category
+    version and whether the viewer is a moderator, so a hit needs no query
+    and any change (dropped by signals) gets a fresh render.
+    """
+    version = get_submission_version(pk)
+    if not version:
+        raise Http404("No public submission with that id.")
+    is_moderator = _is_moderator(request.user)
+    audience = "moderator" if is_moderator else "public"
+    cache_key = f"reports:submission-detail:{pk}:{version}:{get_category_version()}:{audience}"
+    content = cache.get(cache_key)
+    if content is None:
+        submission = get_object_or_404(
+            Submission.objects.select_related("category", "user"),
+            pk=pk,
+            status__in=PUBLIC_STATUSES,
+        )
+        content = render_to_string(
+            "reports/submission_detail.html",
+            {
+                "submission": submission,
+                "mapbox_token": settings.MAPBOX_TOKEN,
+                "is_moderator": is_moderator,
+            },
+            request,
+        )
+        cache.set(cache_key, content, FRAGMENT_CACHE_TIMEOUT)
+    return HttpResponse(content)
+
+
+def submission_stats(request):
+    """Return submission counts from the daily rollup as JSON.
+
+    Takes ``date_from``/``date_to`` (inclusive ISO dates) and ``category``
+    slugs. Only public statuses are counted unless the user is a moderator.
+    The rollup has at most one row per day, category, severity and status,
+    so this doesn't slow down as submissions grow.
+    """
+    date_from = date_to = None
+    try:
+        if request.GET.get("date_from"):
+            date_from = date.fromisoformat(request.GET["date_from"])
+        if request.GET.get("date_to"):
+            date_to = date.fromisoformat(request.GET["date_to"])
+    except ValueError:
+        return HttpResponseBadRequest("Invalid date.")
+
+    statuses = PUBLIC_STATUSES
+    if _is_moderator(request.user):
+        statuses = Submission.Status.values
+
+    return JsonResponse(summarize(
+        statuses,
+        date_from=date_from,
+        date_to=date_to,
+        categories=request.GET.getlist("category"),
+    ))
+
+
+@staff_required
+def export_submissions(request):
+    """Stream public submissions as CSV, GeoJSON lines or a GeoPackage.
+
+    Takes ``format`` (csv, ndjson or gpkg), the map filters and ``bbox``.
+    With ``photos=1`` the data and photos are streamed as one zip.
+    """
+    fmt = request.GET.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        return HttpResponseBadRequest("Invalid format.")
+
+    qs = _public_submissions(request)
+    bbox_param = request.GET.get("bbox")
+    if bbox_param:
+        bbox = parse_bbox(bbox_param)
+        if bbox is None:
+            return HttpResponseBadRequest("Invalid bbox.")
+        qs = qs.filter(location__intersects=bbox)
+
+    content_type, ext = EXPORT_FORMATS[fmt]
+    if request.GET.get("photos") == "1":
+        content_type, ext = "application/zip", "zip"
+        content = export_zip(qs, fmt)
+    else:
+        content = export_data(qs, fmt)
+
+    response = StreamingHttpResponse(content, content_type=content_type)
+    filename = f"submissions-{timezone.localdate():%Y%m%d}.{ext}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+# Content-addressed files never change, so clients may keep them forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+MEDIA_CACHE_CONTROL = "public, max-age=3600"
+
+
+def _parse_range(header, size):
+    """Parse a single-range "bytes=" header into inclusive (start, end).
+
+    Returns None when the range can't be satisfied, and False when the
+    header should be ignored (malformed or multiple ranges).
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return False
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+            if end < start:
+                return False
+        else:
+            start, end = max(size - int(last), 0), size - 1
+    except ValueError:
+        return False
+    if start >= size or size == 0:
+        return None
+    return start, min(end, size - 1)
+
+
+def _file_range(f, length, block_size=64 * 1024):
+    with f:
+        while length > 0:
+            chunk = f.read(min(block_size, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def media_view(request, path):
+    """Serve an uploaded file, offloading the bytes to the web server.
+
+    With MEDIA_SERVE_MODE set, the response only carries headers and the
+    front-end server sends the file (and handles Range itself). Otherwise
+    the file is streamed from here, with single-range support.
+    Content-addressed files are marked immutable.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404
+    if not S_ISREG(stat.st_mode):
+        raise Http404
+
+    digest = content_hash(path)
+    etag = f'"{digest}"' if digest else f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    cache_control = IMMUTABLE_CACHE_CONTROL if digest else MEDIA_CACHE_CONTROL
+    content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+
+    if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+    if "*" in if_none_match or any(tag.removeprefix("W/") == etag for tag in if_none_match):
+        response = HttpResponseNotModified()
+    elif settings.MEDIA_SERVE_MODE == "x-accel":
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_PREFIX + quote(path)
+    elif settings.MEDIA_SERVE_MODE == "x-sendfile":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = full_path
+    else:
+        size = stat.st_size
+        byte_range = False
+        if "Range" in request.headers and request.headers.get("If-Range", etag) == etag:
+            byte_range = _parse_range(request.headers["Range"], size)
+        if byte_range is None:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+        if byte_range:
+            start, end = byte_range
+            f = open(full_path, "rb")
+            f.seek(start)
+            response = StreamingHttpResponse(
+                _file_range(f, end - start + 1), status=206, content_type=content_type
+            )
+            response["Content-Length"] = end - start + 1
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        else:
+            response = FileResponse(open(full_path, "rb"), content_type=content_type)
+        response["Accept-Ranges"] = "bytes"
+
+    response["ETag"] = etag
+    response["Cache-Control"] = cache_control
+    return response
+
+
+@staff_required
+def metrics_view(request):
+    """Request and image-processing histograms in Prometheus text format."""
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4")
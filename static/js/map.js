@@ -3,11 +3,22 @@
  *
  * Initializes a Mapbox GL JS map centered on Mesa County, loads
  * dumping-report submissions as clustered GeoJSON markers, and
- * provides a filter sidebar for category/severity/status/date.
+ * provides a filter sidebar for category/severity/status/date. Zoomed
+ * out past HEXBIN_MAX_ZOOM, it shows server-side hexagon bins instead.
+ *
+ * Every public submission is loaded once into a local store, filtered in
+ * the browser, and kept current by polling the API's ?since= delta feed.
+ * Phones and data-saver connections skip the store and fetch clusters for
+ * the visible area from the server instead, then vector tiles once zoomed
+ * in past CLUSTER_MAX_ZOOM.
  *
  * Globals expected (set by Django template):
  *   window.MAPBOX_TOKEN  - Mapbox access token
  *   window.GEOJSON_URL   - URL for the GeoJSON endpoint
+ *   window.HEXBIN_URL    - URL for the hex-bin aggregate endpoint
+ *   window.CLUSTERS_URL  - URL for the server-side cluster endpoint
+ *   window.TILE_URL      - vector tile URL template with {z}/{x}/{y}
+ *   window.DETAIL_URL    - detail page URL for submission 0
  */
 
 (function () {
@@ -29,11 +40,27 @@
     // Navigation controls (zoom +/-, compass)
     map.addControl(new mapboxgl.NavigationControl(), "top-right");
 
+    // Below this zoom, individual points give way to hexagon bins
+    var HEXBIN_MAX_ZOOM = 10;
+
+    var POINT_LAYERS = ["clusters", "cluster-count", "unclustered-point"];
+    var HEXBIN_LAYERS = ["hexbins"];
+
+    // Small screens and data-saver connections don't download every
+    // submission; the server clusters whatever is in view
+    var COMPACT = window.matchMedia("(max-width: 768px)").matches ||
+        !!(navigator.connection && navigator.connection.saveData);
+
+    // Past this zoom the server stops clustering, and compact mode loads
+    // vector tiles instead
+    var CLUSTER_MAX_ZOOM = 14;
+    var TILE_LAYERS = ["tile-point"];
+
     /* ------------------------------------------------------------------ */
     /*  Build GeoJSON URL with current filter values                       */
     /* ------------------------------------------------------------------ */
 
-    function buildGeoJSONUrl() {
+    function buildFilterParams() {
         var params = [];
 
         // Category checkboxes - collect checked slugs
@@ -64,32 +91,330 @@
             params.push("date_to=" + encodeURIComponent(dateTo.value));
         }
 
-        var url = window.GEOJSON_URL;
-        if (params.length > 0) {
-            url += "?" + params.join("&");
+        return params;
+    }
+
+    function buildHexbinUrl() {
+        var params = buildFilterParams();
+        params.push("zoom=" + Math.floor(map.getZoom()));
+        return window.HEXBIN_URL + "?" + params.join("&");
+    }
+
+    function buildClusterUrl() {
+        var params = buildFilterParams();
+        var bounds = map.getBounds();
+        var bbox = [
+            Math.max(bounds.getWest(), -180), Math.max(bounds.getSouth(), -90),
+            Math.min(bounds.getEast(), 180), Math.min(bounds.getNorth(), 90)
+        ];
+        params.push("zoom=" + Math.floor(map.getZoom()));
+        params.push("bbox=" + bbox.map(function (v) { return v.toFixed(5); }).join(","));
+        return window.CLUSTERS_URL + "?" + params.join("&");
+    }
+
+    function buildTileUrl() {
+        var params = buildFilterParams();
+        // Every category checked means the same as none, and leaving them
+        // out lets the server answer from its tile cache
+        var boxes = document.querySelectorAll(".category-checkbox");
+        if (document.querySelectorAll(".category-checkbox:checked").length === boxes.length) {
+            params = params.filter(function (p) { return p.indexOf("category=") !== 0; });
         }
-        return url;
+        // Tiles are fetched from a worker, which needs an absolute URL
+        var url = window.location.origin + window.TILE_URL;
+        return params.length ? url + "?" + params.join("&") : url;
     }
 
     /* ------------------------------------------------------------------ */
-    /*  Load / reload GeoJSON data                                         */
+    /*  Filter the local store in memory                                   */
     /* ------------------------------------------------------------------ */
 
-    function loadSubmissions() {
-        var url = buildGeoJSONUrl();
+    function fieldValue(id) {
+        var field = document.getElementById(id);
+        return field ? field.value : "";
+    }
+
+    // Same rules as the server: no checked category means every category
+    function readFilters() {
+        var checked = document.querySelectorAll(".category-checkbox:checked");
+        var categories = null;
+        if (checked.length) {
+            categories = {};
+            for (var i = 0; i < checked.length; i++) {
+                categories[checked[i].value] = true;
+            }
+        }
+        return {
+            categories: categories,
+            severity: fieldValue("filter-severity"),
+            status: fieldValue("filter-status"),
+            dateFrom: fieldValue("filter-date-from"),
+            dateTo: fieldValue("filter-date-to")
+        };
+    }
+
+    function matchesFilters(props, filters) {
+        if (filters.categories && !filters.categories[props.category]) return false;
+        if (filters.severity && props.severity !== filters.severity) return false;
+        if (filters.status && props.status !== filters.status) return false;
+        // ISO dates compare correctly as strings
+        if (filters.dateFrom && props.created_on < filters.dateFrom) return false;
+        if (filters.dateTo && props.created_on > filters.dateTo) return false;
+        return true;
+    }
+
+    /* ------------------------------------------------------------------ */
+    /*  Local feature store, kept current with the ?since= delta feed      */
+    /* ------------------------------------------------------------------ */
+
+    // How often to ask for changes, in ms
+    var SYNC_INTERVAL = 30000;
+
+    var store = {};          // submission id -> Feature, every public submission
+    var syncToken = null;    // null until the store has been loaded
+    var storeLoading = null; // promise of a full load in progress
+    var syncing = false;
+    // Filters the points layer was last drawn with; null forces a redraw
+    var pointsShown = null;
+
+    // Incremented per load so a slow, superseded load can't overwrite a newer one
+    var loadGeneration = 0;
+
+    // Stop following cursors past this many features, so an unexpectedly
+    // large dataset can't keep the browser downloading indefinitely
+    var MAX_LOADED_FEATURES = 50000;
+
+    function fetchAllPages(url, features, token) {
+        return fetch(url)
+            .then(function (response) {
+                if (!response.ok) throw new Error("HTTP " + response.status);
+                return response.json();
+            })
+            .then(function (page) {
+                features = features.concat(page.features);
+                // The first page says where the delta feed should start
+                if (token === undefined) token = page.sync_token;
+                if (page.next_cursor && features.length >= MAX_LOADED_FEATURES) {
+                    console.warn("Showing the newest " + features.length + " submissions only");
+                } else if (page.next_cursor) {
+                    return fetchAllPages(
+                        url.split("&cursor=")[0] + "&cursor=" + encodeURIComponent(page.next_cursor),
+                        features,
+                        token
+                    );
+                }
+                return { type: "FeatureCollection", features: features, sync_token: token };
+            });
+    }
+
+    function loadStore() {
+        if (syncToken !== null) return Promise.resolve();
+        if (!storeLoading) {
+            storeLoading = fetchAllPages(window.GEOJSON_URL + "?limit=5000", [])
+                .then(function (data) {
+                    store = {};
+                    for (var i = 0; i < data.features.length; i++) {
+                        store[data.features[i].properties.id] = data.features[i];
+                    }
+                    syncToken = data.sync_token || "0";
+                    pointsShown = null;
+                    storeLoading = null;
+                }, function (err) {
+                    storeLoading = null;
+                    throw err;
+                });
+        }
+        return storeLoading;
+    }
+
+    // Apply changes since syncToken; resolves to whether anything changed
+    function fetchChanges() {
+        return fetch(window.GEOJSON_URL + "?since=" + encodeURIComponent(syncToken))
+            .then(function (response) { return response.json(); })
+            .then(function (changes) {
+                if (changes.reset) {
+                    // Token too old for the server's change log
+                    syncToken = null;
+                    return loadStore().then(function () { return true; });
+                }
+                // Deletions first: a feature in both lists was made public again
+                var i;
+                for (i = 0; i < changes.deleted.length; i++) {
+                    delete store[changes.deleted[i]];
+                }
+                for (i = 0; i < changes.features.length; i++) {
+                    store[changes.features[i].properties.id] = changes.features[i];
+                }
+                syncToken = changes.sync_token;
+                var changed = changes.deleted.length > 0 || changes.features.length > 0;
+                if (!changes.has_more) return changed;
+                return fetchChanges().then(function (more) { return changed || more; });
+            });
+    }
+
+    function syncChanges() {
+        if (COMPACT) {
+            // Nothing is stored locally; refetch what's in view
+            if (document.hidden) return;
+            lastClusterUrl = null;
+            lastHexbinUrl = null;
+            loadSubmissions();
+            return;
+        }
+        if (syncing || syncToken === null || document.hidden) return;
+        syncing = true;
+        fetchChanges()
+            .then(function (changed) {
+                syncing = false;
+                if (!changed) return;
+                pointsShown = null;
+                lastHexbinUrl = null;
+                loadSubmissions();
+            })
+            .catch(function (err) {
+                syncing = false;
+                console.error("Failed to sync submissions:", err);
+            });
+    }
+
+    /* ------------------------------------------------------------------ */
+    /*  Show points or hex bins for the current zoom and filters           */
+    /* ------------------------------------------------------------------ */
+
+    function setLayersVisible(layers, visible) {
+        for (var i = 0; i < layers.length; i++) {
+            if (map.getLayer(layers[i])) {
+                map.setLayoutProperty(layers[i], "visibility", visible ? "visible" : "none");
+            }
+        }
+    }
+
+    // Hex bins cover the whole county, so only refetch when the zoom level
+    // or filters change rather than on every pan
+    var lastHexbinUrl = null;
+
+    function loadHexbins() {
+        var url = buildHexbinUrl();
+        setLayersVisible(POINT_LAYERS, false);
+        setLayersVisible(TILE_LAYERS, false);
+        setLayersVisible(HEXBIN_LAYERS, true);
+        if (url === lastHexbinUrl) return;
+        var generation = ++loadGeneration;
 
         fetch(url)
             .then(function (response) { return response.json(); })
             .then(function (data) {
+                if (generation !== loadGeneration) return;
+                lastHexbinUrl = url;
+                // Scale colors to the busiest bin in view
+                var maxScore = data.max_score || 1;
+                data.features.forEach(function (f) {
+                    f.properties.intensity = f.properties.score / maxScore;
+                });
+                var source = map.getSource("hexbins");
+                if (source) {
+                    source.setData(data);
+                } else {
+                    addHexbinLayers(data);
+                }
+            })
+            .catch(function (err) {
+                console.error("Failed to load hex bins:", err);
+            });
+    }
+
+    // Server clusters depend on the viewport, so they're refetched after
+    // every pan or zoom, unless nothing about the request changed
+    var lastClusterUrl = null;
+
+    function loadServerClusters() {
+        var url = buildClusterUrl();
+        if (url === lastClusterUrl) return;
+        var generation = ++loadGeneration;
+
+        fetch(url)
+            .then(function (response) {
+                if (!response.ok) throw new Error("HTTP " + response.status);
+                return response.json();
+            })
+            .then(function (data) {
+                if (generation !== loadGeneration) return;
+                lastClusterUrl = url;
                 var source = map.getSource("submissions");
                 if (source) {
-                    // Update existing source
                     source.setData(data);
                 } else {
-                    // First load - add source and layers
                     addSourceAndLayers(data);
                 }
             })
+            .catch(function (err) {
+                console.error("Failed to load clusters:", err);
+            });
+    }
+
+    var lastTileUrl = null;
+
+    function showTiles() {
+        var url = buildTileUrl();
+        if (url === lastTileUrl) return;
+        var source = map.getSource("tiles");
+        if (source) {
+            source.setTiles([url]);
+        } else {
+            addTileLayers(url);
+        }
+        lastTileUrl = url;
+    }
+
+    function showPoints() {
+        var key = buildFilterParams().join("&");
+        if (key === pointsShown) return;
+        var filters = readFilters();
+        var features = [];
+        for (var id in store) {
+            if (matchesFilters(store[id].properties, filters)) {
+                features.push(store[id]);
+            }
+        }
+        var data = { type: "FeatureCollection", features: features };
+        var source = map.getSource("submissions");
+        if (source) {
+            // Update existing source
+            source.setData(data);
+        } else {
+            // First load - add source and layers
+            addSourceAndLayers(data);
+        }
+        pointsShown = key;
+    }
+
+    function loadSubmissions() {
+        if (map.getZoom() < HEXBIN_MAX_ZOOM) {
+            loadHexbins();
+            return;
+        }
+        setLayersVisible(HEXBIN_LAYERS, false);
+        if (COMPACT) {
+            var tiled = map.getZoom() > CLUSTER_MAX_ZOOM;
+            setLayersVisible(POINT_LAYERS, !tiled);
+            setLayersVisible(TILE_LAYERS, tiled);
+            if (tiled) {
+                showTiles();
+            } else {
+                loadServerClusters();
+            }
+            return;
+        }
+        setLayersVisible(POINT_LAYERS, true);
+
+        // The store holds every public submission, so panning and filter
+        // changes need no request once it has loaded
+        var generation = ++loadGeneration;
+        loadStore()
+            .then(function () {
+                if (generation !== loadGeneration) return;
+                showPoints();
+            })
             .catch(function (err) {
                 console.error("Failed to load submissions:", err);
             });
@@ -100,12 +425,12 @@
     /* ------------------------------------------------------------------ */
 
     function addSourceAndLayers(data) {
-        // Clustered GeoJSON source
+        // Clustered GeoJSON source; server clusters arrive already grouped
         map.addSource("submissions", {
             type: "geojson",
             data: data,
-            cluster: true,
-            clusterMaxZoom: 14,
+            cluster: !COMPACT,
+            clusterMaxZoom: CLUSTER_MAX_ZOOM,
             clusterRadius: 50
         });
 
@@ -164,17 +489,69 @@
         });
     }
 
+    function addTileLayers(url) {
+        map.addSource("tiles", { type: "vector", tiles: [url], minzoom: CLUSTER_MAX_ZOOM + 1 });
+
+        // Same markers as the GeoJSON points, read from the tiles
+        map.addLayer({
+            id: "tile-point",
+            type: "circle",
+            source: "tiles",
+            "source-layer": "submissions",
+            paint: {
+                "circle-color": ["get", "color"],
+                "circle-radius": 8,
+                "circle-stroke-width": 2,
+                "circle-stroke-color": "#fff"
+            }
+        });
+    }
+
+    function addHexbinLayers(data) {
+        map.addSource("hexbins", { type: "geojson", data: data });
+
+        // Fill shaded by severity-weighted score, relative to the busiest bin
+        map.addLayer({
+            id: "hexbins",
+            type: "fill",
+            source: "hexbins",
+            paint: {
+                "fill-color": [
+                    "interpolate", ["linear"], ["get", "intensity"],
+                    0, "#fff5b1",
+                    0.5, "#f28c38",
+                    1, "#b3001b"
+                ],
+                "fill-opacity": 0.6,
+                "fill-outline-color": "#ffffff"
+            }
+        });
+    }
+
     /* ------------------------------------------------------------------ */
     /*  Click handlers: cluster zoom + marker popups                       */
     /* ------------------------------------------------------------------ */
 
     map.on("load", function () {
-        // Load initial data
+        // Load initial data, switch between points and hex bins as the
+        // zoom changes, and poll for changes
         loadSubmissions();
+        map.on("moveend", loadSubmissions);
+        setInterval(syncChanges, SYNC_INTERVAL);
+
+        // Click a hexagon to zoom in to individual reports
+        map.on("click", "hexbins", function (e) {
+            map.easeTo({ center: e.lngLat, zoom: HEXBIN_MAX_ZOOM });
+        });
 
         // Click cluster to zoom in
         map.on("click", "clusters", function (e) {
             var features = map.queryRenderedFeatures(e.point, { layers: ["clusters"] });
+            if (COMPACT) {
+                // Server clusters have no expansion zoom; step in and refetch
+                map.easeTo({ center: features[0].geometry.coordinates, zoom: map.getZoom() + 2 });
+                return;
+            }
             var clusterId = features[0].properties.cluster_id;
             map.getSource("submissions").getClusterExpansionZoom(clusterId, function (err, zoom) {
                 if (err) return;
@@ -219,7 +596,30 @@
                 .addTo(map);
         });
 
+        // Tiles carry only the fields needed to draw a marker, so their
+        // popup links to the detail page for the rest
+        map.on("click", "tile-point", function (e) {
+            var props = e.features[0].properties;
+            var detailUrl = window.DETAIL_URL.replace("/0/", "/" + props.id + "/");
+            var html = '<div class="popup-title"><a href="' + escapeHtml(detailUrl) + '">' + escapeHtml(props.category_name) + '</a></div>';
+            html += '<div class="popup-category">';
+            html += '<span class="category-swatch" style="background:' + escapeHtml(props.color) + '"></span>';
+            html += '<span class="popup-severity ' + escapeHtml(props.severity) + '">' + escapeHtml(props.severity) + '</span>';
+            html += '</div>';
+
+            new mapboxgl.Popup({ offset: 12 })
+                .setLngLat(e.lngLat)
+                .setHTML(html)
+                .addTo(map);
+        });
+
         // Pointer cursor on interactive layers
+        map.on("mouseenter", "hexbins", function () {
+            map.getCanvas().style.cursor = "pointer";
+        });
+        map.on("mouseleave", "hexbins", function () {
+            map.getCanvas().style.cursor = "";
+        });
         map.on("mouseenter", "clusters", function () {
             map.getCanvas().style.cursor = "pointer";
         });
@@ -232,6 +632,12 @@
         map.on("mouseleave", "unclustered-point", function () {
             map.getCanvas().style.cursor = "";
         });
+        map.on("mouseenter", "tile-point", function () {
+            map.getCanvas().style.cursor = "pointer";
+        });
+        map.on("mouseleave", "tile-point", function () {
+            map.getCanvas().style.cursor = "";
+        });
     });
 
     /* ------------------------------------------------------------------ */
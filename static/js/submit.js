@@ -2,7 +2,9 @@
  * Desert Trash GJ - Submit Form
  *
  * Handles photo preview, client-side EXIF GPS extraction,
- * Mapbox pin placement, and form validation.
+ * Mapbox pin placement, and form validation. Photos are downscaled to
+ * MAX_EDGE in the browser before upload; the GPS read from the original
+ * travels in the latitude/longitude fields, since the copy has no EXIF.
  *
  * Globals expected (set by Django template):
  *   window.MAPBOX_TOKEN - Mapbox access token
@@ -19,6 +21,15 @@
     var previewArea = document.getElementById("photo-preview-area");
     var submitBtn = document.getElementById("submit-btn");
 
+    // Matches the server's stored size; JPEGs within it that are already
+    // upright are stored as uploaded, without re-encoding
+    var MAX_EDGE = 1920;
+    var JPEG_QUALITY = 0.85;
+    var MAX_UPLOAD_SIZE = 20 * 1024 * 1024;
+
+    // Promise of the file to upload for the selected photo
+    var preparedPhoto = null;
+
     /* ------------------------------------------------------------------ */
     /*  Mapbox pin map                                                     */
     /* ------------------------------------------------------------------ */
@@ -92,9 +103,60 @@
 
             // Try client-side EXIF GPS extraction
             extractExifGps(file);
+
+            // Start downscaling now so it's usually done by submit time
+            preparedPhoto = preparePhoto(file);
         });
     }
 
+    /* ------------------------------------------------------------------ */
+    /*  Downscale before upload                                            */
+    /* ------------------------------------------------------------------ */
+
+    function loadImage(file) {
+        // createImageBitmap applies the EXIF orientation, so the result is upright
+        if (window.createImageBitmap) {
+            return createImageBitmap(file, { imageOrientation: "from-image" });
+        }
+        return new Promise(function (resolve, reject) {
+            var url = URL.createObjectURL(file);
+            var img = new Image();
+            img.onload = function () { URL.revokeObjectURL(url); resolve(img); };
+            img.onerror = function () { URL.revokeObjectURL(url); reject(new Error("Unreadable image")); };
+            img.src = url;
+        });
+    }
+
+    // Resolves to a JPEG of at most MAX_EDGE pixels, or the original file
+    // when that is smaller or the browser can't decode it
+    function preparePhoto(file) {
+        return loadImage(file)
+            .then(function (img) {
+                var scale = Math.min(1, MAX_EDGE / Math.max(img.width, img.height));
+                var canvas = document.createElement("canvas");
+                canvas.width = Math.round(img.width * scale);
+                canvas.height = Math.round(img.height * scale);
+                canvas.getContext("2d").drawImage(img, 0, 0, canvas.width, canvas.height);
+                if (img.close) img.close();
+                return new Promise(function (resolve) {
+                    canvas.toBlob(resolve, "image/jpeg", JPEG_QUALITY);
+                });
+            })
+            .then(function (blob) {
+                if (!blob || (blob.size >= file.size && file.type === "image/jpeg")) return file;
+                var name = file.name.replace(/\.[^.]*$/, "") + ".jpg";
+                return new File([blob], name, { type: "image/jpeg" });
+            })
+            .catch(function () { return file; });
+    }
+
+    function setPhotoFile(file) {
+        if (file === photoInput.files[0] || !window.DataTransfer) return;
+        var transfer = new DataTransfer();
+        transfer.items.add(file);
+        photoInput.files = transfer.files;
+    }
+
     /* ------------------------------------------------------------------ */
     /*  Client-side EXIF GPS extraction                                    */
     /* ------------------------------------------------------------------ */
@@ -228,17 +290,24 @@
                 alert("Please select a photo.");
                 return;
             }
-            if (hasNewFile) {
-                var file = photoInput.files[0];
-                if (file.size > 20 * 1024 * 1024) {
-                    e.preventDefault();
-                    alert("Photo must be under 20 MB.");
-                    return;
-                }
-            }
             // Disable button to prevent double-submit
+            var label = submitBtn.textContent;
             submitBtn.disabled = true;
             submitBtn.textContent = "Submitting\u2026";
+            if (!hasNewFile || !preparedPhoto) return;
+
+            // Swap in the downscaled photo, then submit for real
+            e.preventDefault();
+            preparedPhoto.then(function (file) {
+                if (file.size > MAX_UPLOAD_SIZE) {
+                    alert("Photo must be under 20 MB.");
+                    submitBtn.disabled = false;
+                    submitBtn.textContent = label;
+                    return;
+                }
+                setPhotoFile(file);
+                form.submit();
+            });
         });
     }
 